@@ -3,6 +3,7 @@ Configurações da aplicação
 """
 
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -11,12 +12,10 @@ load_dotenv()
 
 # Diretórios base
 BASE_DIR = Path(__file__).resolve().parent.parent
+# Criado por quem grava nele (sinks de log, spans, profiles, índice), e não
+# na importação das configurações
 LOGS_DIR = BASE_DIR / "logs"
 
-# Verifica se o diretório de logs existe
-if not LOGS_DIR.exists():
-    LOGS_DIR.mkdir(parents=True, exist_ok=True)
-
 # Constantes da aplicação
 APP_NAME = "Forsecar Backend API"
 APP_VERSION = "1.0.0"
@@ -33,3 +32,135 @@ if ENV == "production":
 
 # Caminho para o endpoint principal (sem o prefixo, que é adicionado no router)
 PROPOSTA_ENDPOINT = "/gerar_proposta_rodrigo"
+
+# Tabela de regras dos planos de pagamento (recarregada quando o arquivo muda)
+PLANOS_PAGAMENTO_FILE = Path(os.getenv("PLANOS_PAGAMENTO_FILE", BASE_DIR / "config" / "planos_pagamento.json"))
+# Intervalo mínimo (em segundos) entre verificações de alteração da tabela
+PLANOS_PAGAMENTO_VERIFICACAO = float(os.getenv("PLANOS_PAGAMENTO_VERIFICACAO", "2"))
+# Quantidade máxima de resultados de condições de pagamento mantidos em cache
+CACHE_CONDICOES_TAMANHO = int(os.getenv("CACHE_CONDICOES_TAMANHO", "4096"))
+
+# Importa os módulos pesados (httpx, PyPDF2, NumPy) em segundo plano logo após
+# a inicialização, em vez de na primeira requisição que os usar
+IMPORTACAO_AQUECIMENTO = os.getenv("IMPORTACAO_AQUECIMENTO", "true").lower() in ("1", "true", "sim")
+
+# Templates de PDF mantidos em memória após o download
+# Tempo (em segundos) até um template em cache ser baixado de novo (0 desativa o cache)
+TEMPLATE_CACHE_SEGUNDOS = float(os.getenv("TEMPLATE_CACHE_SEGUNDOS", "3600"))
+
+# Arquivos temporários do preenchimento de PDF (removidos ao fim de cada proposta)
+PDF_TEMP_DIR = Path(os.getenv("PDF_TEMP_DIR", Path(tempfile.gettempdir()) / "forsecar"))
+# Envios por WhatsApp interrompidos pelo encerramento, refeitos na inicialização
+ENVIOS_PENDENTES_FILE = Path(os.getenv("ENVIOS_PENDENTES_FILE", LOGS_DIR / "envios_pendentes.jsonl"))
+
+# Simulação de descontos (grade de preços sem geração de PDF)
+SIMULACAO_ENDPOINT = "/simular_descontos"
+# Quantidade máxima de descontos simulados por requisição
+SIMULACAO_MAX_DESCONTOS = int(os.getenv("SIMULACAO_MAX_DESCONTOS", "500"))
+# Maior subtotal ou desconto (em reais) aceito pela simulação
+SIMULACAO_VALOR_MAXIMO = float(os.getenv("SIMULACAO_VALOR_MAXIMO", "10000000"))
+# Tempo (em segundos) que clientes e proxies podem reutilizar uma simulação
+SIMULACAO_CACHE_SEGUNDOS = int(os.getenv("SIMULACAO_CACHE_SEGUNDOS", "300"))
+
+# Logging: registros passam por uma fila limitada e são gravados por uma
+# thread de escrita, fora do event loop
+LOG_ASSINCRONO = os.getenv("LOG_ASSINCRONO", "true").lower() in ("1", "true", "sim")
+# Quantidade máxima de registros aguardando escrita
+LOG_FILA_TAMANHO = int(os.getenv("LOG_FILA_TAMANHO", "10000"))
+# O que fazer com a fila cheia: "descartar", "bloquear" ou "amostrar"
+LOG_FILA_POLITICA = os.getenv("LOG_FILA_POLITICA", "descartar")
+# Maior nível que pode ser descartado/amostrado; níveis acima sempre aguardam vaga
+LOG_FILA_NIVEL_DESCARTE = os.getenv("LOG_FILA_NIVEL_DESCARTE", "INFO")
+# Na política "amostrar", mantém 1 de cada N registros descartáveis
+LOG_FILA_AMOSTRA = int(os.getenv("LOG_FILA_AMOSTRA", "10"))
+# Tempo máximo (em segundos) para esvaziar a fila no encerramento
+LOG_FILA_ENCERRAMENTO = float(os.getenv("LOG_FILA_ENCERRAMENTO", "5"))
+# Registros estruturados (uma linha JSON por registro) ao lado do log de texto
+LOG_JSON = os.getenv("LOG_JSON", "true").lower() in ("1", "true", "sim")
+LOG_JSON_FILE = Path(os.getenv("LOG_JSON_FILE", LOGS_DIR / "app.jsonl"))
+
+# Registro do corpo bruto das requisições
+# Máximo de bytes do corpo gravados no log (o restante é truncado)
+CORPO_BRUTO_MAX_BYTES = int(os.getenv("CORPO_BRUTO_MAX_BYTES", "4096"))
+# Fração das requisições com corpo registrado, por rota ("rota=taxa,rota=taxa")
+CORPO_BRUTO_AMOSTRAGEM = {
+    rota.strip(): float(taxa)
+    for rota, _, taxa in (item.partition("=") for item in os.getenv("CORPO_BRUTO_AMOSTRAGEM", "").split(","))
+    if rota.strip()
+}
+# Taxa das rotas não listadas em CORPO_BRUTO_AMOSTRAGEM
+CORPO_BRUTO_AMOSTRAGEM_PADRAO = float(os.getenv("CORPO_BRUTO_AMOSTRAGEM_PADRAO", "1.0"))
+# Campos mascarados no corpo registrado
+CORPO_BRUTO_CAMPOS_SENSIVEIS = tuple(
+    campo.strip()
+    for campo in os.getenv("CORPO_BRUTO_CAMPOS_SENSIVEIS", "telefone_cliente,email_cliente").split(",")
+    if campo.strip()
+)
+# Depuração: grava cada corpo completo (mascarado) em um arquivo .json.gz
+CORPO_BRUTO_DEBUG = os.getenv("CORPO_BRUTO_DEBUG", "false").lower() in ("1", "true", "sim")
+CORPO_BRUTO_DIR = Path(os.getenv("CORPO_BRUTO_DIR", LOGS_DIR / "corpos"))
+
+# Índice de busca dos logs (texto, JSON e arquivos rotacionados)
+INDICE_LOGS_FILE = Path(os.getenv("INDICE_LOGS_FILE", LOGS_DIR / "indice_logs.sqlite"))
+
+# Profiling sob demanda: ativado por requisição com um cabeçalho assinado
+# (HMAC-SHA256 do X-Request-ID com este segredo); vazio desativa
+PROFILING_SEGREDO = os.getenv("PROFILING_SEGREDO", "")
+# Flag de administração: perfila qualquer requisição, sem assinatura (respeita o limite abaixo)
+PROFILING_ADMIN = os.getenv("PROFILING_ADMIN", "false").lower() in ("1", "true", "sim")
+# Intervalo mínimo (em segundos) entre dois profiles, para toda a aplicação
+PROFILING_INTERVALO_MINIMO = float(os.getenv("PROFILING_INTERVALO_MINIMO", "60"))
+# Intervalo (em milissegundos) entre amostras no modo "amostragem"
+PROFILING_AMOSTRA_MS = float(os.getenv("PROFILING_AMOSTRA_MS", "5"))
+PROFILING_DIR = Path(os.getenv("PROFILING_DIR", LOGS_DIR / "profiles"))
+
+# Monitor do event loop: mede o atraso de agendamento e captura a pilha de
+# quem bloquear o loop por mais que o limite
+LOOP_MONITOR = os.getenv("LOOP_MONITOR", "true").lower() in ("1", "true", "sim")
+# Intervalo (em segundos) entre medições
+LOOP_MONITOR_INTERVALO = float(os.getenv("LOOP_MONITOR_INTERVALO", "0.05"))
+# Bloqueio (em segundos) a partir do qual a pilha é capturada e registrada
+LOOP_BLOQUEIO_LIMITE = float(os.getenv("LOOP_BLOQUEIO_LIMITE", "0.2"))
+
+# Rastreamento (spans) das requisições, das etapas e das chamadas externas
+# Fração das requisições rastreadas, decidida no span raiz (0 desativa)
+TRACING_AMOSTRAGEM = float(os.getenv("TRACING_AMOSTRAGEM", "0.1"))
+# Spans exportados, um JSON por linha
+TRACING_ARQUIVO = Path(os.getenv("TRACING_ARQUIVO", LOGS_DIR / "traces.jsonl"))
+# Coletor opcional que recebe os spans em lote (POST {"spans": [...]})
+TRACING_COLETOR_URL = os.getenv("TRACING_COLETOR_URL", "")
+
+# Servidor de produção (servidor.py): workers criados por fork a partir de um
+# processo que já carregou a aplicação, as regras e os templates
+SERVIDOR_HOST = os.getenv("SERVIDOR_HOST", "0.0.0.0")
+SERVIDOR_PORTA = int(os.getenv("SERVIDOR_PORTA", "8000"))
+# Quantidade de workers (0 usa um por núcleo disponível)
+SERVIDOR_WORKERS = int(os.getenv("SERVIDOR_WORKERS", "0"))
+# Requisições atendidas por um worker antes de ser substituído (0 desativa)
+SERVIDOR_MAX_REQUISICOES = int(os.getenv("SERVIDOR_MAX_REQUISICOES", "5000"))
+# Variação aleatória somada ao limite acima, para os workers não reciclarem juntos
+SERVIDOR_MAX_REQUISICOES_VARIACAO = int(os.getenv("SERVIDOR_MAX_REQUISICOES_VARIACAO", "500"))
+# Tempo máximo (em segundos) para as propostas em andamento concluírem no
+# encerramento (também com `python main.py`); depois disso são canceladas
+SERVIDOR_ENCERRAMENTO = float(os.getenv("SERVIDOR_ENCERRAMENTO", "30"))
+
+# Controle de admissão das propostas (por worker): propostas gerando PDF ao
+# mesmo tempo (0 desativa o controle)
+ADMISSAO_LIMITE = int(os.getenv("ADMISSAO_LIMITE", "4"))
+# Propostas aguardando vaga; além disso são recusadas com 503
+ADMISSAO_FILA = int(os.getenv("ADMISSAO_FILA", "8"))
+# Tempo máximo (em segundos) de espera por uma vaga antes de recusar
+ADMISSAO_ESPERA = float(os.getenv("ADMISSAO_ESPERA", "5"))
+# Segundos sugeridos no cabeçalho Retry-After das propostas recusadas
+ADMISSAO_RETRY_AFTER = int(os.getenv("ADMISSAO_RETRY_AFTER", "5"))
+
+# Chaves de idempotência (cabeçalho Idempotency-Key) da rota de propostas,
+# compartilhadas entre os workers
+IDEMPOTENCIA_FILE = Path(os.getenv("IDEMPOTENCIA_FILE", LOGS_DIR / "idempotencia.sqlite"))
+# Tempo (em segundos) em que a resposta de uma chave é repetida
+IDEMPOTENCIA_TTL = float(os.getenv("IDEMPOTENCIA_TTL", "86400"))
+# Tempo máximo (em segundos) que uma repetição aguarda a requisição original em andamento
+IDEMPOTENCIA_ESPERA = float(os.getenv("IDEMPOTENCIA_ESPERA", "60"))
+# Tempo (em segundos) após o qual uma chave em andamento é considerada
+# abandonada (ex.: worker finalizado à força) e pode ser processada de novo
+IDEMPOTENCIA_RESERVA = float(os.getenv("IDEMPOTENCIA_RESERVA", "300"))
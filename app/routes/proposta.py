@@ -1,26 +1,36 @@
 """Rotas para manipulação de propostas"""
 
+import asyncio
 import uuid
 from datetime import datetime
-from typing import Dict, Any, Union
+from typing import Dict, Any, Optional, Set, Tuple, Union
 import json  # Para serializar payload de PDF
 import os
 import tempfile
 
-from fastapi import APIRouter, Request, HTTPException, Body
+import orjson
+from fastapi import APIRouter, Request, HTTPException, Query
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse
+from pydantic import ValidationError
 
 from app.schemas.proposta_schema import (
-    PropostaResponse, 
-    PropostaComfort10Anos,
-    PropostaComfort18mm,
-    PropostaUltralight,
-    PropostaNenhuma
+    PROPOSTA_ADAPTER,
+    CondicoesPagamento,
+    PropostaBase,
+    PropostaResponse,
 )
+from app.services import admissao
 from app.services import calculos
+from app.services import contexto_requisicao
+from app.services import encerramento
+from app.services import idempotencia
 from app.services import logger_service
+from app.services import metricas
 from app.services import pdf_service
 from app.services import whatsapp_service
-from app.config import PROPOSTA_ENDPOINT
+from app.services.dinheiro import formatar_centavos
+from app.config import ADMISSAO_RETRY_AFTER, PROPOSTA_ENDPOINT
 from config.form_map import (
     FORM_MAP_WITH_DESCONTO,
     FORM_MAP_SEM_DESCONTO,
@@ -30,124 +40,243 @@ from config.form_map import (
 # Criação do router
 router = APIRouter()
 
+# Mapas de campos do formulário (informações básicas + condições de pagamento),
+# montados uma vez por template: com desconto (True) e sem desconto (False)
+FORM_MAPS = {
+    True: {**FORM_MAP_WITH_DESCONTO, **PAYMENT_CONDITIONS_MAP},
+    False: {**FORM_MAP_SEM_DESCONTO, **PAYMENT_CONDITIONS_MAP},
+}
+
+# Campos selecionáveis com ?fields= (resposta e condições de pagamento)
+CAMPOS_RESPOSTA = tuple(PropostaResponse.model_fields)
+CAMPOS_CONDICOES = tuple(CondicoesPagamento.model_fields)
+
+
+def _campos_selecionados(fields: Optional[str]) -> Tuple[Optional[Set[str]], Optional[Set[str]]]:
+    """
+    Interpreta ?fields= (lista separada por vírgulas)
+    
+    Aceita campos da resposta (ex.: "status") e das condições de pagamento
+    com prefixo (ex.: "condicoes_pagamento.a_vista").
+    
+    Returns:
+        (campos da resposta, campos das condições); None seleciona todos
+    """
+    if fields is None:
+        return None, None
+    
+    campos_resposta, campos_condicoes = set(), set()
+    for campo in filter(None, (c.strip() for c in fields.split(","))):
+        raiz, _, subcampo = campo.partition(".")
+        if raiz not in CAMPOS_RESPOSTA or (subcampo and (raiz != "condicoes_pagamento" or subcampo not in CAMPOS_CONDICOES)):
+            raise HTTPException(status_code=422, detail=f"Campo desconhecido em fields: {campo}")
+        campos_resposta.add(raiz)
+        if subcampo:
+            campos_condicoes.add(subcampo)
+    
+    if not campos_resposta:
+        raise HTTPException(status_code=422, detail="Informe ao menos um campo em fields")
+    # "condicoes_pagamento" sem subcampos seleciona todas as condições
+    return campos_resposta, (campos_condicoes or None)
+
+
+def _log_condicoes_pagamento(quadro: calculos.QuadroPagamento) -> None:
+    """Registra os detalhes das condições de pagamento de um cenário"""
+    logger_service.log_info("DETALHES DAS CONDIÇÕES DE PAGAMENTO:")
+    
+    # À vista
+    logger_service.log_info(f"  - À vista: R$ {quadro.a_vista.valor_total / 100:.2f}" +
+                           f" (Desconto: {quadro.a_vista.desconto_percentual}%)")
+    
+    # Parcelado direto
+    for opcao in quadro.parcelado_direto:
+        if opcao.entrada_percentual:
+            logger_service.log_info(f"  - {opcao.numero_parcelas}x: Entrada de R$ {opcao.valor_entrada / 100:.2f} + " +
+                                   f"{opcao.numero_parcelas - 1}x de R$ {opcao.valor_parcela / 100:.2f}" +
+                                   f" (Acréscimo: {opcao.acrescimo_percentual}%)")
+        else:
+            logger_service.log_info(f"  - {opcao.numero_parcelas}x sem juros: " +
+                                   " + ".join(f"{v / 100:.2f}" for v in opcao.valores_parcelas))
+    
+    # Cartão
+    logger_service.log_info("  - Opções de cartão:")
+    for opcao in quadro.cartao:
+        logger_service.log_info(f"    * {opcao.chave}: R$ {opcao.valor_parcela / 100:.2f} " +
+                               f"(Total: R$ {opcao.valor_total / 100:.2f}, Acréscimo: {opcao.acrescimo_percentual}%)")
+
+
+def _resposta(
+    status: str,
+    message: str,
+    tipo_blindagem: Optional[str] = None,
+    valor_blindagem: Optional[float] = None,
+    condicoes_pagamento: Optional[Dict[str, Any]] = None,
+    campos: Optional[Set[str]] = None,
+) -> ORJSONResponse:
+    """
+    Serializa a resposta no formato de PropostaResponse direto com orjson,
+    sem reconstruir e revalidar o modelo a partir dos resultados já tipados
+    """
+    resposta = {
+        "status": status,
+        "message": message,
+        "tipo_blindagem": tipo_blindagem,
+        "valor_blindagem": valor_blindagem,
+        "condicoes_pagamento": condicoes_pagamento,
+        "timestamp": datetime.now().isoformat(),
+    }
+    if campos is not None:
+        resposta = {chave: valor for chave, valor in resposta.items() if chave in campos}
+    return ORJSONResponse(resposta)
+
+
+def _recusar(message: str, retry_after: int) -> ORJSONResponse:
+    """Recusa a proposta sem iniciá-la (503 com Retry-After)"""
+    metricas.PROPOSTAS.inc(tipo_blindagem="", template="", resultado="recusada")
+    return ORJSONResponse(
+        {"status": "error", "message": message},
+        status_code=503,
+        headers={"Retry-After": str(retry_after)},
+    )
+
 
 @router.post(PROPOSTA_ENDPOINT, response_model=PropostaResponse)
-async def gerar_proposta(request: Request, data: Dict[str, Any] = Body(...)):
-    """Endpoint para receber dados, processar e gerar proposta."""
+async def gerar_proposta(
+    request: Request,
+    formato: str = Query("completo", pattern="^(completo|compacto)$"),
+    fields: Optional[str] = Query(None),
+):
+    """
+    Endpoint para receber dados, processar e gerar proposta.
+    
+    ?formato=compacto retorna cada opção de pagamento sem a lista de parcelas;
+    ?fields= limita a resposta aos campos informados (ex.:
+    fields=status,condicoes_pagamento.a_vista).
+    
+    Com o cabeçalho Idempotency-Key, repetições da mesma requisição não
+    geram outra proposta: recebem a resposta da original (ver
+    app/services/idempotencia.py).
+    """
+    # Durante o encerramento, novas propostas são recusadas para que as em
+    # andamento concluam dentro do prazo
+    if encerramento.encerrando():
+        return _recusar("Serviço em encerramento, tente novamente", encerramento.RETRY_AFTER_ENCERRAMENTO)
+    
+    chave_idempotencia = request.headers.get(idempotencia.CABECALHO_CHAVE)
+    if chave_idempotencia is not None and not idempotencia.chave_valida(chave_idempotencia):
+        return ORJSONResponse(
+            {"status": "error", "message": f"{idempotencia.CABECALHO_CHAVE} inválida"},
+            status_code=400,
+        )
+    
+    campos_resposta, campos_condicoes = _campos_selecionados(fields)
+    compacto = formato == "compacto"
+    
+    # Gera um ID único para a proposta; o contexto da requisição o anexa a
+    # todos os registros de log e chamadas externas e o devolve no cabeçalho
+    # X-Proposta-ID
+    proposta_id = str(uuid.uuid4())
+    contexto_requisicao.definir_proposta(proposta_id)
+    
+    # Captura o corpo bruto da requisição
+    raw_body = await request.body()
+    
+    # Registra o corpo bruto da requisição
+    logger_service.log_raw_request_body(raw_body, rota=PROPOSTA_ENDPOINT, proposta_id=proposta_id)
+    
+    # Valida o JSON bruto em uma única passada; o tipo da proposta é escolhido
+    # por tipo_blindagem. Dados inválidos retornam 422.
+    with logger_service.etapa("validar"):
+        try:
+            proposta = PROPOSTA_ADAPTER.validate_json(raw_body)
+        except ValidationError as e:
+            metricas.PROPOSTAS.inc(tipo_blindagem="", template="", resultado="invalida")
+            # Erros pela serialização do pydantic: entradas fora do JSON
+            # padrão (ex.: 1e400, que vira infinito) saem como null
+            raise RequestValidationError(orjson.loads(e.json(include_url=False)))
+    
+    async def processar() -> ORJSONResponse:
+        # Controle de admissão: limita as propostas em execução; com a fila de
+        # espera cheia (ou a espera esgotada) a proposta é recusada sem ser iniciada
+        async with admissao.vaga() as admitida:
+            if not admitida:
+                logger_service.log_warning("Proposta recusada: limite de propostas simultâneas atingido")
+                return _recusar("Servidor sobrecarregado, tente novamente", ADMISSAO_RETRY_AFTER)
+            with logger_service.contexto_log(client=proposta.nome_cliente), \
+                    metricas.PROPOSTAS_EM_ANDAMENTO.em_andamento(), encerramento.pipeline():
+                return await _processar_proposta(proposta, proposta_id, compacto, campos_resposta, campos_condicoes)
+    
+    if chave_idempotencia is None:
+        return await processar()
+    impressao = idempotencia.impressao_requisicao(raw_body, request.url.query)
+    return await idempotencia.executar(chave_idempotencia, impressao, proposta_id, processar)
+
+
+async def _processar_proposta(
+    proposta: PropostaBase,
+    proposta_id: str,
+    compacto: bool,
+    campos_resposta: Optional[Set[str]],
+    campos_condicoes: Optional[Set[str]],
+) -> ORJSONResponse:
+    """Calcula as condições, gera e envia o PDF e monta a resposta da proposta"""
+    # Tipo de template (com/sem desconto) para as métricas; "nenhum" se falhar antes da escolha
+    template_type = "nenhum"
+    # Arquivos temporários criados, removidos ao final mesmo em caso de erro
+    temporarios = []
+    # Envio por WhatsApp em andamento, gravado como pendente se a proposta for cancelada
+    envio_pendente = None
     try:
-        # Gera um ID único para a proposta
-        proposta_id = str(uuid.uuid4())
-        
-        # Captura o corpo bruto da requisição
-        raw_body = await request.body()
-        
-        # Registra o corpo bruto da requisição
-        logger_service.log_raw_request_body(raw_body)
-        
         # Registra a requisição inicial
-        nome_cliente = data.get("nome_cliente", "N/A")
-        tipo_blindagem = data.get("tipo_blindagem", "N/A")
+        nome_cliente = proposta.nome_cliente
+        tipo_blindagem = proposta.tipo_blindagem
         
         # Log inicial
         logger_service.log_info(f"=== INICIANDO PROCESSAMENTO DE NOVA REQUISIÇÃO ====")
         logger_service.log_info(f"Requisição recebida - Cliente: {nome_cliente} | Tipo blindagem: {tipo_blindagem}")
         
-        # Calcula os subtotais com base no tipo de blindagem
-        subtotais = calculos.calcular_subtotais_blindagem(data)
-        
-        # Calcula as condições de pagamento
-        logger_service.log_info("Calculando condições de pagamento...")
-        condicoes_pagamento = calculos.calcular_condicoes_pagamento(subtotais)
+        with logger_service.etapa("calcular"):
+            # Calcula os subtotais com base no tipo de blindagem
+            subtotais = calculos.calcular_subtotais_blindagem(proposta)
+            
+            # Calcula, uma única vez, as condições de pagamento de cada cenário
+            logger_service.log_info("Calculando condições de pagamento...")
+            matriz = calculos.calcular_matriz_cenarios(subtotais)
         
-        valor_base = subtotais.get("valor_base", 0)
-        logger_service.log_info(f"Cálculos de pagamento concluídos para valor base: R$ {valor_base:.2f}")
+        # Valores em Centavos; viram reais só nos logs, no PDF e na resposta
+        valor_base = subtotais["valor_base"]
+        logger_service.log_info(f"Cálculos de pagamento concluídos para valor base: R$ {valor_base / 100:.2f}")
         
         # Loga as comparações de blindagens e condições de pagamento
         if tipo_blindagem == "Nenhuma":
             logger_service.log_info("COMPARAÇÃO DE BLINDAGENS:")
-            logger_service.log_info(f"  - Comfort 10 anos: R$ {subtotais['comfort10_anos']['subtotal']:.2f}" + 
-                                   f" (Desconto: R$ {subtotais['desconto_aplicado']:.2f})")
-            logger_service.log_info(f"  - Comfort 18 mm: R$ {subtotais['comfort18mm']['subtotal']:.2f}" + 
-                                   f" (Desconto: R$ {subtotais['desconto_aplicado']:.2f})")
-            logger_service.log_info(f"  - Ultralight: R$ {subtotais['ultralight']['subtotal']:.2f}" + 
-                                   f" (Desconto: R$ {subtotais['desconto_aplicado']:.2f})")
+            for label, cenario in matriz.items():
+                logger_service.log_info(f"  - {label}: R$ {cenario.subtotal / 100:.2f}" + 
+                                       f" (Desconto: R$ {subtotais['desconto_aplicado'] / 100:.2f})")
             
             # Log detalhado para cada cenário de blindagem em 'Nenhuma'
-            for key, label in [("comfort10_anos", "Comfort 10 anos"), ("comfort18mm", "Comfort 18 mm"), ("ultralight", "Ultralight")]:
-                valor = subtotais[key]["valor_final"]
-                conds = calculos.calcular_condicoes_pagamento({"valor_base": valor})
+            for label, cenario in matriz.items():
                 logger_service.log_info(f"=== Cálculos para {label} ===")
-                logger_service.log_info("DETALHES DAS CONDIÇÕES DE PAGAMENTO:")
-                logger_service.log_info(f"  - À vista: R$ {conds['a_vista']['valor_total']:.2f} (Desconto: {conds['a_vista']['desconto_percentual']}%)")
-                logger_service.log_info(f"  - 2x sem juros: {conds['duas_vezes']['parcelas'][0]['valor']:.2f} + {conds['duas_vezes']['parcelas'][1]['valor']:.2f}")
-                logger_service.log_info(f"  - 3x: Entrada de R$ {conds['tres_vezes']['parcelas'][0]['valor']:.2f} + 2x de R$ {conds['tres_vezes']['parcelas'][1]['valor']:.2f} (Acréscimo: {conds['tres_vezes']['acrescimo_percentual']}%)")
-                logger_service.log_info(f"  - 4x: Entrada de R$ {conds['quatro_vezes']['parcelas'][0]['valor']:.2f} + 3x de R$ {conds['quatro_vezes']['parcelas'][1]['valor']:.2f} (Acréscimo: {conds['quatro_vezes']['acrescimo_percentual']}%)")
-                logger_service.log_info("  - Opções de cartão:")
-                for parcela, info in conds['cartao'].items():
-                    valor_parcela = info.get('valor_parcela', 0)
-                    valor_total = info.get('valor_total', 0)
-                    acrescimo = info.get('acrescimo', 0)
-                    logger_service.log_info(f"    * {parcela}: R$ {valor_parcela:.2f} (Total: R$ {valor_total:.2f}, Acréscimo: {acrescimo}%)")
-        
-        # Se houver um valor base (tipo de blindagem escolhido), loga detalhes das condições de pagamento
-        if valor_base > 0:
-            logger_service.log_info("DETALHES DAS CONDIÇÕES DE PAGAMENTO:")
-            
-            # À vista
-            logger_service.log_info(f"  - À vista: R$ {condicoes_pagamento['a_vista']['valor_total']:.2f}" +
-                                   f" (Desconto: {condicoes_pagamento['a_vista']['desconto_percentual']}%)")
-            
-            # Parcelado
-            logger_service.log_info(f"  - 2x sem juros: {condicoes_pagamento['duas_vezes']['parcelas'][0]['valor']:.2f} + " +
-                                   f"{condicoes_pagamento['duas_vezes']['parcelas'][1]['valor']:.2f}")
-                               
-            logger_service.log_info(f"  - 3x: Entrada de R$ {condicoes_pagamento['tres_vezes']['parcelas'][0]['valor']:.2f} + " +
-                                   f"2x de R$ {condicoes_pagamento['tres_vezes']['parcelas'][1]['valor']:.2f}" +
-                                   f" (Acréscimo: {condicoes_pagamento['tres_vezes']['acrescimo_percentual']}%)")
-                               
-            logger_service.log_info(f"  - 4x: Entrada de R$ {condicoes_pagamento['quatro_vezes']['parcelas'][0]['valor']:.2f} + " +
-                                   f"3x de R$ {condicoes_pagamento['quatro_vezes']['parcelas'][1]['valor']:.2f}" +
-                                   f" (Acréscimo: {condicoes_pagamento['quatro_vezes']['acrescimo_percentual']}%)")
-            
-            # Cartão
-            logger_service.log_info("  - Opções de cartão:")
-            for parcela, info in condicoes_pagamento["cartao"].items():
-                try:
-                    valor_parcela = info.get("valor_parcela", 0)
-                    valor_total = info.get("valor_total", 0)
-                    acrescimo = info.get("acrescimo", 0)
-                    logger_service.log_info(f"    * {parcela}: R$ {valor_parcela:.2f} " +
-                                           f"(Total: R$ {valor_total:.2f}, Acréscimo: {acrescimo}%)")
-                except Exception as e:
-                    logger_service.log_warning(f"Erro ao processar informações de cartão para {parcela}: {str(e)}")
+                _log_condicoes_pagamento(cenario.condicoes)
+        elif valor_base > 0:
+            # Se houver um valor base (tipo de blindagem escolhido), loga detalhes das condições de pagamento
+            for cenario in matriz.values():
+                _log_condicoes_pagamento(cenario.condicoes)
         
-        # Prepara resposta final
+        # Prepara resposta final a partir da matriz de cenários
         logger_service.log_info("Preparando resposta final da proposta...")
         
-        if tipo_blindagem == "Nenhuma":
+        # Os resultados só viram dicionários aqui, na fronteira da resposta
+        if campos_resposta is not None and "condicoes_pagamento" not in campos_resposta:
+            condicoes_pagamento = None
+        elif tipo_blindagem == "Nenhuma":
             # Propostas completas para cada blindagem em comparação
-            proposals = {}
-            for key, label in [("comfort10_anos", "Comfort 10 anos"), ("comfort18mm", "Comfort 18 mm"), ("ultralight", "Ultralight")]:
-                valor = subtotais[key]["valor_final"]
-                conds = calculos.calcular_condicoes_pagamento({"valor_base": valor})
-                conds["valor_base"] = valor
-                conds["parcelado_direto"] = [
-                    conds["duas_vezes"],
-                    conds["tres_vezes"],
-                    conds["quatro_vezes"],
-                ]
-                conds["parcelado_cartao"] = list(conds["cartao"].values())
-                proposals[label] = conds
-            condicoes_pagamento = proposals
+            condicoes_pagamento = {
+                label: cenario.condicoes.para_resposta(compacto, campos_condicoes)
+                for label, cenario in matriz.items()
+            }
         else:
-            # Ajusta estrutura conforme CondicoesPagamento schema
-            condicoes_pagamento["valor_base"] = valor_base
-            condicoes_pagamento["parcelado_direto"] = [
-                condicoes_pagamento["duas_vezes"],
-                condicoes_pagamento["tres_vezes"],
-                condicoes_pagamento["quatro_vezes"],
-            ]
-            condicoes_pagamento["parcelado_cartao"] = list(condicoes_pagamento["cartao"].values())
+            condicoes_pagamento = next(iter(matriz.values())).condicoes.para_resposta(compacto, campos_condicoes)
         
         # --- Salvar dados para PDF ---
         logger_service.log_info("Salvando dados para PDF...")
@@ -159,195 +288,174 @@ async def gerar_proposta(request: Request, data: Dict[str, Any] = Body(...)):
             'tipo_documentacao','pacote_revisao','vidro_10_anos','vidro_5_anos',
             'tipo_blindagem','desconto_aplicado','observations'
         ]:
-            if field in data:
-                backend_data[field] = data[field]
+            if field in proposta.model_fields_set:
+                backend_data[field] = getattr(proposta, field)
+        if 'desconto_aplicado' in backend_data:
+            backend_data['desconto_aplicado'] = proposta.desconto_aplicado / 100
                 
-        # Cenários de blindagem - SIMPLIFICADO para evitar duplicações
+        # Cenários de blindagem - referenciam a matriz já calculada
         backend_data['cenarios'] = {}
-        
-        if tipo_blindagem == "Nenhuma":
-            # Para comparação, incluir apenas um cenário por tipo de blindagem
-            for label, key in [("Comfort 10 anos", "comfort10_anos"), 
-                              ("Comfort 18 mm", "comfort18mm"), 
-                              ("Ultralight", "ultralight")]:
-                # Usar valores já calculados com desconto aplicado
-                valor_final = subtotais[key]['valor_final']
-                
-                # O valor de condicoes_pagamento já calculado no proposals contém o desconto
-                scenario = {
-                    'subtotal': subtotais[key]['subtotal'],
-                    'condicoes_pagamento': condicoes_pagamento[label]
-                }
-                
-                # Se houver desconto, incluir no cenário para documentação
-                desconto = subtotais.get('desconto_aplicado', 0)
-                if desconto > 0:
-                    scenario['desconto_aplicado'] = desconto
-                    
-                backend_data['cenarios'][label] = scenario
-        else:
-            # Para um tipo específico de blindagem, usar valor_base que já contém desconto
-            valor_base = subtotais['valor_base']
-            
-            # Identificar o subtotal original sem desconto
-            subtotal_map = {
-                'Comfort 10 anos': 'comfort10YearsSubTotal',
-                'Comfort 18 mm': 'comfort18mmSubTotal',
-                'Ultralight': 'ultralightSubTotal'
-            }
-            subtotal = float(data.get(subtotal_map.get(tipo_blindagem, ''), 0))
-            
-            # Criar cenário único com condições de pagamento já calculadas
+        desconto = subtotais['desconto_aplicado'] / 100
+        for label, cenario in matriz.items():
             scenario = {
-                'subtotal': subtotal,
-                'condicoes_pagamento': condicoes_pagamento
+                'subtotal': cenario.subtotal / 100,
+                'condicoes_pagamento': cenario.condicoes
             }
             
-            # Se houver desconto, incluir no cenário
-            desconto = data.get('desconto_aplicado', 0)
+            # Se houver desconto, incluir no cenário para documentação
             if desconto > 0:
                 scenario['desconto_aplicado'] = desconto
                 
-            backend_data['cenarios'][tipo_blindagem] = scenario
+            backend_data['cenarios'][label] = scenario
             
         # Log payload para PDF em formato de tabela
-        logger_service.log_info("Dados para PDF:")
-        # Campos básicos
+        # Campos básicos (a tabela só é montada se algum log de texto gravar)
         basic = {k: v for k, v in backend_data.items() if k != 'cenarios'}
-        logger_service.log_info(logger_service.format_dict_table(basic))
+        logger_service.log_tabela("Dados para PDF:", basic)
         
         # Preparar dados para o formulário PDF usando os mapeamentos
-        form_map = (FORM_MAP_WITH_DESCONTO if data.get("desconto_aplicado", 0) > 0 else FORM_MAP_SEM_DESCONTO).copy()
-        form_map.update(PAYMENT_CONDITIONS_MAP)
+        form_map = FORM_MAPS[proposta.desconto_aplicado > 0]
         
         # Converter dados do backend para o formato dos campos do formulário PDF
         form_data = {pdf_field: str(backend_data.get(key, "")) for key, pdf_field in form_map.items() if key in backend_data}
         
         # Adicionar dados específicos de cenários
-        for nome_cenario, cenario in backend_data.get('cenarios', {}).items():
+        for nome_cenario, cenario in matriz.items():
             suffix_map = {"Comfort 10 anos": "10_anos", "Comfort 18 mm": "18mm", "Ultralight": "ultralight"}
             sufixo = suffix_map.get(nome_cenario)
             if not sufixo:
                 continue
                 
-            cond_pagto = cenario.get('condicoes_pagamento', {})
+            quadro = cenario.condicoes
             
             # À vista
-            a_v = cond_pagto.get('a_vista', {})
-            if 'valor_total' in a_v:
-                form_data[form_map.get(f"a_vista_{sufixo}", "")] = f"R$ {a_v.get('valor_total', 0):.2f}"
-                form_data[form_map.get(f"total_{sufixo}", "")] = f"R$ {a_v.get('valor_total', 0):.2f}"
+            form_data[form_map.get(f"a_vista_{sufixo}", "")] = formatar_centavos(quadro.a_vista.valor_total)
+            form_data[form_map.get(f"total_{sufixo}", "")] = formatar_centavos(quadro.a_vista.valor_total)
             
             # 2x sem juros
-            duas = cond_pagto.get('duas_vezes', {})
-            parcelas2 = duas.get('parcelas', [])
+            duas = quadro.opcao("duas_vezes")
+            parcelas2 = duas.valores_parcelas
             if len(parcelas2) >= 2:
-                form_data[form_map.get(f"primeira_parcela_2x_{sufixo}", "")] = f"R$ {parcelas2[0].get('valor', 0):.2f}"
-                form_data[form_map.get(f"segunda_parcela_2x_{sufixo}", "")] = f"R$ {parcelas2[1].get('valor', 0):.2f}"
-            if 'valor_total' in duas:
-                form_data[form_map.get(f"total_2x_{sufixo}", "")] = f"R$ {duas.get('valor_total', 0):.2f}"
+                form_data[form_map.get(f"primeira_parcela_2x_{sufixo}", "")] = formatar_centavos(parcelas2[0])
+                form_data[form_map.get(f"segunda_parcela_2x_{sufixo}", "")] = formatar_centavos(parcelas2[1])
+            form_data[form_map.get(f"total_2x_{sufixo}", "")] = formatar_centavos(duas.valor_total)
             
             # 3x
-            tres = cond_pagto.get('tres_vezes', {})
-            parcelas3 = tres.get('parcelas', [])
+            tres = quadro.opcao("tres_vezes")
+            parcelas3 = tres.valores_parcelas
             if len(parcelas3) >= 1:
-                form_data[form_map.get(f"sinal_50_3x_{sufixo}", "")] = f"R$ {parcelas3[0].get('valor', 0):.2f}"
+                form_data[form_map.get(f"sinal_50_3x_{sufixo}", "")] = formatar_centavos(parcelas3[0])
             if len(parcelas3) >= 2:
-                form_data[form_map.get(f"primeira_parcela_3x_{sufixo}", "")] = f"R$ {parcelas3[1].get('valor', 0):.2f}"
+                form_data[form_map.get(f"primeira_parcela_3x_{sufixo}", "")] = formatar_centavos(parcelas3[1])
             if len(parcelas3) >= 3:
-                form_data[form_map.get(f"segunda_parcela_3x_{sufixo}", "")] = f"R$ {parcelas3[2].get('valor', 0):.2f}"
-                form_data[form_map.get(f"terceira_parcela_3x_{sufixo}", "")] = f"R$ {parcelas3[2].get('valor', 0):.2f}"
-            if 'valor_total' in tres:
-                form_data[form_map.get(f"total_3x_{sufixo}", "")] = f"R$ {tres.get('valor_total', 0):.2f}"
+                form_data[form_map.get(f"segunda_parcela_3x_{sufixo}", "")] = formatar_centavos(parcelas3[2])
+                form_data[form_map.get(f"terceira_parcela_3x_{sufixo}", "")] = formatar_centavos(parcelas3[2])
+            form_data[form_map.get(f"total_3x_{sufixo}", "")] = formatar_centavos(tres.valor_total)
             
             # 4x
-            quatro = cond_pagto.get('quatro_vezes', {})
-            parcelas4 = quatro.get('parcelas', [])
+            quatro = quadro.opcao("quatro_vezes")
+            parcelas4 = quatro.valores_parcelas
             if len(parcelas4) >= 1:
-                form_data[form_map.get(f"sinal_60_4x_{sufixo}", "")] = f"R$ {parcelas4[0].get('valor', 0):.2f}"
+                form_data[form_map.get(f"sinal_60_4x_{sufixo}", "")] = formatar_centavos(parcelas4[0])
             if len(parcelas4) >= 2:
-                form_data[form_map.get(f"primeira_parcela_4x_{sufixo}", "")] = f"R$ {parcelas4[1].get('valor', 0):.2f}"
+                form_data[form_map.get(f"primeira_parcela_4x_{sufixo}", "")] = formatar_centavos(parcelas4[1])
             if len(parcelas4) >= 3:
-                form_data[form_map.get(f"segunda_parcela_4x_{sufixo}", "")] = f"R$ {parcelas4[2].get('valor', 0):.2f}"
+                form_data[form_map.get(f"segunda_parcela_4x_{sufixo}", "")] = formatar_centavos(parcelas4[2])
             if len(parcelas4) >= 4:
-                form_data[form_map.get(f"terceira_parcela_4x_{sufixo}", "")] = f"R$ {parcelas4[3].get('valor', 0):.2f}"
-                form_data[form_map.get(f"quarta_parcela_4x_{sufixo}", "")] = f"R$ {parcelas4[3].get('valor', 0):.2f}"
-            if 'valor_total' in quatro:
-                form_data[form_map.get(f"total_4x_{sufixo}", "")] = f"R$ {quatro.get('valor_total', 0):.2f}"
+                form_data[form_map.get(f"terceira_parcela_4x_{sufixo}", "")] = formatar_centavos(parcelas4[3])
+                form_data[form_map.get(f"quarta_parcela_4x_{sufixo}", "")] = formatar_centavos(parcelas4[3])
+            form_data[form_map.get(f"total_4x_{sufixo}", "")] = formatar_centavos(quatro.valor_total)
             
             # Cartão de crédito
-            cartao = cond_pagto.get('cartao', {})
-            for n in range(4, 11):
-                opc = cartao.get(f"{n}x", {})
-                if 'valor_parcela' in opc:
-                    campo = form_map.get(f"cartao_{n}_parcelas_{sufixo}", "")
-                    if campo:
-                        form_data[campo] = f"R$ {opc.get('valor_parcela', 0):.2f}"
+            for opcao in quadro.cartao:
+                campo = form_map.get(f"cartao_{opcao.numero_parcelas}_parcelas_{sufixo}", "")
+                if campo:
+                    form_data[campo] = formatar_centavos(opcao.valor_parcela)
 
-        # Criar arquivos temporários para o PDF
-        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_template:
-            # Baixar template
-            desconto = data.get("desconto_aplicado", 0)
+        # Baixar template
+        desconto = proposta.desconto_aplicado / 100
+        with logger_service.etapa("template"):
             template_url, template_type = await pdf_service.selecionar_template(desconto)
-            template_bytes = await pdf_service.baixar_template(template_url)
+            template_bytes = await pdf_service.obter_template(template_url)
+        
+        # Criar arquivos temporários para o PDF
+        diretorio_temporario = encerramento.diretorio_temporario()
+        with tempfile.NamedTemporaryFile(suffix=".pdf", dir=diretorio_temporario, delete=False) as temp_template:
+            temporarios.append(temp_template.name)
             temp_template.write(template_bytes)
             temp_template_path = temp_template.name
         
         # Nome do arquivo de saída
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_filename = f"proposta_{proposta_id}_{timestamp}.pdf"
-        output_path = os.path.join("/tmp", output_filename)
+        output_path = os.path.join(diretorio_temporario, output_filename)
+        temporarios.append(output_path)
         
         # Preencher o formulário PDF
         logger_service.log_info(f"Preenchendo formulário PDF com {len(form_data)} campos")
-        pdf_service.fill_pdf_form(temp_template_path, output_path, form_data)
+        with logger_service.etapa("preencher_pdf"):
+            pdf_service.fill_pdf_form(temp_template_path, output_path, form_data)
         
         # Fazer upload do PDF gerado
         with open(output_path, "rb") as f:
             pdf_bytes = f.read()
         
         # Upload para o Supabase
-        pdf_url = await pdf_service.upload_pdf_para_supabase(pdf_bytes, output_filename)
+        with logger_service.etapa("upload"):
+            pdf_url = await pdf_service.upload_pdf_para_supabase(pdf_bytes, output_filename)
         
         logger_service.log_info(f"PDF gerado com sucesso: {pdf_url}")
         
         # Limpar arquivos temporários
-        os.unlink(temp_template_path)
-        os.unlink(output_path)
+        encerramento.remover_temporarios(temporarios)
+        temporarios.clear()
         
         # Enviar PDF por WhatsApp se o telefone estiver disponível
-        telefone_cliente = data.get("telefone_cliente")
+        telefone_cliente = proposta.telefone_cliente
         if telefone_cliente:
             logger_service.log_info(f"Enviando proposta por WhatsApp para: {telefone_cliente}")
             
             # Mensagem personalizada para o WhatsApp
-            marca = data.get("marca_veiculo", "")
-            modelo = data.get("modelo_veiculo", "")
+            marca = proposta.marca_veiculo
+            modelo = proposta.modelo_veiculo
             mensagem = f"Olá {nome_cliente}, segue sua proposta de blindagem para o {marca} {modelo}."
             
             # Enviar PDF por WhatsApp
-            whatsapp_result = await whatsapp_service.enviar_pdf_whatsapp(
-                telefone_cliente, 
-                pdf_url, 
-                mensagem
-            )
+            envio_pendente = {"proposta_id": proposta_id, "telefone": telefone_cliente,
+                              "url_pdf": pdf_url, "mensagem": mensagem}
+            with logger_service.etapa("whatsapp"):
+                whatsapp_result = await whatsapp_service.enviar_pdf_whatsapp(
+                    telefone_cliente, 
+                    pdf_url, 
+                    mensagem
+                )
+            envio_pendente = None
             logger_service.log_info(f"Proposta enviada por WhatsApp: {whatsapp_result}")
             
         # Preparar resultado final
-        resultado = {
-            "status": "success",
-            "message": "Proposta gerada com sucesso",
-            "tipo_blindagem": tipo_blindagem,
-            "valor_blindagem": valor_base,
-            "condicoes_pagamento": condicoes_pagamento,
-            "pdf_url": pdf_url
-        }
-        
-        return PropostaResponse(**resultado)
+        metricas.PROPOSTAS.inc(tipo_blindagem=tipo_blindagem, template=template_type, resultado="sucesso")
+        return _resposta(
+            status="success",
+            message="Proposta gerada com sucesso",
+            tipo_blindagem=tipo_blindagem,
+            valor_blindagem=valor_base / 100,
+            condicoes_pagamento=condicoes_pagamento,
+            campos=campos_resposta,
+        )
         
+    except asyncio.CancelledError:
+        # Cancelada no encerramento: o PDF já está no Supabase, o envio é
+        # refeito na próxima inicialização
+        if envio_pendente is not None:
+            encerramento.registrar_envio_pendente(envio_pendente)
+        metricas.PROPOSTAS.inc(tipo_blindagem=proposta.tipo_blindagem, template=template_type, resultado="cancelada")
+        raise
     except Exception as e:
         logger_service.log_error(f"Erro no processamento da proposta: {str(e)}")
-        return PropostaResponse(
+        metricas.PROPOSTAS.inc(tipo_blindagem=proposta.tipo_blindagem, template=template_type, resultado="erro")
+        return _resposta(
             status="error",
             message=f"Erro ao processar proposta: {str(e)}"
         )
+    finally:
+        encerramento.remover_temporarios(temporarios)
@@ -0,0 +1,93 @@
+"""Rotas para simulação de condições de pagamento sem geração de PDF"""
+
+import hashlib
+import json
+import math
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse
+
+from app.config import (
+    SIMULACAO_CACHE_SEGUNDOS,
+    SIMULACAO_ENDPOINT,
+    SIMULACAO_MAX_DESCONTOS,
+    SIMULACAO_VALOR_MAXIMO,
+)
+from app.schemas.proposta_schema import SimulacaoDescontosResponse
+from app.services import calculos
+from app.services.dinheiro import Centavos
+from app.services.planos_pagamento import obter_plano
+
+# Criação do router
+router = APIRouter()
+
+
+@router.get(SIMULACAO_ENDPOINT, response_model=SimulacaoDescontosResponse)
+async def simular_descontos(
+    request: Request,
+    comfort10YearsSubTotal: Optional[float] = Query(None, ge=0, le=SIMULACAO_VALOR_MAXIMO, allow_inf_nan=False),
+    comfort18mmSubTotal: Optional[float] = Query(None, ge=0, le=SIMULACAO_VALOR_MAXIMO, allow_inf_nan=False),
+    ultralightSubTotal: Optional[float] = Query(None, ge=0, le=SIMULACAO_VALOR_MAXIMO, allow_inf_nan=False),
+    desconto_inicial: float = Query(0, ge=0, le=SIMULACAO_VALOR_MAXIMO, allow_inf_nan=False),
+    desconto_final: float = Query(0, ge=0, le=SIMULACAO_VALOR_MAXIMO, allow_inf_nan=False),
+    desconto_passo: float = Query(100, gt=0, le=SIMULACAO_VALOR_MAXIMO, allow_inf_nan=False),
+):
+    """
+    Calcula a grade de condições de pagamento para cada blindagem informada
+    e cada desconto entre desconto_inicial e desconto_final (inclusive).
+
+    Subtotais e descontos vão de 0 a SIMULACAO_VALOR_MAXIMO.
+
+    Apenas cálculo: nenhum PDF é gerado. A resposta pode ser reutilizada por
+    clientes e proxies (Cache-Control/ETag) enquanto o plano de pagamento
+    não mudar.
+    """
+    # NaN passa pelas faixas ge/le e o FastAPI desta versão não repassa
+    # allow_inf_nan à validação dos parâmetros: conferido aqui
+    parametros = (comfort10YearsSubTotal, comfort18mmSubTotal, ultralightSubTotal,
+                  desconto_inicial, desconto_final, desconto_passo)
+    if not all(math.isfinite(valor) for valor in parametros if valor is not None):
+        raise HTTPException(status_code=422, detail="Subtotais e descontos devem ser números finitos")
+
+    subtotais = {
+        rotulo: valor
+        for rotulo, valor in (
+            ("Comfort 10 anos", comfort10YearsSubTotal),
+            ("Comfort 18 mm", comfort18mmSubTotal),
+            ("Ultralight", ultralightSubTotal),
+        )
+        if valor is not None
+    }
+    if not subtotais:
+        raise HTTPException(status_code=422, detail="Informe ao menos um subtotal de blindagem")
+
+    # Descontos gerados em centavos para não acumular erro de ponto flutuante
+    inicial = Centavos.de_reais(desconto_inicial)
+    final = Centavos.de_reais(desconto_final)
+    passo = max(Centavos.de_reais(desconto_passo), 1)
+    if final < inicial:
+        raise HTTPException(status_code=422, detail="desconto_final deve ser maior ou igual a desconto_inicial")
+    quantidade = (final - inicial) // passo + 1
+    if quantidade > SIMULACAO_MAX_DESCONTOS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Faixa de descontos excede o limite de {SIMULACAO_MAX_DESCONTOS} valores",
+        )
+    descontos = [(inicial + i * passo) / 100 for i in range(quantidade)]
+
+    # A mesma combinação de parâmetros e plano sempre produz a mesma grade
+    chave = json.dumps([obter_plano().versao, subtotais, inicial, final, passo], sort_keys=True)
+    etag = '"' + hashlib.sha1(chave.encode()).hexdigest() + '"'
+    headers = {
+        "Cache-Control": f"public, max-age={SIMULACAO_CACHE_SEGUNDOS}",
+        "ETag": etag,
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    try:
+        grade = calculos.calcular_grade_descontos(subtotais, descontos)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return ORJSONResponse(content=grade, headers=headers)
@@ -2,9 +2,19 @@
 Schemas para validação de dados da proposta
 """
 
-from typing import Optional, Dict, Any, List, Union
+from typing import Optional, Dict, Any, List, Literal, Union, Annotated
 from datetime import datetime
-from pydantic import BaseModel, EmailStr, Field, validator
+from pydantic import AfterValidator, BaseModel, ConfigDict, EmailStr, Field, PlainSerializer, TypeAdapter
+
+from app.services.dinheiro import Centavos
+
+# Valor monetário recebido em reais e mantido em centavos inteiros (Centavos)
+# desde a validação; volta a reais só na serialização
+Reais = Annotated[
+    float,
+    AfterValidator(Centavos.de_reais),
+    PlainSerializer(lambda centavos: centavos / 100, return_type=float),
+]
 
 
 class PropostaBase(BaseModel):
@@ -12,6 +22,9 @@ class PropostaBase(BaseModel):
     Schema base para os dados da proposta.
     Inclui validação para os campos principais e permite campos adicionais dinâmicos.
     """
+    # Permite campos extras não definidos no schema
+    model_config = ConfigDict(extra="allow")
+    
     # Campos obrigatórios do cliente
     nome_cliente: str
     telefone_cliente: str
@@ -21,62 +34,44 @@ class PropostaBase(BaseModel):
     marca_veiculo: str
     modelo_veiculo: str
     
-    # Opções de configuração
-    teto_solar: bool = False
-    abertura_porta_malas: bool = False
+    # Opções de configuração, em texto como vêm do front-end
+    # (ex.: "PANORAMICO XL", "manual"); vazias quando não escolhidas
+    teto_solar: str = ""
+    abertura_porta_malas: str = ""
     
     # Documentação
     tipo_documentacao: str
     possui_documentacao: bool = False
     
     # Opções comerciais
-    desconto_aplicado: float = 0
-    vidro_10_anos: bool = False
-    vidro_5_anos: bool = False
-    pacote_revisao: bool = False
+    desconto_aplicado: Reais = Centavos(0)
+    vidro_10_anos: str = ""
+    vidro_5_anos: str = ""
+    pacote_revisao: str = ""
     
     # Tipo de blindagem - define quais subtotais e descontos são obrigatórios
     tipo_blindagem: str
-    
-    class Config:
-        """Configuração do schema permitindo campos extras"""
-        extra = "allow"  # Permite campos extras não definidos no schema
 
 
 class PropostaComfort10Anos(PropostaBase):
     """Schema específico para propostas com blindagem Comfort 10 anos"""
-    comfort10YearsSubTotal: float
-    comfort10YearsDiscount: float = 0
-    
-    @validator('tipo_blindagem')
-    def validar_tipo_blindagem(cls, v):
-        if v != "Comfort 10 anos":
-            raise ValueError("Tipo de blindagem deve ser 'Comfort 10 anos'")
-        return v
+    tipo_blindagem: Literal["Comfort 10 anos"]
+    comfort10YearsSubTotal: Reais
+    comfort10YearsDiscount: Reais = Centavos(0)
 
 
 class PropostaComfort18mm(PropostaBase):
     """Schema específico para propostas com blindagem Comfort 18mm"""
-    comfort18mmSubTotal: float
-    comfort18mmDiscount: float = 0
-    
-    @validator('tipo_blindagem')
-    def validar_tipo_blindagem(cls, v):
-        if v != "Comfort 18 mm":
-            raise ValueError("Tipo de blindagem deve ser 'Comfort 18 mm'")
-        return v
+    tipo_blindagem: Literal["Comfort 18 mm", "Comfort 18mm"]  # aceita ambas as variações
+    comfort18mmSubTotal: Reais
+    comfort18mmDiscount: Reais = Centavos(0)
 
 
 class PropostaUltralight(PropostaBase):
     """Schema específico para propostas com blindagem Ultralight"""
-    ultralightSubTotal: float
-    ultralightDiscount: float = 0
-    
-    @validator('tipo_blindagem')
-    def validar_tipo_blindagem(cls, v):
-        if v != "Ultralight":
-            raise ValueError("Tipo de blindagem deve ser 'Ultralight'")
-        return v
+    tipo_blindagem: Literal["Ultralight"]
+    ultralightSubTotal: Reais
+    ultralightDiscount: Reais = Centavos(0)
 
 
 class PropostaNenhuma(PropostaBase):
@@ -84,18 +79,23 @@ class PropostaNenhuma(PropostaBase):
     Schema para propostas que incluem todas as opções de blindagem 
     (para comparação)
     """
-    comfort10YearsSubTotal: float
-    comfort10YearsDiscount: float = 0
-    comfort18mmSubTotal: float
-    comfort18mmDiscount: float = 0
-    ultralightSubTotal: float
-    ultralightDiscount: float = 0
-    
-    @validator('tipo_blindagem')
-    def validar_tipo_blindagem(cls, v):
-        if v != "Nenhuma":
-            raise ValueError("Tipo de blindagem deve ser 'Nenhuma'")
-        return v
+    tipo_blindagem: Literal["Nenhuma"]
+    comfort10YearsSubTotal: Reais
+    comfort10YearsDiscount: Reais = Centavos(0)
+    comfort18mmSubTotal: Reais
+    comfort18mmDiscount: Reais = Centavos(0)
+    ultralightSubTotal: Reais
+    ultralightDiscount: Reais = Centavos(0)
+
+
+# Proposta de qualquer tipo, escolhido pelo campo tipo_blindagem
+PropostaRequest = Annotated[
+    Union[PropostaComfort10Anos, PropostaComfort18mm, PropostaUltralight, PropostaNenhuma],
+    Field(discriminator="tipo_blindagem"),
+]
+
+# Validador compilado uma única vez; valida direto do JSON bruto (validate_json)
+PROPOSTA_ADAPTER: TypeAdapter[PropostaRequest] = TypeAdapter(PropostaRequest)
 
 
 class CondicoesPagamento(BaseModel):
@@ -114,3 +114,29 @@ class PropostaResponse(BaseModel):
     valor_blindagem: Optional[float] = None
     condicoes_pagamento: Optional[Union[CondicoesPagamento, Dict[str, CondicoesPagamento]]] = None
     timestamp: Optional[str] = datetime.now().isoformat()
+
+
+class GradeParcelamento(BaseModel):
+    """Colunas de uma opção parcelada na simulação (uma posição por desconto)"""
+    total: List[float]
+    entrada: Optional[List[float]] = None
+    parcela: List[float]
+    acrescimo: Optional[int] = None
+
+
+class GradeBlindagem(BaseModel):
+    """Grade de condições de pagamento de uma blindagem na simulação"""
+    # Inclui as opções de parcelamento direto definidas no plano
+    model_config = ConfigDict(extra="allow")
+    
+    subtotal: float
+    valor_base: List[float]
+    a_vista: List[float]
+    cartao: Dict[str, GradeParcelamento]
+
+
+class SimulacaoDescontosResponse(BaseModel):
+    """Resposta da simulação de descontos"""
+    versao_plano: str
+    descontos: List[float]
+    blindagens: Dict[str, GradeBlindagem]
@@ -0,0 +1,120 @@
+"""
+Controle de admissão das propostas
+
+Cada proposta preenche um PDF a partir do template (alguns MB em memória) e
+faz upload e envio por WhatsApp. Sem limite, um pico de requisições inicia
+todas ao mesmo tempo: a memória cresce com o número de propostas e a
+latência de todas aumenta junto. Por worker:
+
+- no máximo ADMISSAO_LIMITE propostas em execução;
+- até ADMISSAO_FILA propostas aguardando vaga, por no máximo ADMISSAO_ESPERA
+  segundos, na ordem de chegada;
+- além disso, a proposta é recusada (503 com Retry-After) sem ser iniciada.
+
+A memória fica limitada pelo limite de execução e a latência de quem é
+admitido, pelo limite de espera.
+"""
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict
+
+from app.config import ADMISSAO_ESPERA, ADMISSAO_FILA, ADMISSAO_LIMITE
+from app.services import metricas
+
+
+class ControleAdmissao:
+    """Vagas de execução e fila de espera limitada (ADMISSAO_LIMITE <= 0 desativa)"""
+
+    def __init__(self, limite: int = ADMISSAO_LIMITE, fila: int = ADMISSAO_FILA,
+                 espera: float = ADMISSAO_ESPERA):
+        self.limite = limite
+        self.fila = fila
+        self.espera = espera
+        self.em_execucao = 0
+        self.recusadas = 0
+        self._aguardando: Deque[asyncio.Future] = deque()
+
+    @property
+    def aguardando(self) -> int:
+        return len(self._aguardando)
+
+    @asynccontextmanager
+    async def vaga(self):
+        """
+        Ocupa uma vaga enquanto o bloco executa
+
+        Produz True se a proposta foi admitida e False se foi recusada (fila
+        cheia ou espera esgotada); nesse caso o bloco deve recusá-la.
+        """
+        if self.limite <= 0:
+            yield True
+            return
+        if not await self._entrar():
+            self.recusadas += 1
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            self._sair()
+
+    async def _entrar(self) -> bool:
+        if self.em_execucao < self.limite and not self._aguardando:
+            self.em_execucao += 1
+            return True
+        if len(self._aguardando) >= self.fila:
+            return False
+
+        futuro = asyncio.get_running_loop().create_future()
+        self._aguardando.append(futuro)
+        try:
+            with metricas.PROPOSTAS_AGUARDANDO.em_andamento():
+                await asyncio.wait_for(futuro, self.espera)
+            return True
+        except BaseException as e:
+            # A vaga pode ter sido repassada junto com o cancelamento: repassa adiante
+            if futuro.done() and not futuro.cancelled():
+                self._sair()
+            if isinstance(e, asyncio.TimeoutError):
+                return False
+            raise
+        finally:
+            if futuro in self._aguardando:
+                self._aguardando.remove(futuro)
+
+    def _sair(self) -> None:
+        """Repassa a vaga à próxima proposta da fila, ou a libera"""
+        while self._aguardando:
+            futuro = self._aguardando.popleft()
+            if not futuro.done():
+                futuro.set_result(None)
+                return
+        self.em_execucao -= 1
+
+    def estado(self) -> Dict[str, Any]:
+        return {
+            "limite": self.limite,
+            "em_execucao": self.em_execucao,
+            "aguardando": self.aguardando,
+            "fila": self.fila,
+            "recusadas": self.recusadas,
+        }
+
+
+_controle = ControleAdmissao()
+
+
+def vaga():
+    """Vaga de execução para uma proposta (ver ControleAdmissao.vaga)"""
+    return _controle.vaga()
+
+
+def fila_cheia() -> bool:
+    """Se novas propostas seriam recusadas sem espera"""
+    return _controle.limite > 0 and _controle.aguardando >= _controle.fila \
+        and _controle.em_execucao >= _controle.limite
+
+
+def estado() -> Dict[str, Any]:
+    return _controle.estado()
@@ -1,160 +1,495 @@
 """
 Módulo para cálculos de condições de pagamento
+
+Todos os valores monetários são calculados em centavos inteiros (ver
+app.services.dinheiro) e convertidos para reais apenas no resultado.
 """
-from typing import Dict, Any, List, Tuple
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, Collection, Dict, Any, List, Optional, Tuple, Union
+
+from app.config import CACHE_CONDICOES_TAMANHO
+from app.services.dinheiro import Centavos, arredondar
+from app.schemas.proposta_schema import PropostaBase
+from app.services.planos_pagamento import PlanoPagamento, obter_plano
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Blindagens comparadas quando tipo_blindagem == "Nenhuma" (chave nos subtotais, rótulo)
+BLINDAGENS_COMPARACAO = (
+    ("comfort10_anos", "Comfort 10 anos"),
+    ("comfort18mm", "Comfort 18 mm"),
+    ("ultralight", "Ultralight"),
+)
+
+# Maior valor base (em reais, em módulo) do cálculo vetorizado: os produtos
+# intermediários em centavos precisam caber em int64
+VALOR_MAXIMO_VETORIZADO = 10 ** 10
+
+# Campo do subtotal de cada tipo de blindagem escolhido
+CAMPOS_SUBTOTAL = {
+    "Comfort 10 anos": "comfort10YearsSubTotal",
+    "Comfort 18 mm": "comfort18mmSubTotal",
+    "Comfort 18mm": "comfort18mmSubTotal",
+    "Ultralight": "ultralightSubTotal",
+}
+
+ZERO = Centavos(0)
 
+# Rótulo canônico de cada tipo de blindagem (aceita ambas as variações de 18 mm)
+ROTULOS_BLINDAGEM = {
+    "Comfort 10 anos": "Comfort 10 anos",
+    "Comfort 18 mm": "Comfort 18 mm",
+    "Comfort 18mm": "Comfort 18 mm",
+    "Ultralight": "Ultralight",
+}
 
-def calcular_subtotais_blindagem(data: Dict[str, Any]) -> Dict[str, Any]:
+
+@dataclass(frozen=True, slots=True)
+class OpcaoPagamento:
+    """
+    Uma opção de pagamento (à vista, parcelado direto ou cartão)
+    
+    Valores em centavos. Com entrada, a primeira parcela é a entrada e as
+    demais valem valor_parcela; sem entrada, todas valem valor_parcela.
+    """
+    chave: str
+    numero_parcelas: int
+    valor_total: int
+    valor_parcela: int
+    valor_entrada: int = 0
+    entrada_percentual: int = 0
+    acrescimo_percentual: int = 0
+    desconto_percentual: int = 0
+    
+    @property
+    def valores_parcelas(self) -> Tuple[int, ...]:
+        """Valor de cada parcela, na ordem de pagamento"""
+        if self.entrada_percentual:
+            return (self.valor_entrada,) + (self.valor_parcela,) * (self.numero_parcelas - 1)
+        return (self.valor_parcela,) * self.numero_parcelas
+    
+    def _parcelas_dict(self) -> List[Dict[str, Any]]:
+        parcelas = [{"numero": n, "valor": v / 100} for n, v in enumerate(self.valores_parcelas, 1)]
+        if self.entrada_percentual:
+            parcelas[0]["tipo"] = "entrada"
+        return parcelas
+    
+    def a_vista_dict(self) -> Dict[str, Any]:
+        """Representação da opção à vista na resposta da API"""
+        return {
+            "valor_total": self.valor_total / 100,
+            "desconto_percentual": self.desconto_percentual,
+            "parcelas": self._parcelas_dict()
+        }
+    
+    def parcelado_dict(self) -> Dict[str, Any]:
+        """Representação de uma opção de parcelado direto na resposta da API"""
+        opcao = {"valor_total": self.valor_total / 100}
+        if self.acrescimo_percentual:
+            opcao["acrescimo_percentual"] = self.acrescimo_percentual
+        else:
+            opcao["desconto_percentual"] = self.desconto_percentual
+        opcao["parcelas"] = self._parcelas_dict()
+        return opcao
+    
+    def compacto_dict(self) -> Dict[str, Any]:
+        """
+        Representação compacta, com as chaves curtas da grade de simulação:
+        sem a lista de parcelas (derivável de parcelas, entrada e parcela) e
+        sem percentuais zerados
+        """
+        opcao = {"parcelas": self.numero_parcelas, "total": self.valor_total / 100}
+        if self.entrada_percentual:
+            opcao["entrada"] = self.valor_entrada / 100
+        opcao["parcela"] = self.valor_parcela / 100
+        if self.acrescimo_percentual:
+            opcao["acrescimo"] = self.acrescimo_percentual
+        if self.desconto_percentual:
+            opcao["desconto"] = self.desconto_percentual
+        return opcao
+    
+    def cartao_dict(self) -> Dict[str, Any]:
+        """Representação de uma opção de cartão na resposta da API"""
+        return {
+            "acrescimo": self.acrescimo_percentual,
+            "valor_total": self.valor_total / 100,
+            "valor_parcela": self.valor_parcela / 100
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class QuadroPagamento:
+    """Todas as condições de pagamento de um valor base (em centavos)"""
+    valor_base: int
+    a_vista: OpcaoPagamento
+    parcelado_direto: Tuple[OpcaoPagamento, ...]
+    cartao: Tuple[OpcaoPagamento, ...]
+    
+    def opcao(self, chave: str) -> OpcaoPagamento:
+        """Retorna a opção de parcelado direto ou cartão pela chave (ex.: "tres_vezes", "6x")"""
+        for opcao in self.parcelado_direto + self.cartao:
+            if opcao.chave == chave:
+                return opcao
+        raise KeyError(chave)
+    
+    def para_dict(self) -> Dict[str, Any]:
+        """
+        Converte para o formato de dicionário da resposta da API
+        
+        Inclui as chaves de cada opção (a_vista, duas_vezes, ..., cartao) e as
+        visões valor_base, parcelado_direto e parcelado_cartao, que
+        referenciam os mesmos dicionários.
+        """
+        resultado = {"a_vista": self.a_vista.a_vista_dict()}
+        parcelado_direto = []
+        for opcao in self.parcelado_direto:
+            resultado[opcao.chave] = opcao.parcelado_dict()
+            parcelado_direto.append(resultado[opcao.chave])
+        resultado["cartao"] = {opcao.chave: opcao.cartao_dict() for opcao in self.cartao}
+        resultado["valor_base"] = self.valor_base / 100
+        resultado["parcelado_direto"] = parcelado_direto
+        resultado["parcelado_cartao"] = list(resultado["cartao"].values())
+        return resultado
+    
+    def para_resposta(self, compacto: bool = False,
+                      campos: Optional[Collection[str]] = None) -> Dict[str, Any]:
+        """
+        Converte para o formato de CondicoesPagamento da resposta da API
+        
+        Apenas valor_base, a_vista, parcelado_direto e parcelado_cartao, na
+        ordem do schema, prontos para serialização direta em JSON.
+        
+        Args:
+            compacto: Usa OpcaoPagamento.compacto_dict (sem a lista de parcelas)
+            campos: Chaves a incluir; None inclui todas
+        """
+        resposta = {}
+        if campos is None or "valor_base" in campos:
+            resposta["valor_base"] = self.valor_base / 100
+        if compacto:
+            if campos is None or "a_vista" in campos:
+                resposta["a_vista"] = self.a_vista.compacto_dict()
+            if campos is None or "parcelado_direto" in campos:
+                resposta["parcelado_direto"] = [opcao.compacto_dict() for opcao in self.parcelado_direto]
+            if campos is None or "parcelado_cartao" in campos:
+                resposta["parcelado_cartao"] = [opcao.compacto_dict() for opcao in self.cartao]
+        else:
+            if campos is None or "a_vista" in campos:
+                resposta["a_vista"] = self.a_vista.a_vista_dict()
+            if campos is None or "parcelado_direto" in campos:
+                resposta["parcelado_direto"] = [opcao.parcelado_dict() for opcao in self.parcelado_direto]
+            if campos is None or "parcelado_cartao" in campos:
+                resposta["parcelado_cartao"] = [opcao.cartao_dict() for opcao in self.cartao]
+        return resposta
+
+
+@dataclass(frozen=True, slots=True)
+class CenarioBlindagem:
+    """Cenário de uma blindagem na proposta (valores em centavos)"""
+    rotulo: str
+    subtotal: int
+    valor_final: int
+    condicoes: QuadroPagamento
+
+
+def _opcao_parcelada(base, acrescimo: int, entrada: int, parcelas: int) -> Tuple[Any, Any, Any]:
+    """
+    Calcula total, entrada e valor de cada parcela de uma opção parcelada
+    
+    A entrada é um percentual do total com acréscimo; o restante é dividido
+    igualmente entre as demais parcelas (ou entre todas, quando não há
+    entrada). Cada valor é arredondado uma única vez a partir da fração exata.
+    
+    Args:
+        base: Valor base em centavos (int ou array de inteiros)
+        acrescimo: Acréscimo percentual sobre o valor base
+        entrada: Percentual do total pago como entrada (0 se não houver)
+        parcelas: Número total de parcelas (inclui a entrada)
+        
+    Returns:
+        Tupla (total, entrada, parcela) em centavos
+    """
+    total = base * (100 + acrescimo)  # centavos x 100
+    restantes = parcelas - 1 if entrada else parcelas
+    return (
+        arredondar(total, 100),
+        arredondar(total * entrada, 100 * 100),
+        arredondar(total * (100 - entrada), 100 * 100 * restantes),
+    )
+
+
+@lru_cache(maxsize=CACHE_CONDICOES_TAMANHO)
+def _condicoes_em_centavos(plano: PlanoPagamento, base: int) -> QuadroPagamento:
+    """
+    Calcula todas as opções do plano para um valor base em centavos
+    
+    O resultado é imutável e fica em cache por (versão do plano, valor base),
+    de modo que cotações repetidas não refazem os cálculos.
+    """
+    a_vista = arredondar(base * (100 - plano.desconto_a_vista), 100)
+    direto = []
+    for regra in plano.parcelado_direto:
+        total, entrada, parcela = _opcao_parcelada(
+            base, regra.acrescimo_percentual, regra.entrada_percentual, regra.parcelas
+        )
+        direto.append(OpcaoPagamento(
+            chave=regra.chave,
+            numero_parcelas=regra.parcelas,
+            valor_total=total,
+            valor_parcela=parcela,
+            valor_entrada=entrada,
+            entrada_percentual=regra.entrada_percentual,
+            acrescimo_percentual=regra.acrescimo_percentual,
+        ))
+    cartao = []
+    for regra in plano.cartao:
+        total, _, parcela = _opcao_parcelada(base, regra.acrescimo_percentual, 0, regra.parcelas)
+        cartao.append(OpcaoPagamento(
+            chave=regra.chave,
+            numero_parcelas=regra.parcelas,
+            valor_total=total,
+            valor_parcela=parcela,
+            acrescimo_percentual=regra.acrescimo_percentual,
+        ))
+    return QuadroPagamento(
+        valor_base=int(base),
+        a_vista=OpcaoPagamento(
+            chave="a_vista",
+            numero_parcelas=1,
+            valor_total=a_vista,
+            valor_parcela=a_vista,
+            desconto_percentual=plano.desconto_a_vista,
+        ),
+        parcelado_direto=tuple(direto),
+        cartao=tuple(cartao),
+    )
+
+
+def calcular_subtotais_blindagem(data: Union[PropostaBase, Dict[str, Any]]) -> Dict[str, Any]:
     """
     Calcula os subtotais das blindagens com base no tipo de blindagem selecionado
     e aplica o desconto, se houver.
     
     Args:
-        data: Dados da proposta
+        data: Proposta já validada (PROPOSTA_ADAPTER), com os valores já em
+            Centavos, ou dicionário com os mesmos campos em reais
         
     Returns:
-        Dicionário com os valores calculados para cada tipo de blindagem
+        Dicionário com os valores calculados para cada tipo de blindagem,
+        todos em Centavos (convertidos para reais só na resposta e no PDF)
     """
-    tipo_blindagem = data.get("tipo_blindagem")
-    desconto_aplicado = data.get("desconto_aplicado", 0)
+    if isinstance(data, PropostaBase):
+        # Campos de outros tipos de blindagem não existem no modelo validado
+        campo = lambda nome, padrao=ZERO: getattr(data, nome, padrao)
+    else:
+        campo = lambda nome, padrao=ZERO: data.get(nome, padrao)
     
-    # Obtém os subtotais
-    comfort10_subtotal = float(data.get("comfort10YearsSubTotal", 0))
-    comfort18_subtotal = float(data.get("comfort18mmSubTotal", 0))
-    ultralight_subtotal = float(data.get("ultralightSubTotal", 0))
+    tipo_blindagem = campo("tipo_blindagem", None)
+    # Centavos.de_reais devolve o próprio valor quando já está em centavos
+    desconto_aplicado = Centavos.de_reais(campo("desconto_aplicado"))
     
     # Calcula os valores de acordo com o tipo de blindagem
     resultado = {
         "tipo_blindagem": tipo_blindagem,
-        "desconto_aplicado": desconto_aplicado
+        "desconto_aplicado": desconto_aplicado,
+        "valor_base": ZERO,  # Não há valor base para "Nenhuma" ou tipo não reconhecido
     }
     
     if tipo_blindagem == "Nenhuma":
         # Para tipo "Nenhuma", retorna todos os subtotais para comparação
-        resultado["comfort10_anos"] = {"subtotal": comfort10_subtotal, "valor_final": comfort10_subtotal - desconto_aplicado}
-        resultado["comfort18mm"] = {"subtotal": comfort18_subtotal, "valor_final": comfort18_subtotal - desconto_aplicado}
-        resultado["ultralight"] = {"subtotal": ultralight_subtotal, "valor_final": ultralight_subtotal - desconto_aplicado}
-        resultado["valor_base"] = 0  # Não há valor base para "Nenhuma"
-    elif tipo_blindagem == "Comfort 10 anos":
-        resultado["valor_base"] = comfort10_subtotal - desconto_aplicado
-    elif tipo_blindagem in ("Comfort 18 mm", "Comfort 18mm"):  # suporta ambas as variações
-        resultado["valor_base"] = comfort18_subtotal - desconto_aplicado
-    elif tipo_blindagem == "Ultralight":
-        resultado["valor_base"] = ultralight_subtotal - desconto_aplicado
+        for chave, nome in (("comfort10_anos", "comfort10YearsSubTotal"),
+                            ("comfort18mm", "comfort18mmSubTotal"),
+                            ("ultralight", "ultralightSubTotal")):
+            subtotal = Centavos.de_reais(campo(nome))
+            resultado[chave] = {"subtotal": subtotal, "valor_final": Centavos(subtotal - desconto_aplicado)}
     else:
-        # Tipo não reconhecido
-        resultado["valor_base"] = 0
+        # Suporta ambas as variações de 18 mm
+        nome = CAMPOS_SUBTOTAL.get(tipo_blindagem)
+        if nome is not None:
+            subtotal = Centavos.de_reais(campo(nome))
+            resultado["subtotal"] = subtotal
+            resultado["valor_base"] = Centavos(subtotal - desconto_aplicado)
         
     return resultado
 
 
-def calcular_condicoes_pagamento(subtotais: Dict[str, Any]) -> Dict[str, Any]:
+def calcular_condicoes_pagamento(subtotais: Dict[str, Any]) -> QuadroPagamento:
     """
     Calcula todas as condições de pagamento com base nos subtotais
     
+    As regras vêm do plano de pagamento vigente (config/planos_pagamento.json).
+    Sem valor base (tipo_blindagem == "Nenhuma"), todos os valores são zero.
+    O resultado é imutável e compartilhado entre cotações do mesmo valor;
+    use QuadroPagamento.para_dict() para obter o formato da resposta da API.
+    
     Args:
-        subtotais: Dicionário com os subtotais calculados
+        subtotais: Dicionário com os subtotais calculados; valor_base em
+            Centavos ou em reais (int/float)
         
     Returns:
-        Dicionário com todas as condições de pagamento
+        Quadro com todas as condições de pagamento
     """
-    tipo_blindagem = subtotais.get("tipo_blindagem")
-    valor_base = subtotais.get("valor_base", 0)
-    
-    # Se não houver valor base (tipo_blindagem == "Nenhuma"), retorna valores zerados
-    if valor_base == 0:
-        return {
-            "a_vista": {"valor_total": 0, "parcelas": [{"numero": 1, "valor": 0}]},
-            "duas_vezes": {"valor_total": 0, "parcelas": [{"numero": 1, "valor": 0}, {"numero": 2, "valor": 0}]},
-            "tres_vezes": {"valor_total": 0, "parcelas": [{"numero": 1, "valor": 0}, {"numero": 2, "valor": 0}, {"numero": 3, "valor": 0}]},
-            "quatro_vezes": {"valor_total": 0, "parcelas": [{"numero": 1, "valor": 0}, {"numero": 2, "valor": 0}, {"numero": 3, "valor": 0}, {"numero": 4, "valor": 0}]},
-            "cartao": {
-                "4x": {"acrescimo": 6, "valor_total": 0, "valor_parcela": 0},
-                "5x": {"acrescimo": 7, "valor_total": 0, "valor_parcela": 0},
-                "6x": {"acrescimo": 8, "valor_total": 0, "valor_parcela": 0},
-                "7x": {"acrescimo": 9, "valor_total": 0, "valor_parcela": 0},
-                "8x": {"acrescimo": 10, "valor_total": 0, "valor_parcela": 0},
-                "9x": {"acrescimo": 11, "valor_total": 0, "valor_parcela": 0},
-                "10x": {"acrescimo": 12, "valor_total": 0, "valor_parcela": 0}
-            }
-        }
+    return _condicoes_em_centavos(obter_plano(), Centavos.de_reais(subtotais.get("valor_base", 0)))
+
+
+def calcular_matriz_cenarios(subtotais: Dict[str, Any]) -> Dict[str, CenarioBlindagem]:
+    """
+    Calcula uma única vez as condições de pagamento de cada cenário da proposta
     
-    # Calculando todas as opções de pagamento
-    resultado = {}
+    Para "Nenhuma" há um cenário por blindagem comparada; para os demais tipos,
+    um único cenário com a blindagem escolhida. Log, resposta e PDF leem o
+    mesmo objeto, sem recalcular.
     
-    # À vista: 2% de desconto
-    valor_a_vista = valor_base * 0.98
-    resultado["a_vista"] = {
-        "valor_total": valor_a_vista,
-        "desconto_percentual": 2,
-        "parcelas": [{"numero": 1, "valor": valor_a_vista}]
-    }
+    Args:
+        subtotais: Dicionário retornado por calcular_subtotais_blindagem
+        
+    Returns:
+        Dicionário rótulo da blindagem -> CenarioBlindagem, na ordem de
+        apresentação
+    """
+    tipo_blindagem = subtotais.get("tipo_blindagem")
     
-    # 2 parcelas: divide o valor por 2
-    resultado["duas_vezes"] = {
-        "valor_total": valor_base,
-        "desconto_percentual": 0,
-        "parcelas": [
-            {"numero": 1, "valor": valor_base / 2},
-            {"numero": 2, "valor": valor_base / 2}
+    if tipo_blindagem == "Nenhuma":
+        cenarios = [
+            (rotulo, subtotais[chave]["subtotal"], subtotais[chave]["valor_final"])
+            for chave, rotulo in BLINDAGENS_COMPARACAO
         ]
-    }
+    else:
+        rotulo = ROTULOS_BLINDAGEM.get(tipo_blindagem, tipo_blindagem)
+        cenarios = [(rotulo, subtotais.get("subtotal", ZERO), subtotais.get("valor_base", ZERO))]
     
-    # 3 parcelas: sinal de 50% + 2 parcelas com acréscimo de 1%
-    valor_tres_vezes = valor_base * 1.01
-    valor_entrada_3x = valor_tres_vezes * 0.5
-    valor_parcela_3x = (valor_tres_vezes - valor_entrada_3x) / 2
-    resultado["tres_vezes"] = {
-        "valor_total": valor_tres_vezes,
-        "acrescimo_percentual": 1,
-        "parcelas": [
-            {"numero": 1, "valor": valor_entrada_3x, "tipo": "entrada"},
-            {"numero": 2, "valor": valor_parcela_3x},
-            {"numero": 3, "valor": valor_parcela_3x}
-        ]
+    return {
+        rotulo: CenarioBlindagem(
+            rotulo=rotulo,
+            subtotal=Centavos.de_reais(subtotal),
+            valor_final=Centavos.de_reais(valor_final),
+            condicoes=calcular_condicoes_pagamento({"valor_base": valor_final}),
+        )
+        for rotulo, subtotal, valor_final in cenarios
     }
+
+
+def calcular_condicoes_pagamento_vetorizado(valores_base) -> Dict[str, "np.ndarray"]:
+    """
+    Calcula as condições de pagamento para vários valores base de uma só vez
     
-    # 4 parcelas: sinal de 60% + 3 parcelas com acréscimo de 3%
-    valor_quatro_vezes = valor_base * 1.03
-    valor_entrada_4x = valor_quatro_vezes * 0.6
-    valor_parcela_4x = (valor_quatro_vezes - valor_entrada_4x) / 3
-    resultado["quatro_vezes"] = {
-        "valor_total": valor_quatro_vezes,
-        "acrescimo_percentual": 3,
-        "parcelas": [
-            {"numero": 1, "valor": valor_entrada_4x, "tipo": "entrada"},
-            {"numero": 2, "valor": valor_parcela_4x},
-            {"numero": 3, "valor": valor_parcela_4x},
-            {"numero": 4, "valor": valor_parcela_4x}
-        ]
-    }
+    Aplica exatamente as mesmas operações em centavos de
+    calcular_condicoes_pagamento, mas sobre arrays NumPy de inteiros,
+    devolvendo o resultado em reais e em formato colunar (uma posição
+    por valor base). Cada opção do parcelado direto gera as colunas
+    "<chave>_total", "<chave>_entrada" e "<chave>_parcela"; as colunas de
+    cartão são matrizes com uma linha por valor base e uma coluna por opção
+    de parcelamento do plano.
+    
+    Args:
+        valores_base: Sequência ou array com os valores base (já com desconto)
+        
+    Returns:
+        Dicionário de arrays com os valores de cada condição de pagamento
+        
+    Raises:
+        ValueError: valor base infinito, NaN ou acima de VALOR_MAXIMO_VETORIZADO
+    """
+    # NumPy só é importado na primeira simulação (ou no aquecimento)
+    import numpy as np
+
+    plano = obter_plano()
+    reais = np.asarray(valores_base, dtype=np.float64).reshape(-1)
+    if not np.all(np.abs(reais) <= VALOR_MAXIMO_VETORIZADO):
+        raise ValueError(f"Valores base devem ser finitos e até {VALOR_MAXIMO_VETORIZADO} em módulo")
+    # Conversão para centavos com o mesmo resultado de Centavos.de_reais, que
+    # lê o float pela representação decimal: 1.005 * 100 vale 100.4999..., mas
+    # 1.005 é o float mais próximo do empate 100.5 centavos e sobe para 101.
+    # Arredonda o produto e corrige em um centavo comparando o valor com os
+    # floats mais próximos dos empates vizinhos, (2c - 1) / 200 e (2c + 1) / 200
+    centavos = np.floor(reais * 100 + 0.5)
+    centavos -= reais < (2 * centavos - 1) / 200
+    centavos += reais >= (2 * centavos + 1) / 200
+    base = centavos.astype(np.int64)
     
-    # Opções de cartão de crédito
-    resultado["cartao"] = {}
-    
-    # De 4x a 10x com acréscimos crescentes
-    acrescimos = {
-        "4x": 6,
-        "5x": 7,
-        "6x": 8,
-        "7x": 9,
-        "8x": 10,
-        "9x": 11,
-        "10x": 12
+    resultado = {
+        "valor_base": base / 100,
+        "a_vista": arredondar(base * (100 - plano.desconto_a_vista), 100) / 100,
     }
     
-    for parcelas, acrescimo in acrescimos.items():
-        num_parcelas = int(parcelas.replace("x", ""))
-        valor_total_cartao = valor_base * (1 + acrescimo/100)
-        valor_parcela_cartao = valor_total_cartao / num_parcelas
+    # Parcelado direto
+    for regra in plano.parcelado_direto:
+        total, entrada, parcela = _opcao_parcelada(
+            base, regra.acrescimo_percentual, regra.entrada_percentual, regra.parcelas
+        )
+        resultado[f"{regra.chave}_total"] = total / 100
+        resultado[f"{regra.chave}_entrada"] = entrada / 100
+        resultado[f"{regra.chave}_parcela"] = parcela / 100
+    
+    # Cartão de crédito: uma coluna por opção de parcelamento
+    cartao_parcelas = np.array([regra.parcelas for regra in plano.cartao], dtype=np.int64)
+    cartao_acrescimos = np.array([regra.acrescimo_percentual for regra in plano.cartao], dtype=np.int64)
+    cartao_total, _, cartao_parcela = _opcao_parcelada(
+        base[:, np.newaxis], cartao_acrescimos, 0, cartao_parcelas
+    )
+    resultado["cartao_parcelas"] = cartao_parcelas
+    resultado["cartao_acrescimos"] = cartao_acrescimos
+    resultado["cartao_total"] = cartao_total / 100
+    resultado["cartao_parcela"] = cartao_parcela / 100
+    
+    return resultado
+
+
+def calcular_grade_descontos(subtotais: Dict[str, float], descontos: List[float]) -> Dict[str, Any]:
+    """
+    Calcula a grade completa de condições de pagamento para cada combinação
+    de blindagem e desconto, em uma única chamada vetorizada
+    
+    Args:
+        subtotais: Rótulo da blindagem -> subtotal (sem desconto)
+        descontos: Valores de desconto a simular
         
-        resultado["cartao"][parcelas] = {
-            "acrescimo": acrescimo,
-            "valor_total": valor_total_cartao,
-            "valor_parcela": valor_parcela_cartao
+    Returns:
+        Dicionário com a versão do plano, os descontos e, para cada blindagem,
+        colunas com uma posição por desconto
+    """
+    import numpy as np
+
+    plano = obter_plano()
+    rotulos = list(subtotais)
+    descontos_array = np.asarray(descontos, dtype=np.float64)
+    
+    # Uma linha por blindagem, uma coluna por desconto
+    bases = np.asarray([subtotais[r] for r in rotulos], dtype=np.float64)[:, np.newaxis] - descontos_array
+    vetor = calcular_condicoes_pagamento_vetorizado(bases)
+    
+    grade = {}
+    n = len(descontos_array)
+    for i, rotulo in enumerate(rotulos):
+        linhas = slice(i * n, (i + 1) * n)
+        blindagem = {
+            "subtotal": subtotais[rotulo],
+            "valor_base": vetor["valor_base"][linhas].tolist(),
+            "a_vista": vetor["a_vista"][linhas].tolist(),
         }
+        for regra in plano.parcelado_direto:
+            blindagem[regra.chave] = {
+                "total": vetor[f"{regra.chave}_total"][linhas].tolist(),
+                "entrada": vetor[f"{regra.chave}_entrada"][linhas].tolist(),
+                "parcela": vetor[f"{regra.chave}_parcela"][linhas].tolist(),
+            }
+        blindagem["cartao"] = {
+            regra.chave: {
+                "acrescimo": regra.acrescimo_percentual,
+                "total": vetor["cartao_total"][linhas, j].tolist(),
+                "parcela": vetor["cartao_parcela"][linhas, j].tolist(),
+            }
+            for j, regra in enumerate(plano.cartao)
+        }
+        grade[rotulo] = blindagem
     
-    return resultado
+    return {
+        "versao_plano": plano.versao,
+        "descontos": descontos_array.tolist(),
+        "blindagens": grade,
+    }
 
 
 def calcular_valor_blindagem(data: Dict[str, Any]) -> float:
@@ -181,115 +516,63 @@ def calcular_valor_blindagem(data: Dict[str, Any]) -> float:
 
 def calcular_a_vista(valor_base: float) -> Dict[str, Any]:
     """
-    Calcula o valor à vista com 2% de desconto
+    Calcula o valor à vista com o desconto do plano vigente
     """
-    desconto = round(valor_base * 0.02, 2)
-    valor_final = valor_base - desconto
+    base = Centavos.de_reais(valor_base)
+    a_vista = _condicoes_em_centavos(obter_plano(), base).a_vista
     
     return {
-        "desconto_percentual": 2,
-        "valor_desconto": desconto,
-        "valor_final": valor_final
+        "desconto_percentual": a_vista.desconto_percentual,
+        "valor_desconto": (base - a_vista.valor_total) / 100,
+        "valor_final": a_vista.valor_total / 100
     }
 
 
 def calcular_parcelado_direto(valor_base: float) -> List[Dict[str, Any]]:
     """
-    Calcula as opções de pagamento direto:
-    - 2 parcelas → valor dividido por 2
-    - 3 parcelas → sinal de 50% + 2x, com 1% de acréscimo no total
-    - 4 parcelas → sinal de 60% + 3x, com 3% de acréscimo no total
+    Calcula as opções de pagamento direto do plano vigente
+    (por padrão 2x sem acréscimo, 3x com sinal de 50% e 1% de acréscimo e
+    4x com sinal de 60% e 3% de acréscimo)
     """
+    base = Centavos.de_reais(valor_base)
     resultado = []
     
-    # 2 parcelas → valor dividido por 2
-    opcao_2x = {
-        "parcelas": 2,
-        "acrescimo_percentual": 0,
-        "valor_acrescimo": 0,
-        "valor_total": valor_base,
-        "valor_parcela": round(valor_base / 2, 2),
-        "detalhes": "2x sem acréscimo"
-    }
-    resultado.append(opcao_2x)
-    
-    # 3 parcelas → sinal de 50% + 2x, com 1% de acréscimo no total
-    acrescimo_3x = round(valor_base * 0.01, 2)
-    valor_total_3x = valor_base + acrescimo_3x
-    sinal_3x = round(valor_total_3x * 0.5, 2)
-    restante_3x = valor_total_3x - sinal_3x
-    parcela_3x = round(restante_3x / 2, 2)
-    
-    opcao_3x = {
-        "parcelas": 3,
-        "acrescimo_percentual": 1,
-        "valor_acrescimo": acrescimo_3x,
-        "valor_total": valor_total_3x,
-        "valor_entrada": sinal_3x,
-        "valor_parcela": parcela_3x,
-        "detalhes": f"Entrada de {sinal_3x:.2f} + 2x de {parcela_3x:.2f}"
-    }
-    resultado.append(opcao_3x)
-    
-    # 4 parcelas → sinal de 60% + 3x, com 3% de acréscimo no total
-    acrescimo_4x = round(valor_base * 0.03, 2)
-    valor_total_4x = valor_base + acrescimo_4x
-    sinal_4x = round(valor_total_4x * 0.6, 2)
-    restante_4x = valor_total_4x - sinal_4x
-    parcela_4x = round(restante_4x / 3, 2)
-    
-    opcao_4x = {
-        "parcelas": 4,
-        "acrescimo_percentual": 3,
-        "valor_acrescimo": acrescimo_4x,
-        "valor_total": valor_total_4x,
-        "valor_entrada": sinal_4x,
-        "valor_parcela": parcela_4x,
-        "detalhes": f"Entrada de {sinal_4x:.2f} + 3x de {parcela_4x:.2f}"
-    }
-    resultado.append(opcao_4x)
+    for opcao in _condicoes_em_centavos(obter_plano(), base).parcelado_direto:
+        item = {
+            "parcelas": opcao.numero_parcelas,
+            "acrescimo_percentual": opcao.acrescimo_percentual,
+            "valor_acrescimo": (opcao.valor_total - base) / 100,
+            "valor_total": opcao.valor_total / 100,
+        }
+        if opcao.entrada_percentual:
+            item["valor_entrada"] = opcao.valor_entrada / 100
+            item["valor_parcela"] = opcao.valor_parcela / 100
+            item["detalhes"] = (f"Entrada de {opcao.valor_entrada / 100:.2f} + "
+                                f"{opcao.numero_parcelas - 1}x de {opcao.valor_parcela / 100:.2f}")
+        else:
+            item["valor_parcela"] = opcao.valor_parcela / 100
+            item["detalhes"] = f"{opcao.numero_parcelas}x sem acréscimo"
+        resultado.append(item)
     
     return resultado
 
 
 def calcular_parcelado_cartao(valor_base: float) -> List[Dict[str, Any]]:
     """
-    Calcula as opções de pagamento com cartão de crédito:
-    - 4 parcelas → 6% de acréscimo
-    - 5 parcelas → 7%
-    - 6 parcelas → 8%
-    - 7 parcelas → 9%
-    - 8 parcelas → 10%
-    - 9 parcelas → 11%
-    - 10 parcelas → 12%
+    Calcula as opções de pagamento com cartão de crédito do plano vigente
+    (por padrão de 4x com 6% a 10x com 12% de acréscimo)
     """
-    opcoes_cartao = [
-        {"parcelas": 4, "acrescimo": 6},
-        {"parcelas": 5, "acrescimo": 7},
-        {"parcelas": 6, "acrescimo": 8},
-        {"parcelas": 7, "acrescimo": 9},
-        {"parcelas": 8, "acrescimo": 10},
-        {"parcelas": 9, "acrescimo": 11},
-        {"parcelas": 10, "acrescimo": 12}
-    ]
-    
+    base = Centavos.de_reais(valor_base)
     resultado = []
     
-    for opcao in opcoes_cartao:
-        parcelas = opcao["parcelas"]
-        acrescimo_percentual = opcao["acrescimo"]
-        
-        valor_acrescimo = round(valor_base * (acrescimo_percentual / 100), 2)
-        valor_total = valor_base + valor_acrescimo
-        valor_parcela = round(valor_total / parcelas, 2)
-        
+    for opcao in _condicoes_em_centavos(obter_plano(), base).cartao:
         resultado.append({
-            "parcelas": parcelas,
-            "acrescimo_percentual": acrescimo_percentual,
-            "valor_acrescimo": valor_acrescimo,
-            "valor_total": valor_total,
-            "valor_parcela": valor_parcela,
-            "detalhes": f"{parcelas}x de {valor_parcela:.2f}"
+            "parcelas": opcao.numero_parcelas,
+            "acrescimo_percentual": opcao.acrescimo_percentual,
+            "valor_acrescimo": (opcao.valor_total - base) / 100,
+            "valor_total": opcao.valor_total / 100,
+            "valor_parcela": opcao.valor_parcela / 100,
+            "detalhes": f"{opcao.numero_parcelas}x de {opcao.valor_parcela / 100:.2f}"
         })
     
     return resultado
@@ -0,0 +1,118 @@
+"""
+Contexto da requisição em andamento
+
+Os ids da requisição (request_id e, na geração de proposta, proposta_id)
+ficam em uma ContextVar, visível em todo o código executado para a
+requisição, inclusive nos serviços, sem passar os ids como parâmetro. O
+contexto é aberto pelo MiddlewareContexto e lido:
+
+- pelo logger, que anexa os ids a todos os registros;
+- pelos clientes HTTP criados com HOOKS_HTTP, que os enviam nos cabeçalhos;
+- pelo próprio middleware, que os devolve nos cabeçalhos da resposta.
+"""
+import re
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from starlette.datastructures import MutableHeaders
+
+CABECALHO_REQUEST_ID = "X-Request-ID"
+CABECALHO_PROPOSTA_ID = "X-Proposta-ID"
+
+# Ids recebidos do cliente só são reaproveitados se forem curtos e sem caracteres especiais
+RE_ID_VALIDO = re.compile(r"^[A-Za-z0-9._:-]{1,64}$")
+
+
+@dataclass(slots=True)
+class ContextoRequisicao:
+    """Ids da requisição; proposta_id é preenchido pela rota quando gerado"""
+    request_id: str
+    proposta_id: Optional[str] = None
+
+    def cabecalhos(self) -> Dict[str, str]:
+        """Cabeçalhos com os ids definidos"""
+        cabecalhos = {CABECALHO_REQUEST_ID: self.request_id}
+        if self.proposta_id:
+            cabecalhos[CABECALHO_PROPOSTA_ID] = self.proposta_id
+        return cabecalhos
+
+
+_contexto: ContextVar[Optional[ContextoRequisicao]] = ContextVar("contexto_requisicao", default=None)
+
+
+def contexto_atual() -> Optional[ContextoRequisicao]:
+    """Contexto da requisição em andamento (None fora de uma requisição)"""
+    return _contexto.get()
+
+
+@contextmanager
+def iniciar_contexto(request_id: Optional[str] = None):
+    """
+    Abre o contexto de uma requisição
+
+    Args:
+        request_id: Id recebido do cliente; ids ausentes ou inválidos são
+            substituídos por um novo
+    """
+    if not request_id or not RE_ID_VALIDO.match(request_id):
+        request_id = uuid.uuid4().hex
+    contexto = ContextoRequisicao(request_id)
+    token = _contexto.set(contexto)
+    try:
+        yield contexto
+    finally:
+        _contexto.reset(token)
+
+
+def definir_proposta(proposta_id: str) -> None:
+    """Associa o id da proposta à requisição em andamento"""
+    contexto = _contexto.get()
+    if contexto is not None:
+        contexto.proposta_id = proposta_id
+
+
+def cabecalhos_contexto() -> Dict[str, str]:
+    """Cabeçalhos com os ids da requisição em andamento"""
+    contexto = _contexto.get()
+    return contexto.cabecalhos() if contexto is not None else {}
+
+
+async def _propagar_contexto(request) -> None:
+    """Hook do httpx: envia os ids da requisição em cada chamada externa"""
+    request.headers.update(cabecalhos_contexto())
+
+
+# event_hooks para httpx.AsyncClient
+HOOKS_HTTP = {"request": [_propagar_contexto]}
+
+
+class MiddlewareContexto:
+    """
+    Middleware ASGI que abre o contexto de cada requisição HTTP
+
+    Reaproveita o X-Request-ID recebido (ou gera um) e devolve X-Request-ID
+    e X-Proposta-ID na resposta.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        recebido = next(
+            (valor.decode("latin-1") for nome, valor in scope["headers"] if nome == b"x-request-id"),
+            None,
+        )
+        with iniciar_contexto(recebido) as contexto:
+            async def enviar(mensagem):
+                if mensagem["type"] == "http.response.start":
+                    MutableHeaders(scope=mensagem).update(contexto.cabecalhos())
+                await send(mensagem)
+
+            await self.app(scope, receive, enviar)
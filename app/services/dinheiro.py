@@ -0,0 +1,108 @@
+"""
+Representação de valores monetários em centavos inteiros
+"""
+import math
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any
+
+# Tamanho máximo do cache de valores formatados
+TAMANHO_CACHE_FORMATACAO = 4096
+
+
+def arredondar(numerador, denominador):
+    """
+    Divide e arredonda para o inteiro mais próximo (meio centavo para cima)
+
+    É o único ponto de arredondamento dos cálculos monetários: todo valor em
+    centavos é obtido a partir da fração exata e arredondado uma única vez.
+    Funciona tanto com inteiros quanto com arrays NumPy de inteiros.
+
+    Args:
+        numerador: Numerador da fração (int ou array de inteiros)
+        denominador: Denominador positivo da fração
+
+    Returns:
+        Resultado arredondado
+    """
+    return (2 * numerador + denominador) // (2 * denominador)
+
+
+class Centavos(int):
+    """
+    Valor monetário em centavos inteiros
+
+    Subclasse de int sem atributos próprios, portanto ocupa o mesmo espaço de
+    um inteiro e participa de operações aritméticas como um inteiro comum.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def de_reais(cls, valor: Any) -> "Centavos":
+        """
+        Converte um valor em reais (int, float, str ou Decimal) para centavos
+
+        Floats são interpretados pela sua representação decimal mais curta,
+        ou seja, 0.1 vale exatamente 10 centavos.
+
+        Raises:
+            ValueError: valor infinito ou NaN
+        """
+        if isinstance(valor, Centavos):
+            return valor
+        if isinstance(valor, int):
+            return cls(valor * 100)
+        if isinstance(valor, float):
+            if not math.isfinite(valor):
+                raise ValueError(f"Valor monetário inválido: {valor}")
+            # Caminho rápido: valores que já estão em centavos inteiros
+            centavos = round(valor * 100)
+            if abs(valor * 100 - centavos) < 1e-6:
+                return cls(centavos)
+        decimal = Decimal(str(valor))
+        if not decimal.is_finite():
+            raise ValueError(f"Valor monetário inválido: {valor}")
+        numerador, denominador = decimal.as_integer_ratio()
+        return cls(arredondar(numerador * 100, denominador))
+
+    @property
+    def reais(self) -> float:
+        """Valor em reais como float (usado nas respostas da API)"""
+        return int(self) / 100
+
+    def formatar(self) -> str:
+        """Valor formatado no padrão brasileiro (ex.: R$ 1.234,56)"""
+        return formatar_centavos(self)
+
+    def __repr__(self) -> str:
+        return f"Centavos({int(self)})"
+
+
+@lru_cache(maxsize=TAMANHO_CACHE_FORMATACAO)
+def formatar_centavos(centavos: int) -> str:
+    """
+    Formata um valor em centavos no padrão brasileiro
+
+    Args:
+        centavos: Valor em centavos
+
+    Returns:
+        Texto no formato "R$ 1.234,56" (ou "-R$ 1.234,56" para negativos)
+    """
+    sinal = "-" if centavos < 0 else ""
+    reais, resto = divmod(abs(int(centavos)), 100)
+    return f"{sinal}R$ {reais:,}".replace(",", ".") + f",{resto:02d}"
+
+
+@lru_cache(maxsize=TAMANHO_CACHE_FORMATACAO)
+def formatar_reais(valor: float) -> str:
+    """
+    Formata um valor em reais no padrão brasileiro
+
+    Args:
+        valor: Valor em reais
+
+    Returns:
+        Texto no formato "R$ 1.234,56"
+    """
+    return formatar_centavos(Centavos.de_reais(valor))
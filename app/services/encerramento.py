@@ -0,0 +1,248 @@
+"""
+Encerramento coordenado da aplicação
+
+O encerramento começa no sinal recebido pelo worker (servidor.py) ou, sem
+ele, no encerramento do lifespan. A partir daí:
+
+1. novas propostas são recusadas com 503 e Retry-After, e /ready responde
+   503, para o balanceador deixar de enviar requisições;
+2. as propostas em andamento têm até SERVIDOR_ENCERRAMENTO segundos para
+   concluir. O Uvicorn aguarda as requisições pelo mesmo prazo e cancela as
+   restantes;
+3. uma proposta cancelada depois do upload grava o envio por WhatsApp em
+   ENVIOS_PENDENTES_FILE. Os envios pendentes são refeitos na próxima
+   inicialização;
+4. o encerramento do lifespan registra no log o tempo desde o início do
+   encerramento até a última proposta terminar, e quantas foram canceladas.
+
+Os arquivos temporários de cada proposta (em PDF_TEMP_DIR) são removidos ao
+fim dela, mesmo se cancelada. Arquivos antigos, deixados por um processo
+finalizado à força, são removidos na inicialização.
+"""
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+import orjson
+
+from app.config import ENVIOS_PENDENTES_FILE, PDF_TEMP_DIR
+from app.services import logger_service
+
+# Segundos sugeridos (Retry-After) a quem tiver a proposta recusada no encerramento
+RETRY_AFTER_ENCERRAMENTO = 5
+# Intervalo (em segundos) entre verificações das propostas em andamento
+INTERVALO_DRENAGEM = 0.05
+# Idade (em segundos) a partir da qual um arquivo temporário é considerado abandonado
+IDADE_TEMPORARIO_ABANDONADO = 3600
+
+
+class Encerramento:
+    """Propostas em andamento e início do encerramento"""
+
+    def __init__(self):
+        self.iniciado_em: Optional[float] = None
+        # Quando a última proposta em andamento terminou, após o início do encerramento
+        self.drenado_em: Optional[float] = None
+        self.em_andamento = 0
+        self.canceladas = 0
+
+    @property
+    def encerrando(self) -> bool:
+        return self.iniciado_em is not None
+
+    def iniciar(self) -> None:
+        """Passa a recusar novas propostas (apenas a primeira chamada tem efeito)"""
+        if self.iniciado_em is None:
+            self.iniciado_em = time.monotonic()
+            if not self.em_andamento:
+                self.drenado_em = self.iniciado_em
+            logger_service.log_info(f"Encerramento iniciado com {self.em_andamento} propostas em andamento")
+
+    @contextmanager
+    def pipeline(self):
+        """Conta a proposta como em andamento enquanto o bloco executa"""
+        self.em_andamento += 1
+        try:
+            yield
+        except asyncio.CancelledError:
+            self.canceladas += 1
+            raise
+        finally:
+            self.em_andamento -= 1
+            if self.encerrando and not self.em_andamento:
+                self.drenado_em = time.monotonic()
+
+    async def drenar(self, prazo: float) -> bool:
+        """
+        Aguarda as propostas em andamento, até `prazo` segundos após o início
+        do encerramento
+
+        Returns:
+            True se todas terminaram dentro do prazo
+        """
+        self.iniciar()
+        limite = self.iniciado_em + prazo
+        while self.em_andamento and time.monotonic() < limite:
+            await asyncio.sleep(INTERVALO_DRENAGEM)
+        if self.em_andamento:
+            logger_service.log_warning(
+                f"Prazo de encerramento ({prazo:.0f} s) esgotado com {self.em_andamento} propostas em andamento"
+            )
+            return False
+        duracao = self.drenado_em - self.iniciado_em
+        logger_service.log_info(f"Propostas em andamento encerradas em {duracao:.2f} s "
+                                f"({self.canceladas} canceladas pelo prazo)")
+        return True
+
+
+_estado = Encerramento()
+
+
+def encerrando() -> bool:
+    """Se o encerramento já começou (novas propostas devem ser recusadas)"""
+    return _estado.encerrando
+
+
+def iniciar() -> None:
+    _estado.iniciar()
+
+
+def reiniciar() -> None:
+    """Volta a aceitar propostas (na inicialização do lifespan)"""
+    _estado.iniciado_em = _estado.drenado_em = None
+    _estado.canceladas = 0
+
+
+def pipeline():
+    return _estado.pipeline()
+
+
+async def drenar(prazo: float) -> bool:
+    return await _estado.drenar(prazo)
+
+
+# ---------------------------------------------------------------------------
+# Envios por WhatsApp interrompidos
+# ---------------------------------------------------------------------------
+
+def registrar_envio_pendente(envio: Dict[str, str], arquivo: Optional[Path] = None) -> None:
+    """Grava um envio interrompido (proposta_id, telefone, url_pdf, mensagem)"""
+    arquivo = Path(arquivo or ENVIOS_PENDENTES_FILE)
+    arquivo.parent.mkdir(parents=True, exist_ok=True)
+    with open(arquivo, "ab") as saida:
+        saida.write(orjson.dumps(envio) + b"\n")
+    logger_service.log_warning(f"Envio por WhatsApp da proposta {envio.get('proposta_id')} gravado como pendente")
+
+
+def _processo_ativo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _reservas_abandonadas(arquivo: Path):
+    """Reservas de envios deixadas por processos que já terminaram (finalizados à força)"""
+    for reserva in arquivo.parent.glob(f"{arquivo.stem}.*{arquivo.suffix}"):
+        pid = reserva.name[len(arquivo.stem) + 1:].split(".", 1)[0]
+        if pid.isdigit() and int(pid) != os.getpid() and not _processo_ativo(int(pid)):
+            yield reserva
+
+
+async def _reenviar(envio: Dict[str, str]) -> bool:
+    """Refaz um envio; True se a Z-API confirmou o envio"""
+    from app.services import whatsapp_service
+
+    try:
+        resposta = await whatsapp_service.enviar_pdf_whatsapp(envio["telefone"], envio["url_pdf"], envio["mensagem"])
+    except Exception as e:
+        logger_service.log_error(f"Falha ao reenviar a proposta {envio.get('proposta_id')}: {e}")
+        return False
+    # enviar_pdf_whatsapp devolve a resposta da Z-API mesmo quando o envio falha
+    if not isinstance(resposta, dict) or resposta.get("status") != "success":
+        logger_service.log_error(f"Z-API recusou o reenvio da proposta {envio.get('proposta_id')}: {resposta}")
+        return False
+    return True
+
+
+async def reenviar_pendentes(arquivo: Optional[Path] = None) -> int:
+    """
+    Refaz os envios pendentes; os que falharem continuam pendentes
+
+    O arquivo é renomeado para uma reserva antes da leitura: com vários
+    workers, apenas um deles assume os envios. A reserva só é removida depois
+    dos envios, com as falhas já gravadas de volta como pendentes. Se o
+    reenvio for cancelado (encerramento durante os envios), o envio atual e os
+    seguintes também voltam a ficar pendentes. Se o processo for finalizado à
+    força, a reserva fica no disco e é assumida na próxima inicialização; os
+    envios já feitos podem então ser repetidos.
+
+    Returns:
+        Quantidade de envios refeitos
+    """
+    arquivo = Path(arquivo or ENVIOS_PENDENTES_FILE)
+    reservas = []
+    for origem in (arquivo, *_reservas_abandonadas(arquivo)):
+        reserva = arquivo.with_name(f"{arquivo.stem}.{os.getpid()}.{len(reservas)}{arquivo.suffix}")
+        try:
+            os.rename(origem, reserva)
+        except FileNotFoundError:
+            # Sem pendentes ou já assumido por outro worker
+            continue
+        reservas.append(reserva)
+    if not reservas:
+        return 0
+
+    envios = [orjson.loads(linha) for reserva in reservas for linha in reserva.read_bytes().splitlines()]
+    falhas = []
+    concluidos = 0
+    try:
+        for envio in envios:
+            if not await _reenviar(envio):
+                falhas.append(envio)
+            concluidos += 1
+    finally:
+        for envio in falhas + envios[concluidos:]:
+            registrar_envio_pendente(envio, arquivo)
+        for reserva in reservas:
+            reserva.unlink()
+    enviados = concluidos - len(falhas)
+    logger_service.log_info(f"{enviados} envios pendentes refeitos")
+    return enviados
+
+
+# ---------------------------------------------------------------------------
+# Arquivos temporários
+# ---------------------------------------------------------------------------
+
+def diretorio_temporario() -> Path:
+    """Diretório dos arquivos temporários das propostas (criado se necessário)"""
+    PDF_TEMP_DIR.mkdir(parents=True, exist_ok=True)
+    return PDF_TEMP_DIR
+
+
+def remover_temporarios(caminhos) -> None:
+    for caminho in caminhos:
+        try:
+            os.unlink(caminho)
+        except FileNotFoundError:
+            pass
+
+
+def limpar_abandonados(diretorio: Optional[Path] = None, idade: float = IDADE_TEMPORARIO_ABANDONADO) -> int:
+    """Remove arquivos temporários mais antigos que `idade` segundos; retorna quantos"""
+    diretorio = Path(diretorio or PDF_TEMP_DIR)
+    if not diretorio.is_dir():
+        return 0
+    limite = time.time() - idade
+    antigos = [caminho for caminho in diretorio.iterdir() if caminho.is_file() and caminho.stat().st_mtime < limite]
+    remover_temporarios(antigos)
+    if antigos:
+        logger_service.log_info(f"{len(antigos)} arquivos temporários abandonados removidos de {diretorio}")
+    return len(antigos)
@@ -0,0 +1,243 @@
+"""
+Chaves de idempotência da rota de propostas
+
+Uma requisição repetida pelo front-end (ex.: após um timeout) com o mesmo
+cabeçalho Idempotency-Key não gera outro PDF, upload ou mensagem:
+
+- se a original ainda está em andamento, a repetição aguarda (até
+  IDEMPOTENCIA_ESPERA segundos) e recebe a mesma resposta;
+- se a original já terminou, a resposta gravada é repetida na hora, com o
+  cabeçalho Idempotent-Replayed;
+- a mesma chave com outra requisição (corpo ou parâmetros diferentes) é
+  recusada com 422.
+
+As chaves ficam em SQLite (IDEMPOTENCIA_FILE) para que a repetição seja
+reconhecida por qualquer worker, e expiram após IDEMPOTENCIA_TTL segundos.
+As consultas rodam fora do event loop: a espera pelo lock do banco,
+compartilhado entre os workers, não trava as demais requisições.
+Só as respostas de sucesso são gravadas; erros (status "error", como falha
+no upload ou no WhatsApp, e respostas 4xx/5xx, como a recusa por
+sobrecarga) liberam a chave para uma nova tentativa.
+"""
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional
+
+import orjson
+from fastapi.responses import Response
+
+from app.config import IDEMPOTENCIA_ESPERA, IDEMPOTENCIA_FILE, IDEMPOTENCIA_RESERVA, IDEMPOTENCIA_TTL
+from app.services import contexto_requisicao, metricas
+
+CABECALHO_CHAVE = "Idempotency-Key"
+CABECALHO_REPETIDA = "Idempotent-Replayed"
+# Tamanho máximo da chave (o front-end usa UUIDs)
+TAMANHO_MAXIMO_CHAVE = 255
+# Intervalo (em segundos) entre consultas a uma chave em andamento em outro worker
+INTERVALO_CONSULTA = 0.1
+# Intervalo mínimo (em segundos) entre remoções das chaves expiradas
+INTERVALO_LIMPEZA = 60
+# Segundos sugeridos (Retry-After) quando a original não termina dentro da espera
+RETRY_AFTER_EM_ANDAMENTO = 5
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS chaves (
+    chave TEXT PRIMARY KEY,
+    impressao TEXT NOT NULL,
+    proposta_id TEXT NOT NULL,
+    status_code INTEGER,
+    corpo BLOB,
+    expira_em REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chaves_expiracao ON chaves (expira_em);
+"""
+
+
+@dataclass(frozen=True, slots=True)
+class Registro:
+    """Chave já usada: em andamento (status_code None) ou concluída"""
+    impressao: str
+    proposta_id: str
+    status_code: Optional[int]
+    corpo: Optional[bytes]
+
+
+def impressao_requisicao(corpo: bytes, parametros: str) -> str:
+    """Identifica a requisição associada à chave (corpo e query string)"""
+    return hashlib.sha256(parametros.encode() + b"\0" + corpo).hexdigest()
+
+
+def chave_valida(chave: str) -> bool:
+    return 0 < len(chave) <= TAMANHO_MAXIMO_CHAVE and chave.isascii() and chave.isprintable()
+
+
+def _resposta_json(status_code: int, corpo: bytes, cabecalhos: Optional[Dict[str, str]] = None) -> Response:
+    return Response(content=corpo, status_code=status_code, media_type="application/json", headers=cabecalhos)
+
+
+def _erro(status_code: int, message: str, cabecalhos: Optional[Dict[str, str]] = None) -> Response:
+    return _resposta_json(status_code, orjson.dumps({"status": "error", "message": message}), cabecalhos)
+
+
+def _sucesso(resposta: Response) -> bool:
+    """Resposta a ser repetida: status < 400 e sem status "error" no corpo"""
+    if resposta.status_code >= 400:
+        return False
+    try:
+        return orjson.loads(resposta.body).get("status") != "error"
+    except (orjson.JSONDecodeError, AttributeError):
+        return True
+
+
+class RegistroIdempotencia:
+    """Chaves em SQLite, com as requisições em andamento neste processo"""
+
+    def __init__(self, caminho: Path = IDEMPOTENCIA_FILE, ttl: float = IDEMPOTENCIA_TTL,
+                 espera: float = IDEMPOTENCIA_ESPERA, reserva: float = IDEMPOTENCIA_RESERVA):
+        self.caminho = Path(caminho)
+        self.ttl = ttl
+        self.espera = espera
+        self.reserva = reserva
+        self._conexao: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        # Consultas em threads (asyncio.to_thread), uma por vez na conexão
+        self._trava = threading.Lock()
+        self._limpeza = 0.0
+        # Chaves processadas neste processo: sinalizadas ao concluir
+        self._em_andamento: Dict[str, asyncio.Event] = {}
+
+    @property
+    def conexao(self) -> sqlite3.Connection:
+        """Conexão do processo atual (aberta de novo em cada worker após o fork)"""
+        if self._conexao is None or self._pid != os.getpid():
+            self.caminho.parent.mkdir(parents=True, exist_ok=True)
+            # Usada pelas threads das consultas, uma por vez (self._trava)
+            self._conexao = sqlite3.connect(str(self.caminho), timeout=5, isolation_level=None,
+                                            check_same_thread=False)
+            self._conexao.execute("PRAGMA journal_mode=WAL")
+            self._conexao.executescript(ESQUEMA)
+            self._pid = os.getpid()
+        return self._conexao
+
+    def fechar(self) -> None:
+        with self._trava:
+            if self._conexao is not None and self._pid == os.getpid():
+                self._conexao.close()
+            self._conexao = None
+
+    async def _consultar(self, funcao: Callable, *args):
+        """Executa `funcao` (acesso ao banco) em uma thread, fora do event loop"""
+        def executar():
+            with self._trava:
+                return funcao(*args)
+        return await asyncio.to_thread(executar)
+
+    async def executar(self, chave: str, impressao: str, proposta_id: str,
+                       processar: Callable[[], Awaitable[Response]]) -> Response:
+        """
+        Processa a requisição uma única vez por chave
+
+        Args:
+            chave: valor do cabeçalho Idempotency-Key
+            impressao: impressao_requisicao() da requisição
+            proposta_id: id da proposta desta requisição
+            processar: gera a resposta (chamado só se a chave for nova)
+        """
+        limite = time.monotonic() + self.espera
+        while True:
+            registro = await self._consultar(self._reservar, chave, impressao, proposta_id)
+            if registro is None:
+                metricas.IDEMPOTENCIA.inc(resultado="nova")
+                return await self._processar(chave, processar)
+            if registro.impressao != impressao:
+                metricas.IDEMPOTENCIA.inc(resultado="conflito")
+                return _erro(422, f"{CABECALHO_CHAVE} já usada em outra requisição")
+            if registro.status_code is not None:
+                metricas.IDEMPOTENCIA.inc(resultado="repetida")
+                contexto_requisicao.definir_proposta(registro.proposta_id)
+                return _resposta_json(registro.status_code, registro.corpo, {CABECALHO_REPETIDA: "true"})
+            if time.monotonic() >= limite:
+                metricas.IDEMPOTENCIA.inc(resultado="em_andamento")
+                return _erro(409, "Requisição original ainda em andamento",
+                             {"Retry-After": str(RETRY_AFTER_EM_ANDAMENTO)})
+            await self._aguardar(chave, limite)
+
+    def _reservar(self, chave: str, impressao: str, proposta_id: str) -> Optional[Registro]:
+        """Reserva a chave (None) ou retorna o registro de quem já a usou"""
+        agora = time.time()
+        conexao = self.conexao
+        if agora - self._limpeza >= INTERVALO_LIMPEZA:
+            conexao.execute("DELETE FROM chaves WHERE expira_em < ?", (agora,))
+            self._limpeza = agora
+        else:
+            conexao.execute("DELETE FROM chaves WHERE chave = ? AND expira_em < ?", (chave, agora))
+        cursor = conexao.execute(
+            "INSERT INTO chaves (chave, impressao, proposta_id, expira_em) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (chave) DO NOTHING",
+            (chave, impressao, proposta_id, agora + self.reserva),
+        )
+        if cursor.rowcount:
+            return None
+        linha = conexao.execute(
+            "SELECT impressao, proposta_id, status_code, corpo FROM chaves WHERE chave = ?", (chave,)
+        ).fetchone()
+        if linha is None:  # liberada entre as duas consultas
+            return self._reservar(chave, impressao, proposta_id)
+        return Registro(*linha)
+
+    def _gravar(self, chave: str, resposta: Response) -> None:
+        self.conexao.execute(
+            "UPDATE chaves SET status_code = ?, corpo = ?, expira_em = ? WHERE chave = ?",
+            (resposta.status_code, bytes(resposta.body), time.time() + self.ttl, chave),
+        )
+
+    def _liberar(self, chave: str) -> None:
+        self.conexao.execute("DELETE FROM chaves WHERE chave = ?", (chave,))
+
+    async def _processar(self, chave: str, processar: Callable[[], Awaitable[Response]]) -> Response:
+        concluida = self._em_andamento[chave] = asyncio.Event()
+        resposta = None
+        try:
+            resposta = await processar()
+            return resposta
+        finally:
+            try:
+                # Protegido do cancelamento: a chave nunca fica reservada sem dono
+                if resposta is not None and _sucesso(resposta):
+                    await asyncio.shield(self._consultar(self._gravar, chave, resposta))
+                else:
+                    await asyncio.shield(self._consultar(self._liberar, chave))
+            finally:
+                del self._em_andamento[chave]
+                concluida.set()
+
+    async def _aguardar(self, chave: str, limite: float) -> None:
+        """Aguarda a conclusão da chave neste processo, ou o intervalo de consulta"""
+        concluida = self._em_andamento.get(chave)
+        restante = max(limite - time.monotonic(), 0)
+        if concluida is None:
+            await asyncio.sleep(min(INTERVALO_CONSULTA, restante))
+            return
+        try:
+            await asyncio.wait_for(concluida.wait(), restante)
+        except asyncio.TimeoutError:
+            pass
+
+
+_registro = RegistroIdempotencia()
+
+
+async def executar(chave: str, impressao: str, proposta_id: str,
+                   processar: Callable[[], Awaitable[Response]]) -> Response:
+    """Processa a requisição uma única vez por chave (ver RegistroIdempotencia.executar)"""
+    return await _registro.executar(chave, impressao, proposta_id, processar)
+
+
+def fechar() -> None:
+    _registro.fechar()
@@ -0,0 +1,124 @@
+"""
+Tempo de importação e aquecimento dos módulos pesados
+
+httpx, PyPDF2 e NumPy são importados por quem os usa, na primeira chamada,
+e não ao importar a aplicação: `import main` (testes, ferramentas e a
+inicialização de cada instância) não paga por eles. Para que a primeira
+requisição também não pague, aquecer() os importa em uma thread logo após a
+inicialização, com a aplicação já atendendo.
+
+medir_importacao() executa `python -X importtime` em um processo novo e soma
+o tempo de cada módulo importado por pacote (os módulos da aplicação são
+listados um a um). O relatório é impresso por:
+
+    python -m app.services.importacao [modulo]
+
+tests/test_importacao.py mantém a importação de main dentro de
+ORCAMENTO_IMPORTACAO_MS e sem os módulos pesados.
+"""
+import argparse
+import importlib
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from app.config import BASE_DIR
+
+# Importados sob demanda (ou no aquecimento), nunca por `import main`
+MODULOS_PESADOS = ("httpx", "PyPDF2", "numpy")
+# Orçamento (em milissegundos) para importar main em um processo novo
+ORCAMENTO_IMPORTACAO_MS = 1500
+# Pacotes do próprio projeto, listados por módulo no relatório
+PACOTES_PROJETO = ("main", "servidor", "app", "config")
+
+
+def aquecer() -> float:
+    """
+    Importa os módulos pesados (e o cliente HTTP rastreado)
+
+    Returns:
+        Tempo gasto, em segundos
+    """
+    inicio = time.perf_counter()
+    for modulo in MODULOS_PESADOS + ("app.services.rastreamento_http",):
+        importlib.import_module(modulo)
+    return time.perf_counter() - inicio
+
+
+def _grupo(modulo: str) -> str:
+    pacote = modulo.split(".", 1)[0]
+    return modulo if pacote in PACOTES_PROJETO else pacote
+
+
+def interpretar_importtime(texto: str, modulo: str) -> Dict[str, float]:
+    """
+    Tempo próprio (em milissegundos) por pacote, da saída de -X importtime
+
+    Considera apenas o bloco da importação de `modulo`: as linhas desde a
+    importação de nível superior anterior (site, encodings, ...) até a dele.
+    """
+    bloco: List[tuple] = []
+    for linha in texto.splitlines():
+        if not linha.startswith("import time:"):
+            continue
+        proprio, _, nome = linha[len("import time:"):].split("|", 2)
+        if not proprio.strip().isdigit():  # cabeçalho
+            continue
+        nome = nome[1:].rstrip()  # após "| ", dois espaços por nível
+        bloco.append((nome.strip(), int(proprio) / 1000))
+        if not nome.startswith("  "):  # importação de nível superior
+            if nome.strip() == modulo:
+                break
+            bloco = []
+    else:
+        raise ValueError(f"Importação de {modulo} não encontrada na saída")
+
+    tempos: Dict[str, float] = defaultdict(float)
+    for nome, proprio_ms in bloco:
+        tempos[_grupo(nome)] += proprio_ms
+    return dict(tempos)
+
+
+def medir_importacao(modulo: str = "main") -> Dict[str, float]:
+    """Tempo por pacote (ms) para importar `modulo` em um processo novo"""
+    resultado = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=BASE_DIR, capture_output=True, text=True, check=True,
+    )
+    return interpretar_importtime(resultado.stderr, modulo)
+
+
+def modulos_pesados_importados(modulo: str = "main") -> List[str]:
+    """Quais dos MODULOS_PESADOS `import modulo` carrega, em um processo novo"""
+    codigo = (f"import sys, {modulo}; "
+              f"print(','.join(m for m in {MODULOS_PESADOS!r} if m in sys.modules))")
+    resultado = subprocess.run([sys.executable, "-c", codigo], cwd=BASE_DIR,
+                               capture_output=True, text=True, check=True)
+    return [m for m in resultado.stdout.strip().split(",") if m]
+
+
+def relatorio(tempos: Dict[str, float], limite: int = 25) -> str:
+    """Tabela dos pacotes mais lentos, com o total"""
+    total = sum(tempos.values())
+    linhas = [f"{'módulo/pacote':<45} {'ms':>9} {'%':>6}"]
+    for nome, ms in sorted(tempos.items(), key=lambda item: -item[1])[:limite]:
+        linhas.append(f"{nome:<45} {ms:>9.1f} {ms / total * 100:>5.1f}%")
+    linhas.append(f"{'total':<45} {total:>9.1f} (orçamento: {ORCAMENTO_IMPORTACAO_MS} ms)")
+    return "\n".join(linhas)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tempo de importação por módulo")
+    parser.add_argument("modulo", nargs="?", default="main")
+    parser.add_argument("--limite", type=int, default=25, help="quantidade de linhas")
+    args = parser.parse_args()
+    print(relatorio(medir_importacao(args.modulo), args.limite))
+    pesados = modulos_pesados_importados(args.modulo)
+    if pesados:
+        print(f"Módulos pesados importados: {', '.join(pesados)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,517 @@
+"""
+Índice de busca dos logs
+
+Mantém em um banco SQLite (logs/indice_logs.sqlite) um índice dos logs de
+texto (app.log), do log estruturado (app.jsonl) e dos arquivos rotacionados,
+inclusive comprimidos (.gz, .bz2, .xz, .zip). Cada arquivo é dividido em
+segmentos (uma requisição no log de texto, um proposta_id no JSON) com
+posição em bytes e intervalo de horário; os segmentos são indexados por
+cliente, telefone e id da proposta.
+
+A atualização é incremental: arquivos já indexados só têm o trecho novo
+lido, e um arquivo rotacionado é reconhecido pelos bytes iniciais, sem
+reindexação.
+
+Uso:
+    python -m app.services.indice_logs --cliente "joão silva"
+    python -m app.services.indice_logs --telefone 99999-9999 --inicio 04/05/2025 --mostrar
+    python -m app.services.indice_logs --proposta bacca826
+"""
+import argparse
+import bz2
+import gzip
+import lzma
+import re
+import sqlite3
+import sys
+import time
+import unicodedata
+import zipfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import orjson
+
+from app.config import INDICE_LOGS_FILE, LOGS_DIR
+
+VERSAO_INDICE = 1
+
+# Arquivos indexados: app.log, app.jsonl e os rotacionados (app.<data>.log[.gz])
+PADROES_ARQUIVOS = ("app*.log*", "app*.jsonl*")
+
+DESCOMPRESSORES = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+COMPRIMIDOS = set(DESCOMPRESSORES) | {".zip"}
+
+# Bytes iniciais usados para reconhecer um arquivo depois de rotacionado
+TAMANHO_ASSINATURA = 256
+
+# Início de registro no log de texto; aceita o formato atual (dd/mm/YYYY) e o antigo (YYYY-MM-DD)
+RE_REGISTRO = re.compile(rb"^(?:(\d{2})/(\d{2})/(\d{4})|(\d{4})-(\d{2})-(\d{2})) (\d{2}:\d{2}:\d{2}) \| ")
+# Registro que abre uma nova requisição
+MARCA_REQUISICAO = b"RAW REQUEST BODY"
+
+RE_CLIENTE = (
+    re.compile(r'"nome_cliente"\s*:\s*"([^"]+)"'),
+    re.compile(r"^nome_cliente\s+: (.+)$", re.MULTILINE),
+    re.compile(r"Cliente: ([^|\n]+?)(?:\.\.\.)?\s*(?:\||$)", re.MULTILINE),
+    re.compile(r"Gerando proposta para: ([^|\n]+?) \|"),
+)
+RE_TELEFONE = (
+    re.compile(r'"telefone_cliente"\s*:\s*"([^"]+)"'),
+    re.compile(r"^telefone_cliente\s+: (.+)$", re.MULTILINE),
+    re.compile(r"WhatsApp para: ([\d()+\- ]+)"),
+)
+RE_PROPOSTA_ID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+# Telefones com menos dígitos (ex.: mascarados) não são indexados
+MIN_DIGITOS_TELEFONE = 8
+
+ESQUEMA = """
+CREATE TABLE arquivos (
+    caminho TEXT PRIMARY KEY,
+    tamanho INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    assinatura BLOB NOT NULL,
+    processado INTEGER NOT NULL
+);
+CREATE TABLE segmentos (
+    id INTEGER PRIMARY KEY,
+    arquivo TEXT NOT NULL,
+    inicio INTEGER NOT NULL,
+    fim INTEGER NOT NULL,
+    ts_inicio TEXT,
+    ts_fim TEXT
+);
+CREATE TABLE chaves (
+    tipo TEXT NOT NULL,
+    valor TEXT NOT NULL,
+    segmento INTEGER NOT NULL
+);
+CREATE INDEX segmentos_arquivo ON segmentos (arquivo, inicio);
+CREATE INDEX segmentos_horario ON segmentos (ts_inicio);
+CREATE INDEX chaves_valor ON chaves (tipo, valor);
+CREATE INDEX chaves_segmento ON chaves (segmento);
+"""
+
+
+@dataclass(frozen=True, slots=True)
+class Segmento:
+    """Trecho de um arquivo de log (posições em bytes do conteúdo descomprimido)"""
+    arquivo: str
+    inicio: int
+    fim: int
+    ts_inicio: Optional[str]
+    ts_fim: Optional[str]
+
+
+# ---------------------------------------------------------------------------
+# Normalização das chaves
+# ---------------------------------------------------------------------------
+
+def normalizar_nome(nome: str) -> str:
+    """Minúsculas, sem acentos e com espaços simples"""
+    sem_acentos = unicodedata.normalize("NFKD", nome).encode("ascii", "ignore").decode()
+    return " ".join(sem_acentos.casefold().split())
+
+
+def normalizar_telefone(telefone: str) -> str:
+    """Somente os dígitos, invertidos: a busca pelo final do número vira busca por prefixo"""
+    return "".join(c for c in telefone if c.isdigit())[::-1]
+
+
+def normalizar_horario(texto: str, fim: bool = False) -> str:
+    """
+    Converte "dd/mm/YYYY [HH:MM[:SS]]" ou ISO para "YYYY-MM-DD HH:MM:SS"
+
+    Sem horário, considera o início do dia (ou o final, com fim=True).
+    """
+    texto = texto.strip()
+    for formato in ("%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M"):
+        try:
+            return datetime.strptime(texto, formato).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            pass
+    for formato in ("%d/%m/%Y", "%Y-%m-%d"):
+        try:
+            dia = datetime.strptime(texto, formato).strftime("%Y-%m-%d")
+            return f"{dia} {'23:59:59' if fim else '00:00:00'}"
+        except ValueError:
+            pass
+    raise ValueError(f"Horário inválido: {texto!r} (use dd/mm/YYYY [HH:MM[:SS]])")
+
+
+def _horario_registro(inicio: re.Match) -> str:
+    """Horário de um início de registro do log de texto, em "YYYY-MM-DD HH:MM:SS" """
+    dia, mes, ano, ano_iso, mes_iso, dia_iso, hora = inicio.groups()
+    if ano is None:
+        ano, mes, dia = ano_iso, mes_iso, dia_iso
+    return f"{ano.decode()}-{mes.decode()}-{dia.decode()} {hora.decode()}"
+
+
+def extrair_chaves(texto: str) -> Set[Tuple[str, str]]:
+    """(tipo, valor) de cliente, telefone e proposta_id encontrados no texto"""
+    chaves = set()
+    for padrao in RE_CLIENTE:
+        for nome in padrao.findall(texto):
+            _adicionar_cliente(chaves, nome)
+    for padrao in RE_TELEFONE:
+        for telefone in padrao.findall(texto):
+            _adicionar_telefone(chaves, telefone)
+    for proposta_id in RE_PROPOSTA_ID.findall(texto):
+        chaves.add(("proposta", proposta_id))
+    return chaves
+
+
+def _adicionar_cliente(chaves: Set[Tuple[str, str]], nome) -> None:
+    """Indexa o nome completo e cada palavra, para buscas pelo sobrenome"""
+    normalizado = normalizar_nome(str(nome))
+    if not normalizado or normalizado == "n/a":
+        return
+    chaves.add(("cliente", normalizado))
+    for palavra in normalizado.split()[1:]:
+        chaves.add(("cliente", palavra))
+
+
+def _adicionar_telefone(chaves: Set[Tuple[str, str]], telefone) -> None:
+    normalizado = normalizar_telefone(str(telefone))
+    if len(normalizado) >= MIN_DIGITOS_TELEFONE:
+        chaves.add(("telefone", normalizado))
+
+
+# ---------------------------------------------------------------------------
+# Leitura e segmentação dos arquivos
+# ---------------------------------------------------------------------------
+
+def _comprimido(caminho: Path) -> bool:
+    return caminho.suffix in COMPRIMIDOS
+
+
+@contextmanager
+def abrir_log(caminho: Path):
+    """Abre um arquivo de log em modo binário, descomprimindo se necessário"""
+    if caminho.suffix == ".zip":
+        with zipfile.ZipFile(caminho) as pacote, pacote.open(pacote.namelist()[0]) as arquivo:
+            yield arquivo
+    else:
+        with DESCOMPRESSORES.get(caminho.suffix, open)(caminho, "rb") as arquivo:
+            yield arquivo
+
+
+def _linhas(arquivo, inicio: int) -> Iterator[Tuple[int, bytes]]:
+    """(posição, linha) das linhas completas a partir de `inicio`"""
+    arquivo.seek(inicio)
+    posicao = inicio
+    for linha in arquivo:
+        if not linha.endswith(b"\n"):
+            break  # linha ainda sendo escrita
+        yield posicao, linha
+        posicao += len(linha)
+
+
+def _segmentos_texto(arquivo, inicio: int) -> Iterator[Tuple[int, int, Optional[str], Optional[str], Set]]:
+    """Segmentos do log de texto: cada requisição começa no registro do corpo bruto"""
+    seg_inicio, ts_inicio, ts_fim, linhas = inicio, None, None, []
+    posicao = inicio
+    for posicao, linha in _linhas(arquivo, inicio):
+        registro = RE_REGISTRO.match(linha)
+        if registro:
+            if MARCA_REQUISICAO in linha and linhas:
+                yield seg_inicio, posicao, ts_inicio, ts_fim, linhas
+                seg_inicio, ts_inicio, linhas = posicao, None, []
+            ts_fim = _horario_registro(registro)
+            ts_inicio = ts_inicio or ts_fim
+        linhas.append(linha)
+        posicao += len(linha)
+    if linhas:
+        yield seg_inicio, posicao, ts_inicio, ts_fim, linhas
+
+
+def _segmentos_json(arquivo, inicio: int) -> Iterator[Tuple[int, int, Optional[str], Optional[str], List]]:
+    """Segmentos do log estruturado: linhas consecutivas com o mesmo proposta_id"""
+    seg_inicio, ts_inicio, ts_fim, registros, atual = inicio, None, None, [], None
+    posicao = inicio
+    for posicao, linha in _linhas(arquivo, inicio):
+        try:
+            registro = orjson.loads(linha)
+        except orjson.JSONDecodeError:
+            posicao += len(linha)
+            continue
+        proposta_id = registro.get("proposta_id")
+        if registros and proposta_id != atual:
+            yield seg_inicio, posicao, ts_inicio, ts_fim, registros
+            seg_inicio, ts_inicio, registros = posicao, None, []
+        atual = proposta_id
+        ts_fim = str(registro.get("timestamp", ""))[:19].replace("T", " ") or ts_fim
+        ts_inicio = ts_inicio or ts_fim
+        registros.append(registro)
+        posicao += len(linha)
+    if registros:
+        yield seg_inicio, posicao, ts_inicio, ts_fim, registros
+
+
+def _chaves_texto(linhas: List[bytes]) -> Set[Tuple[str, str]]:
+    return extrair_chaves(b"".join(linhas).decode("utf-8", "replace"))
+
+
+def _chaves_json(registros: List[dict]) -> Set[Tuple[str, str]]:
+    chaves = set()
+    for registro in registros:
+        if registro.get("proposta_id"):
+            chaves.add(("proposta", str(registro["proposta_id"]).lower()))
+        if registro.get("client"):
+            _adicionar_cliente(chaves, registro["client"])
+        dados = registro.get("dados")
+        if isinstance(dados, dict):
+            if dados.get("nome_cliente"):
+                _adicionar_cliente(chaves, dados["nome_cliente"])
+            if dados.get("telefone_cliente"):
+                _adicionar_telefone(chaves, dados["telefone_cliente"])
+        chaves |= extrair_chaves(str(registro.get("message", "")))
+    return chaves
+
+
+def _eh_json(caminho: Path) -> bool:
+    return ".jsonl" in caminho.suffixes
+
+
+def arquivos_de_log(diretorio: Path = LOGS_DIR) -> List[Path]:
+    """Arquivos de log do diretório, dos mais antigos para os mais novos"""
+    encontrados = {caminho for padrao in PADROES_ARQUIVOS for caminho in diretorio.glob(padrao) if caminho.is_file()}
+    return sorted(encontrados, key=lambda caminho: caminho.stat().st_mtime_ns)
+
+
+def _assinatura(caminho: Path) -> bytes:
+    """Bytes iniciais do conteúdo (descomprimido): sobrevivem à rotação e à compressão"""
+    with abrir_log(caminho) as arquivo:
+        return arquivo.read(TAMANHO_ASSINATURA)
+
+
+# ---------------------------------------------------------------------------
+# Índice
+# ---------------------------------------------------------------------------
+
+class IndiceLogs:
+    """Índice em SQLite dos logs de um diretório"""
+
+    def __init__(self, caminho: Path = INDICE_LOGS_FILE, diretorio: Path = LOGS_DIR):
+        self.diretorio = Path(diretorio)
+        Path(caminho).parent.mkdir(parents=True, exist_ok=True)
+        self.conexao = sqlite3.connect(str(caminho))
+        if self.conexao.execute("PRAGMA user_version").fetchone()[0] != VERSAO_INDICE:
+            self._recriar()
+
+    def _recriar(self) -> None:
+        with self.conexao:
+            for tabela in ("arquivos", "segmentos", "chaves"):
+                self.conexao.execute(f"DROP TABLE IF EXISTS {tabela}")
+            self.conexao.executescript(ESQUEMA)
+            self.conexao.execute(f"PRAGMA user_version = {VERSAO_INDICE}")
+
+    def fechar(self) -> None:
+        self.conexao.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.fechar()
+
+    # -- atualização --------------------------------------------------------
+
+    def atualizar(self) -> Dict[str, int]:
+        """
+        Indexa o que mudou desde a última atualização
+
+        Returns:
+            Contagem de arquivos novos, atualizados, reconhecidos após
+            rotação e removidos, e de segmentos indexados
+        """
+        resumo = {"novos": 0, "atualizados": 0, "rotacionados": 0, "removidos": 0, "segmentos": 0}
+        conhecidos = {
+            caminho: (tamanho, mtime_ns, assinatura, processado)
+            for caminho, tamanho, mtime_ns, assinatura, processado
+            in self.conexao.execute("SELECT caminho, tamanho, mtime_ns, assinatura, processado FROM arquivos")
+        }
+        atuais = arquivos_de_log(self.diretorio)
+        assinaturas = {str(caminho): _assinatura(caminho) for caminho in atuais}
+
+        # Entradas cujo arquivo foi rotacionado (renomeado) ou apagado
+        orfaos = {
+            caminho: dados for caminho, dados in conhecidos.items()
+            if caminho not in assinaturas and not Path(caminho).exists()
+            or caminho in assinaturas and not assinaturas[caminho].startswith(dados[2])
+        }
+
+        with self.conexao:
+            # Arquivos novos primeiro: um rotacionado herda o índice do original
+            for caminho in sorted(atuais, key=lambda c: str(c) in conhecidos):
+                chave = str(caminho)
+                estado = caminho.stat()
+                if chave not in conhecidos:
+                    origem = self._origem_rotacao(assinaturas[chave], orfaos)
+                    if origem:
+                        self._renomear(origem, chave)
+                        resumo["rotacionados"] += 1
+                        inicio = conhecidos[origem][3]
+                        conhecidos[chave] = conhecidos.pop(origem)
+                    else:
+                        resumo["novos"] += 1
+                        inicio = 0
+                else:
+                    tamanho, mtime_ns, assinatura, processado = conhecidos[chave]
+                    if (tamanho, mtime_ns) == (estado.st_size, estado.st_mtime_ns):
+                        continue
+                    resumo["atualizados"] += 1
+                    inicio = 0 if _comprimido(caminho) or chave in orfaos else processado
+                    orfaos.pop(chave, None)
+                resumo["segmentos"] += self._indexar(caminho, inicio, estado)
+
+            for caminho in orfaos:
+                if caminho in conhecidos and caminho not in assinaturas:
+                    self._remover(caminho)
+                    resumo["removidos"] += 1
+        return resumo
+
+    @staticmethod
+    def _origem_rotacao(assinatura: bytes, orfaos: Dict) -> Optional[str]:
+        """Entrada órfã com os mesmos bytes iniciais do arquivo novo"""
+        for origem, (_, _, assinatura_origem, _) in orfaos.items():
+            if assinatura_origem and assinatura.startswith(assinatura_origem):
+                del orfaos[origem]
+                return origem
+        return None
+
+    def _renomear(self, origem: str, destino: str) -> None:
+        self.conexao.execute("UPDATE arquivos SET caminho = ? WHERE caminho = ?", (destino, origem))
+        self.conexao.execute("UPDATE segmentos SET arquivo = ? WHERE arquivo = ?", (destino, origem))
+
+    def _remover(self, caminho: str, a_partir: int = 0) -> None:
+        self.conexao.execute(
+            "DELETE FROM chaves WHERE segmento IN (SELECT id FROM segmentos WHERE arquivo = ? AND inicio >= ?)",
+            (caminho, a_partir),
+        )
+        self.conexao.execute("DELETE FROM segmentos WHERE arquivo = ? AND inicio >= ?", (caminho, a_partir))
+        if a_partir == 0:
+            self.conexao.execute("DELETE FROM arquivos WHERE caminho = ?", (caminho,))
+
+    def _indexar(self, caminho: Path, inicio: int, estado) -> int:
+        """
+        Indexa o arquivo a partir de `inicio`
+
+        O último segmento de um arquivo ainda em escrita pode crescer; por isso
+        a próxima atualização recomeça do início dele.
+        """
+        chave = str(caminho)
+        self._remover(chave, inicio)
+        segmentar, chaves_de = (_segmentos_json, _chaves_json) if _eh_json(caminho) else (_segmentos_texto, _chaves_texto)
+        processado, quantidade, fim = inicio, 0, inicio
+        with abrir_log(caminho) as arquivo:
+            for seg_inicio, fim, ts_inicio, ts_fim, conteudo in segmentar(arquivo, inicio):
+                cursor = self.conexao.execute(
+                    "INSERT INTO segmentos (arquivo, inicio, fim, ts_inicio, ts_fim) VALUES (?, ?, ?, ?, ?)",
+                    (chave, seg_inicio, fim, ts_inicio, ts_fim),
+                )
+                self.conexao.executemany(
+                    "INSERT INTO chaves (tipo, valor, segmento) VALUES (?, ?, ?)",
+                    [(tipo, valor, cursor.lastrowid) for tipo, valor in chaves_de(conteudo)],
+                )
+                processado = seg_inicio
+                quantidade += 1
+        if _comprimido(caminho):
+            processado = fim
+        self.conexao.execute(
+            "INSERT OR REPLACE INTO arquivos (caminho, tamanho, mtime_ns, assinatura, processado) VALUES (?, ?, ?, ?, ?)",
+            (chave, estado.st_size, estado.st_mtime_ns, _assinatura(caminho), processado),
+        )
+        return quantidade
+
+    # -- consulta -----------------------------------------------------------
+
+    def buscar(
+        self,
+        cliente: Optional[str] = None,
+        telefone: Optional[str] = None,
+        proposta_id: Optional[str] = None,
+        inicio: Optional[str] = None,
+        fim: Optional[str] = None,
+        limite: int = 100,
+    ) -> List[Segmento]:
+        """
+        Segmentos que atendem a todos os filtros informados
+
+        Args:
+            cliente: Nome ou início do nome (ou sobrenome), sem diferenciar acentos
+            telefone: Número ou apenas o final dele, em qualquer formatação
+            proposta_id: Id da proposta ou o início dele
+            inicio: Horário inicial (dd/mm/YYYY [HH:MM[:SS]])
+            fim: Horário final (dd/mm/YYYY [HH:MM[:SS]])
+            limite: Máximo de segmentos retornados
+        """
+        condicoes, parametros = [], []
+        for tipo, valor in (
+            ("cliente", normalizar_nome(cliente) if cliente else None),
+            ("telefone", normalizar_telefone(telefone) if telefone else None),
+            ("proposta", proposta_id.strip().lower() if proposta_id else None),
+        ):
+            if valor is None:
+                continue
+            condicoes.append("id IN (SELECT segmento FROM chaves WHERE tipo = ? AND valor >= ? AND valor < ?)")
+            parametros += [tipo, valor, valor + "\U0010ffff"]
+        if inicio:
+            condicoes.append("ts_fim >= ?")
+            parametros.append(normalizar_horario(inicio))
+        if fim:
+            condicoes.append("ts_inicio <= ?")
+            parametros.append(normalizar_horario(fim, fim=True))
+        onde = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        consulta = f"SELECT arquivo, inicio, fim, ts_inicio, ts_fim FROM segmentos {onde} ORDER BY ts_inicio, id LIMIT ?"
+        return [Segmento(*linha) for linha in self.conexao.execute(consulta, (*parametros, limite))]
+
+
+def ler_segmento(segmento: Segmento) -> str:
+    """Conteúdo de um segmento, lido do arquivo de log original"""
+    with abrir_log(Path(segmento.arquivo)) as arquivo:
+        arquivo.seek(segmento.inicio)
+        return arquivo.read(segmento.fim - segmento.inicio).decode("utf-8", "replace")
+
+
+def main(argumentos: Optional[Iterable[str]] = None) -> int:
+    """Atualiza o índice e executa a busca"""
+    parser = argparse.ArgumentParser(description="Busca nos logs por cliente, telefone, proposta e horário")
+    parser.add_argument("--cliente", help="nome, início do nome ou sobrenome")
+    parser.add_argument("--telefone", help="número ou final do número")
+    parser.add_argument("--proposta", help="id da proposta (ou o início dele)")
+    parser.add_argument("--inicio", help="horário inicial, dd/mm/YYYY [HH:MM[:SS]]")
+    parser.add_argument("--fim", help="horário final, dd/mm/YYYY [HH:MM[:SS]]")
+    parser.add_argument("--limite", type=int, default=100)
+    parser.add_argument("--mostrar", action="store_true", help="imprime as linhas de cada segmento")
+    parser.add_argument("--sem-atualizar", action="store_true", help="consulta o índice sem atualizá-lo")
+    parser.add_argument("--diretorio", type=Path, default=LOGS_DIR)
+    parser.add_argument("--indice", type=Path, default=INDICE_LOGS_FILE)
+    args = parser.parse_args(argumentos)
+
+    with IndiceLogs(args.indice, args.diretorio) as indice:
+        if not args.sem_atualizar:
+            inicio = time.perf_counter()
+            resumo = indice.atualizar()
+            print(f"Índice atualizado em {(time.perf_counter() - inicio) * 1000:.1f} ms: {resumo}", file=sys.stderr)
+        inicio = time.perf_counter()
+        try:
+            segmentos = indice.buscar(args.cliente, args.telefone, args.proposta, args.inicio, args.fim, args.limite)
+        except ValueError as e:
+            parser.error(str(e))
+        duracao = (time.perf_counter() - inicio) * 1000
+
+    for segmento in segmentos:
+        print(f"{segmento.arquivo}:{segmento.inicio}-{segmento.fim}  {segmento.ts_inicio} → {segmento.ts_fim}")
+        if args.mostrar:
+            print(ler_segmento(segmento))
+    print(f"{len(segmentos)} segmento(s) em {duracao:.1f} ms", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,15 +2,52 @@
 Serviço de logging da aplicação
 """
 
+import atexit
+import copy
+import gzip
+import queue
+import random
+import re
 import sys
 import json
+import threading
+import time
+import traceback
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
+
+import orjson
 from loguru import logger
 
+from app.config import (
+    CORPO_BRUTO_AMOSTRAGEM,
+    CORPO_BRUTO_AMOSTRAGEM_PADRAO,
+    CORPO_BRUTO_CAMPOS_SENSIVEIS,
+    CORPO_BRUTO_DEBUG,
+    CORPO_BRUTO_DIR,
+    CORPO_BRUTO_MAX_BYTES,
+    LOG_ASSINCRONO,
+    LOG_FILA_AMOSTRA,
+    LOG_FILA_ENCERRAMENTO,
+    LOG_FILA_NIVEL_DESCARTE,
+    LOG_FILA_POLITICA,
+    LOG_FILA_TAMANHO,
+    LOG_JSON,
+    LOG_JSON_FILE,
+)
+from app.services import metricas, rastreamento
+from app.services.contexto_requisicao import contexto_atual
+
 # Configuração do logger
 LOG_FILE = Path(__file__).resolve().parent.parent.parent / "logs" / "app.log"
 
+# Políticas aceitas quando a fila de registros está cheia
+POLITICAS_FILA = ("descartar", "bloquear", "amostrar")
+
+# Campos presentes em todas as linhas do log estruturado (null quando ausentes)
+CAMPOS_ESTRUTURADOS = ("request_id", "proposta_id", "stage", "duration_ms", "client")
+
 # Função para formatar o timestamp no padrão brasileiro
 def format_time_brazil(record):
     dt = datetime.fromtimestamp(record["time"].timestamp())
@@ -21,43 +58,442 @@ def format_time_brazil(record):
 # Configuração do formato de log personalizado
 LOG_FORMAT = "<green>{time_brazil}</green> | <level>{level: <8}</level> | <level>{message}</level>"
 
+
+
+def _anexar_contexto(registro) -> None:
+    """Anexa os ids da requisição em andamento a todos os registros"""
+    contexto = contexto_atual()
+    if contexto is not None:
+        registro["extra"].setdefault("request_id", contexto.request_id)
+        if contexto.proposta_id is not None:
+            registro["extra"].setdefault("proposta_id", contexto.proposta_id)
+
+
 # Configurar o logger
 logger.remove()  # Remove o handler padrão
+logger.configure(patcher=_anexar_contexto)
 
-# Adiciona handler para console
-logger.add(
-    sys.stderr,
-    format=LOG_FORMAT,
-    level="INFO",
-    colorize=True,
-    filter=format_time_brazil
-)
+# Modelo sem handlers para criar loggers independentes (loggers com handlers
+# de arquivo/console não podem ser copiados)
+_modelo_logger = copy.deepcopy(logger)
+
+
+def novo_logger():
+    """Cria um logger com o próprio conjunto de handlers, independente do principal"""
+    return copy.deepcopy(_modelo_logger)
+
+
+def _formato_console(registro) -> str:
+    """Formato do console no modo síncrono (tabelas montadas só aqui)"""
+    registro["extra"]["_texto"] = _texto_registro(registro)
+    return "<green>{time_brazil}</green> | <level>{level: <8}</level> | <level>{extra[_texto]}</level>\n"
+
+
+def _formato_arquivo(registro) -> str:
+    """Formato do arquivo de texto no modo síncrono"""
+    registro["extra"]["_texto"] = _texto_registro(registro)
+    return "{time_brazil} | {level: <8} | {extra[_texto]}\n"
+
+
+def _formato_json(registro) -> str:
+    """Formato do log estruturado no modo síncrono"""
+    registro["extra"]["_json"] = _linha_json(registro)
+    return "{extra[_json]}"
+
+
+def _adicionar_sinks(destino) -> list:
+    """Adiciona os sinks de console e arquivo (e o estruturado) e retorna seus ids"""
+    ids = [
+        # Adiciona handler para console
+        destino.add(
+            sys.stderr,
+            format=_formato_console,
+            level="INFO",
+            colorize=True,
+            filter=format_time_brazil
+        ),
+        # Adiciona handler para arquivo de log
+        destino.add(
+            LOG_FILE,
+            format=_formato_arquivo,
+            level="INFO",
+            rotation="10 MB",  # Rotação quando o arquivo atingir 10MB
+            retention="30 days",  # Mantém logs por 30 dias
+            filter=format_time_brazil
+        ),
+    ]
+    if LOG_JSON:
+        ids.append(destino.add(LOG_JSON_FILE, format=_formato_json, level="INFO",
+                               rotation="10 MB", retention="30 days"))
+    return ids
+
+
+def _escritores():
+    """
+    Loggers usados pela thread de escrita: (console, arquivo, estruturado)
+    
+    Recebem texto já formatado (opt(raw=True)); os arquivos mantêm a rotação
+    e a retenção dos sinks síncronos.
+    """
+    console = novo_logger()
+    console.add(sys.stderr, format="{message}", colorize=True)
+    arquivo = novo_logger()
+    arquivo.add(LOG_FILE, format="{message}", rotation="10 MB", retention="30 days")
+    estruturado = None
+    if LOG_JSON:
+        estruturado = novo_logger()
+        estruturado.add(LOG_JSON_FILE, format="{message}", rotation="10 MB", retention="30 days")
+    return console, arquivo, estruturado
+
+
+# Quantidade máxima de registros gravados de uma só vez pela thread de escrita
+TAMANHO_LOTE_LOG = 256
+
+# Horário já formatado do último segundo visto pela thread de escrita
+_ultimo_horario = (None, "")
+
+
+def _horario_brasil(registro) -> str:
+    """Mesmo formato de format_time_brazil, reaproveitado dentro do mesmo segundo"""
+    global _ultimo_horario
+    segundo = int(registro["time"].timestamp())
+    if _ultimo_horario[0] != segundo:
+        _ultimo_horario = (segundo, datetime.fromtimestamp(segundo).strftime("%d/%m/%Y %H:%M:%S"))
+    return _ultimo_horario[1]
+
+
+def _texto_registro(registro) -> str:
+    """
+    Mensagem do registro para os logs de texto, com a tabela dos dados
+    anexados por log_tabela e o traceback quando houver exceção
+    """
+    texto = registro["extra"].get("_texto")
+    if texto is not None:
+        return texto
+    texto = registro["message"]
+    request_id = registro["extra"].get("request_id")
+    if request_id is not None:
+        texto = f"[{request_id}] {texto}"
+    dados = registro["extra"].get("dados")
+    if dados is not None:
+        texto += "\n" + format_dict_table(dados)
+    if registro["exception"] is not None:
+        texto += "\n" + "".join(traceback.format_exception(*registro["exception"])).rstrip("\n")
+    return texto
+
+
+def _linha_json(registro) -> str:
+    """Linha do log estruturado: esquema fixo, dados anexados sem formatação"""
+    extra = registro["extra"]
+    linha = {
+        "timestamp": registro["time"].isoformat(),
+        "level": registro["level"].name,
+        "message": registro["message"],
+    }
+    for campo in CAMPOS_ESTRUTURADOS:
+        linha[campo] = extra.get(campo)
+    if extra.get("dados") is not None:
+        linha["dados"] = extra["dados"]
+    if registro["exception"] is not None:
+        linha["exception"] = "".join(traceback.format_exception(*registro["exception"]))
+    return orjson.dumps(linha, default=str, option=orjson.OPT_NON_STR_KEYS).decode() + "\n"
+
+
+def _linha_arquivo(registro) -> str:
+    """Linha no formato do arquivo de log"""
+    return f"{_horario_brasil(registro)} | {registro['level'].name: <8} | {_texto_registro(registro)}\n"
+
+
+def _linha_console(registro) -> str:
+    """Linha no formato do console, com as marcações de cor do loguru"""
+    cor = logger.level(registro["level"].name).color
+    fecha = "</>" * cor.count("<")
+    texto = _texto_registro(registro).replace("<", "\\<")
+    return (f"<green>{_horario_brasil(registro)}</green> | {cor}{registro['level'].name: <8}{fecha} | "
+            f"{cor}{texto}{fecha}\n")
+
+
+class FilaLog:
+    """
+    Sink do loguru que apenas enfileira o registro; uma thread de escrita
+    formata e grava em lote no console e no arquivo, fora do event loop.
+    
+    Com a fila cheia, registros até nivel_descarte seguem a política:
+    "descartar" (descarta), "amostrar" (mantém 1 de cada `amostra`) ou
+    "bloquear" (aguarda vaga). Registros de nível acima sempre aguardam.
+    """
+    
+    def __init__(self, console, arquivo, estruturado=None, tamanho: int = LOG_FILA_TAMANHO, politica: str = LOG_FILA_POLITICA,
+                 nivel_descarte: str = LOG_FILA_NIVEL_DESCARTE, amostra: int = LOG_FILA_AMOSTRA):
+        if politica not in POLITICAS_FILA:
+            raise ValueError(f"Política de fila de log inválida: {politica}")
+        self.politica = politica
+        self.nivel_descarte = logger.level(nivel_descarte).no
+        self.amostra = max(amostra, 1)
+        self.descartados = 0
+        self._contador_amostra = 0
+        self._console = console
+        self._arquivo = arquivo
+        self._estruturado = estruturado
+        self._fila = queue.Queue(maxsize=tamanho)
+        self._thread = threading.Thread(target=self._escrever, name="log-escritor", daemon=True)
+        self._thread.start()
+    
+    def __call__(self, mensagem):
+        """Recebe a mensagem do loguru (chamado com o lock do handler)"""
+        registro = mensagem.record
+        try:
+            self._fila.put_nowait(registro)
+            return
+        except queue.Full:
+            pass
+        
+        if self.politica != "bloquear" and registro["level"].no <= self.nivel_descarte:
+            self._contador_amostra += 1
+            if self.politica == "descartar" or self._contador_amostra % self.amostra:
+                self.descartados += 1
+                return
+        self._fila.put(registro)
+    
+    def _escrever(self):
+        """Laço da thread de escrita: grava os registros disponíveis em lote"""
+        while True:
+            lote = [self._fila.get()]
+            while len(lote) < TAMANHO_LOTE_LOG:
+                try:
+                    lote.append(self._fila.get_nowait())
+                except queue.Empty:
+                    break
+            
+            registros = [registro for registro in lote if registro is not None]
+            try:
+                self._gravar(registros)
+            except Exception as e:
+                print(f"Erro ao gravar registros de log: {e}", file=sys.stderr)
+            finally:
+                for _ in lote:
+                    self._fila.task_done()
+            if len(registros) < len(lote):
+                return
+    
+    def _gravar(self, registros):
+        """Grava um lote de registros com uma única escrita por sink"""
+        if not registros:
+            return
+        if self._estruturado is not None:
+            self._estruturado.opt(raw=True).info("".join(map(_linha_json, registros)))
+        if self._arquivo is not None:
+            self._arquivo.opt(raw=True).info("".join(map(_linha_arquivo, registros)))
+        if self._console is not None:
+            self._console.opt(raw=True, colors=True).info("".join(map(_linha_console, registros)))
+    
+    def aguardar(self):
+        """Bloqueia até todos os registros enfileirados serem gravados"""
+        self._fila.join()
+    
+    def estado(self) -> dict:
+        """Registros aguardando escrita, capacidade e descartes"""
+        return {"pendentes": self._fila.qsize(), "capacidade": self._fila.maxsize, "descartados": self.descartados}
+    
+    def encerrar(self, timeout: float = LOG_FILA_ENCERRAMENTO) -> bool:
+        """
+        Grava o que estiver na fila, para a thread de escrita e fecha os sinks
+        
+        Returns:
+            True se a fila foi esvaziada dentro do prazo
+        """
+        try:
+            self._fila.put(None, timeout=timeout)
+        except queue.Full:
+            return False
+        self._thread.join(timeout)
+        concluido = not self._thread.is_alive()
+        if concluido:
+            if self.descartados:
+                self._gravar([_registro_aviso(f"{self.descartados} registros de log descartados com a fila cheia")])
+            for escritor in (self._console, self._arquivo, self._estruturado):
+                if escritor is not None:
+                    escritor.remove()
+        return concluido
+
+
+def _registro_aviso(mensagem: str) -> dict:
+    """Registro mínimo de nível WARNING, para avisos da própria fila"""
+    return {"time": datetime.now().astimezone(), "level": logger.level("WARNING"), "exception": None,
+            "message": mensagem, "extra": {}}
+
+
+# Estado atual dos sinks: fila (ou None, se síncrono) e ids no logger da aplicação
+_fila = None
+_ids_sinks = []
+
+
+def configurar_log(assincrono: bool = LOG_ASSINCRONO, **opcoes_fila):
+    """
+    (Re)configura os sinks do logger da aplicação
+    
+    Args:
+        assincrono: Grava por meio de FilaLog; se False, os sinks são
+            chamados diretamente por quem registra
+        **opcoes_fila: Parâmetros de FilaLog (tamanho, politica, ...)
+    """
+    global _fila, _ids_sinks
+    encerrar_log()
+    for id_sink in _ids_sinks:
+        logger.remove(id_sink)
+    
+    if assincrono:
+        _fila = FilaLog(*_escritores(), **opcoes_fila)
+        _ids_sinks = [logger.add(_fila, format="{message}", level="INFO", catch=False)]
+    else:
+        _ids_sinks = _adicionar_sinks(logger)
+
+
+def aguardar_log():
+    """Aguarda a gravação dos registros já enfileirados"""
+    if _fila is not None:
+        _fila.aguardar()
+
+
+def estado_log():
+    """Estado da fila de registros (None se o log for síncrono)"""
+    return _fila.estado() if _fila is not None else None
+
+
+def encerrar_log(timeout: float = LOG_FILA_ENCERRAMENTO) -> bool:
+    """
+    Esvazia a fila e para a thread de escrita (no encerramento da aplicação)
+    
+    Registros posteriores passam a ser gravados de forma síncrona.
+    
+    Returns:
+        True se todos os registros foram gravados dentro do prazo
+    """
+    global _fila, _ids_sinks
+    if _fila is None:
+        return True
+    fila, _fila = _fila, None
+    for id_sink in _ids_sinks:
+        logger.remove(id_sink)
+    concluido = fila.encerrar(timeout)
+    _ids_sinks = _adicionar_sinks(logger)
+    return concluido
 
-# Adiciona handler para arquivo de log
-logger.add(
-    LOG_FILE,
-    format="{time_brazil} | {level: <8} | {message}",
-    level="INFO",
-    rotation="10 MB",  # Rotação quando o arquivo atingir 10MB
-    retention="30 days",  # Mantém logs por 30 dias
-    filter=format_time_brazil
-)
 
+configurar_log()
+atexit.register(encerrar_log)
 
-def log_raw_request_body(raw_body):
-    """Registra o corpo bruto da requisição sem modificações"""
+
+def contexto_log(**campos):
+    """
+    Anexa campos (ex.: proposta_id, client) a todos os registros emitidos
+    dentro do bloco, inclusive em funções chamadas a partir dele
+    """
+    return logger.contextualize(**campos)
+
+
+@contextmanager
+def etapa(nome: str):
+    """
+    Mede uma etapa do processamento: registra stage e duration_ms ao final,
+    alimenta o histograma de duração das etapas (/metrics) e abre um span
+    com o nome da etapa
+    """
+    inicio = time.perf_counter()
     try:
-        # Decodifica o corpo bruto para string
-        raw_body_str = raw_body.decode('utf-8')
-        logger.info(f"RAW REQUEST BODY (UNMODIFIED): {raw_body_str}")
+        with logger.contextualize(stage=nome), rastreamento.span(nome):
+            yield
+    except BaseException:
+        segundos = time.perf_counter() - inicio
+        metricas.ETAPAS.observar(segundos, etapa=nome, resultado="erro")
+        duracao = segundos * 1000
+        logger.bind(stage=nome, duration_ms=round(duracao, 3)).warning(f"Etapa {nome} falhou após {duracao:.1f} ms")
+        raise
+    segundos = time.perf_counter() - inicio
+    metricas.ETAPAS.observar(segundos, etapa=nome, resultado="ok")
+    duracao = segundos * 1000
+    logger.bind(stage=nome, duration_ms=round(duracao, 3)).info(f"Etapa {nome} concluída em {duracao:.1f} ms")
+
+
+def log_tabela(titulo, dados, nivel="INFO"):
+    """
+    Registra um dicionário. A tabela de format_dict_table só é montada por
+    sinks de texto, no momento da gravação; o log estruturado recebe os dados
+    como JSON.
+    """
+    logger.bind(dados=dados).log(nivel, titulo)
+
+
+def _padrao_campos_sensiveis(campos) -> re.Pattern:
+    """Expressão que encontra o valor (string ou número JSON) de cada campo sensível"""
+    nomes = b"|".join(re.escape(campo.encode()) for campo in campos)
+    return re.compile(rb'("(?:' + nomes + rb')"\s*:\s*)(?:"((?:[^"\\]|\\.)*)"|(-?[0-9][0-9.eE+-]*))')
+
+
+_CAMPOS_SENSIVEIS = _padrao_campos_sensiveis(CORPO_BRUTO_CAMPOS_SENSIVEIS)
+
+
+def _mascarar(valor: bytes) -> bytes:
+    """Mantém só o suficiente para conferência: domínio do e-mail ou 2 últimos caracteres"""
+    usuario, arroba, dominio = valor.partition(b"@")
+    if arroba:
+        return usuario[:1] + b"***@" + dominio
+    return b"***" + valor[-2:] if len(valor) > 4 else b"***"
+
+
+def _substituir_sensivel(m: re.Match) -> bytes:
+    # Números (ex.: telefone sem formatação) também viram string mascarada
+    valor = m.group(2) if m.group(2) is not None else m.group(3)
+    return m.group(1) + b'"' + _mascarar(valor) + b'"'
+
+
+def mascarar_corpo(raw_body: bytes) -> bytes:
+    """Mascara os campos sensíveis no corpo bruto, sem decodificar o JSON"""
+    return _CAMPOS_SENSIVEIS.sub(_substituir_sensivel, raw_body)
+
+
+def _gravar_corpo_completo(corpo: bytes, proposta_id=None):
+    """Grava o corpo completo (já mascarado) comprimido, para depuração"""
+    CORPO_BRUTO_DIR.mkdir(parents=True, exist_ok=True)
+    nome = proposta_id or datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    caminho = CORPO_BRUTO_DIR / f"{nome}.json.gz"
+    with gzip.open(caminho, "wb", compresslevel=6) as arquivo:
+        arquivo.write(corpo)
+    return caminho
+
+
+def log_raw_request_body(raw_body, rota=None, proposta_id=None):
+    """
+    Registra o corpo bruto da requisição
+    
+    Apenas uma amostra das requisições de cada rota é registrada
+    (CORPO_BRUTO_AMOSTRAGEM), com os campos sensíveis mascarados e no máximo
+    CORPO_BRUTO_MAX_BYTES bytes. Com CORPO_BRUTO_DEBUG, o corpo completo
+    (mascarado) também é gravado em CORPO_BRUTO_DIR.
+    """
+    taxa = CORPO_BRUTO_AMOSTRAGEM.get(rota, CORPO_BRUTO_AMOSTRAGEM_PADRAO)
+    if taxa <= 0 or (taxa < 1 and random.random() >= taxa):
+        return
+    
+    try:
+        corpo = mascarar_corpo(raw_body)
+        if CORPO_BRUTO_DEBUG:
+            caminho = _gravar_corpo_completo(corpo, proposta_id)
+            logger.info(f"Corpo completo da requisição gravado em {caminho}")
+        
+        # Decodifica o corpo bruto para string (limitado ao tamanho máximo)
+        raw_body_str = corpo[:CORPO_BRUTO_MAX_BYTES].decode('utf-8', errors='replace')
+        if len(corpo) > CORPO_BRUTO_MAX_BYTES:
+            raw_body_str += f"... [truncado: {len(corpo)} bytes]"
+        logger.info(f"RAW REQUEST BODY: {raw_body_str}")
     except Exception as e:
-        logger.error(f"Erro ao decodificar corpo bruto da requisição: {e}")
+        logger.error(f"Erro ao registrar corpo bruto da requisição: {e}")
 
 def log_request(request_data, client_info=None):
     """Registra informações sobre a requisição recebida"""
     # Log completo dos dados brutos recebidos em formato de tabela (excluindo cenários)
     raw_req = {k: v for k, v in request_data.items() if k != "cenarios"}
-    logger.info("\n" + format_dict_table(raw_req))
+    log_tabela("", raw_req)
     
     # Log de informações do cliente
     if client_info:
@@ -101,8 +537,7 @@ def log_data_saved(request_data):
     
     # Exibir dados básicos recebidos sem cenários
     raw_data = {k: v for k, v in request_data.items() if k != "cenarios"}
-    logger.info("DADOS RECEBIDOS (sem cenários de pagamento):")
-    logger.info("\n" + format_dict_table(raw_data))
+    log_tabela("DADOS RECEBIDOS (sem cenários de pagamento):", raw_data)
     
     # Exibir apenas o cenário relevante com formato simplificado
     cenarios = request_data.get("cenarios", {})
@@ -251,8 +686,7 @@ def log_data_saved(request_data):
             logger.info(f"  - Desconto: R$ {proposal_data['desconto_blindagem']:,.2f}")
         
         # Log dos dados processados da proposta
-        logger.info("DADOS PROCESSADOS DA PROPOSTA:")
-        logger.info("\n" + format_dict_table(proposal_data))
+        log_tabela("DADOS PROCESSADOS DA PROPOSTA:", proposal_data)
     
     except Exception as e:
         logger.error(f"Erro ao processar dados da proposta para logging: {str(e)}")
@@ -0,0 +1,204 @@
+"""
+Métricas da aplicação no formato de texto do Prometheus
+
+Contadores, medidores e histogramas mantidos em memória, com um lock por
+métrica; registrar um valor custa uma busca binária e uma soma, o que
+permite deixá-los sempre ativos. O texto é montado apenas quando /metrics
+é consultado.
+"""
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+TIPO_CONTEUDO = "text/plain; version=0.0.4; charset=utf-8"
+
+# Limites (em segundos) dos histogramas de duração: de 1 ms ao timeout do download do template
+LIMITES_DURACAO = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _rotulos_texto(nomes: Sequence[str], valores: Sequence, extra: str = "") -> str:
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _numero(valor: float) -> str:
+    return str(int(valor)) if float(valor).is_integer() else repr(float(valor))
+
+
+class Metrica:
+    """Base das métricas: nome, descrição e valores por combinação de rótulos"""
+    tipo = ""
+
+    def __init__(self, nome: str, descricao: str, rotulos: Sequence[str] = ()):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = tuple(rotulos)
+        self._lock = threading.Lock()
+        self._valores: Dict[Tuple, object] = {}
+
+    def _chave(self, rotulos: Dict[str, str]) -> Tuple:
+        if len(rotulos) != len(self.rotulos):
+            raise ValueError(f"{self.nome}: rótulos esperados {self.rotulos}, recebidos {tuple(rotulos)}")
+        return tuple(str(rotulos[nome]) for nome in self.rotulos)
+
+    def _linhas(self) -> List[str]:
+        raise NotImplementedError
+
+    def exportar(self) -> str:
+        cabecalho = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} {self.tipo}"]
+        return "\n".join(cabecalho + self._linhas()) + "\n"
+
+
+class Contador(Metrica):
+    """Valor que só cresce (ex.: propostas por resultado)"""
+    tipo = "counter"
+
+    def inc(self, valor: float = 1, **rotulos) -> None:
+        chave = self._chave(rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def valor(self, **rotulos) -> float:
+        return self._valores.get(self._chave(rotulos), 0)
+
+    def _linhas(self) -> List[str]:
+        with self._lock:
+            valores = sorted(self._valores.items())
+        return [f"{self.nome}{_rotulos_texto(self.rotulos, chave)} {_numero(v)}" for chave, v in valores]
+
+
+class Medidor(Contador):
+    """Valor que sobe e desce (ex.: requisições em andamento)"""
+    tipo = "gauge"
+
+    def dec(self, valor: float = 1, **rotulos) -> None:
+        self.inc(-valor, **rotulos)
+
+    @contextmanager
+    def em_andamento(self, **rotulos):
+        """Soma 1 enquanto o bloco executa"""
+        self.inc(**rotulos)
+        try:
+            yield
+        finally:
+            self.dec(**rotulos)
+
+    def _linhas(self) -> List[str]:
+        linhas = super()._linhas()
+        # Sem rótulos, o medidor é exportado mesmo antes do primeiro uso
+        return linhas or ([f"{self.nome} 0"] if not self.rotulos else [])
+
+
+class Histograma(Metrica):
+    """Distribuição de valores em faixas cumulativas (le), com soma e contagem"""
+    tipo = "histogram"
+
+    def __init__(self, nome: str, descricao: str, rotulos: Sequence[str] = (), limites=LIMITES_DURACAO):
+        super().__init__(nome, descricao, rotulos)
+        self.limites = tuple(sorted(limites))
+
+    def observar(self, valor: float, **rotulos) -> None:
+        chave = self._chave(rotulos)
+        faixa = bisect_left(self.limites, valor)
+        with self._lock:
+            serie = self._valores.get(chave)
+            if serie is None:
+                # [contagem por faixa (+Inf na última)..., soma]
+                serie = self._valores[chave] = [0] * (len(self.limites) + 1) + [0.0]
+            serie[faixa] += 1
+            serie[-1] += valor
+
+    def contagem(self, **rotulos) -> int:
+        serie = self._valores.get(self._chave(rotulos))
+        return sum(serie[:-1]) if serie else 0
+
+    def _linhas(self) -> List[str]:
+        with self._lock:
+            valores = sorted((chave, list(serie)) for chave, serie in self._valores.items())
+        linhas = []
+        for chave, serie in valores:
+            acumulado = 0
+            for limite, quantidade in zip(self.limites + (float("inf"),), serie[:-1]):
+                acumulado += quantidade
+                le = "+Inf" if limite == float("inf") else _numero(limite)
+                rotulos = _rotulos_texto(self.rotulos, chave, f'le="{le}"')
+                linhas.append(f"{self.nome}_bucket{rotulos} {acumulado}")
+            rotulos = _rotulos_texto(self.rotulos, chave)
+            linhas.append(f"{self.nome}_sum{rotulos} {_numero(serie[-1])}")
+            linhas.append(f"{self.nome}_count{rotulos} {acumulado}")
+        return linhas
+
+
+class Registro:
+    """Conjunto de métricas exportadas juntas"""
+
+    def __init__(self):
+        self.metricas: List[Metrica] = []
+
+    def registrar(self, metrica: Metrica) -> Metrica:
+        self.metricas.append(metrica)
+        return metrica
+
+    def exportar(self) -> str:
+        return "".join(metrica.exportar() for metrica in self.metricas)
+
+
+REGISTRO = Registro()
+
+ETAPAS = REGISTRO.registrar(Histograma(
+    "forsecar_etapa_duracao_segundos",
+    "Duração de cada etapa da geração de proposta",
+    ("etapa", "resultado"),
+))
+PROPOSTAS = REGISTRO.registrar(Contador(
+    "forsecar_propostas_total",
+    "Propostas processadas por tipo de blindagem, template e resultado",
+    ("tipo_blindagem", "template", "resultado"),
+))
+PROPOSTAS_EM_ANDAMENTO = REGISTRO.registrar(Medidor(
+    "forsecar_propostas_em_andamento",
+    "Propostas sendo geradas no momento",
+))
+IDEMPOTENCIA = REGISTRO.registrar(Contador(
+    "forsecar_idempotencia_total",
+    "Propostas com Idempotency-Key por resultado da chave",
+    ("resultado",),
+))
+PROPOSTAS_AGUARDANDO = REGISTRO.registrar(Medidor(
+    "forsecar_propostas_aguardando",
+    "Propostas aguardando vaga no controle de admissão",
+))
+REQUISICOES_EM_ANDAMENTO = REGISTRO.registrar(Medidor(
+    "forsecar_requisicoes_em_andamento",
+    "Requisições HTTP em andamento",
+))
+CHAMADAS_EXTERNAS_EM_ANDAMENTO = REGISTRO.registrar(Medidor(
+    "forsecar_chamadas_externas_em_andamento",
+    "Chamadas externas (template, upload, WhatsApp) aguardando resposta",
+))
+
+
+def exportar() -> str:
+    """Texto de todas as métricas registradas, no formato do Prometheus"""
+    return REGISTRO.exportar()
+
+
+class MiddlewareMetricas:
+    """Middleware ASGI que mantém o medidor de requisições em andamento"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with REQUISICOES_EM_ANDAMENTO.em_andamento():
+            await self.app(scope, receive, send)
@@ -0,0 +1,124 @@
+"""
+Monitor do event loop
+
+Uma tarefa no loop dorme LOOP_MONITOR_INTERVALO e mede quanto acordou
+atrasada: o atraso de agendamento que toda requisição em andamento sofre.
+O valor alimenta o histograma forsecar_loop_atraso_segundos (/metrics).
+
+Enquanto o loop está bloqueado a tarefa não executa; por isso uma thread de
+vigia acompanha o último sinal da tarefa. Quando o loop fica mais de
+LOOP_BLOQUEIO_LIMITE sem responder, a vigia captura a pilha da thread do
+loop (a chamada bloqueante em execução) e a tarefa asyncio corrente, e
+registra um aviso no log, uma vez por bloqueio.
+"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Optional
+
+from app.config import LOOP_BLOQUEIO_LIMITE, LOOP_MONITOR_INTERVALO
+from app.services import logger_service, metricas
+
+# Bloqueios recentes guardados para consulta
+BLOQUEIOS_GUARDADOS = 20
+
+ATRASO_LOOP = metricas.REGISTRO.registrar(metricas.Histograma(
+    "forsecar_loop_atraso_segundos",
+    "Atraso de agendamento do event loop",
+    limites=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+))
+BLOQUEIOS_LOOP = metricas.REGISTRO.registrar(metricas.Contador(
+    "forsecar_loop_bloqueios_total",
+    "Bloqueios do event loop acima do limite, com pilha capturada",
+))
+
+
+@dataclass(frozen=True, slots=True)
+class Bloqueio:
+    """Pilha capturada durante um bloqueio do loop"""
+    duracao: float  # segundos sem resposta do loop no momento da captura
+    tarefa: Optional[str]
+    pilha: str
+
+
+class MonitorLoop:
+    """Mede o atraso do loop e captura a pilha dos bloqueios"""
+
+    def __init__(self, intervalo: float = LOOP_MONITOR_INTERVALO, limite: float = LOOP_BLOQUEIO_LIMITE):
+        self.intervalo = intervalo
+        self.limite = limite
+        self.bloqueios: Deque[Bloqueio] = deque(maxlen=BLOQUEIOS_GUARDADOS)
+        # Atraso (em segundos) da medição mais recente
+        self.ultimo_atraso = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread_loop: Optional[int] = None
+        self._tarefa: Optional[asyncio.Task] = None
+        self._vigia: Optional[threading.Thread] = None
+        self._parar = threading.Event()
+        # Último sinal da tarefa (time.monotonic) e número do sinal já reportado
+        self._sinal = 0.0
+        self._sinais = 0
+        self._reportado = -1
+
+    def iniciar(self) -> None:
+        """Inicia a medição; deve ser chamado dentro do loop monitorado"""
+        self._loop = asyncio.get_running_loop()
+        self._thread_loop = threading.get_ident()
+        self._sinal = time.monotonic()
+        self._parar.clear()
+        self._tarefa = self._loop.create_task(self._medir(), name="monitor-loop")
+        self._vigia = threading.Thread(target=self._vigiar, name="monitor-loop-vigia", daemon=True)
+        self._vigia.start()
+
+    async def parar(self) -> None:
+        """Encerra a tarefa e a thread de vigia"""
+        self._parar.set()
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            try:
+                await self._tarefa
+            except asyncio.CancelledError:
+                pass
+        if self._vigia is not None:
+            await asyncio.to_thread(self._vigia.join)
+
+    async def _medir(self) -> None:
+        while True:
+            inicio = time.monotonic()
+            await asyncio.sleep(self.intervalo)
+            agora = time.monotonic()
+            self.ultimo_atraso = max(0.0, agora - inicio - self.intervalo)
+            ATRASO_LOOP.observar(self.ultimo_atraso)
+            self._sinal = agora
+            self._sinais += 1
+
+    def _vigiar(self) -> None:
+        espera = min(self.intervalo, self.limite) / 2
+        while not self._parar.wait(espera):
+            sinais = self._sinais
+            sem_resposta = time.monotonic() - self._sinal - self.intervalo
+            if sem_resposta >= self.limite and sinais != self._reportado:
+                self._reportado = sinais
+                self._capturar(sem_resposta)
+
+    def _capturar(self, duracao: float) -> None:
+        """Pilha da thread do loop e tarefa corrente, lidas enquanto o loop está bloqueado"""
+        frame = sys._current_frames().get(self._thread_loop)
+        if frame is None:
+            return
+        pilha = "".join(traceback.format_stack(frame))
+        tarefa = asyncio.current_task(self._loop)
+        nome = None
+        if tarefa is not None:
+            coro = tarefa.get_coro()
+            nome = f"{tarefa.get_name()} ({getattr(coro, '__qualname__', coro)})"
+        bloqueio = Bloqueio(duracao, nome, pilha)
+        self.bloqueios.append(bloqueio)
+        BLOQUEIOS_LOOP.inc()
+        logger_service.log_warning(
+            f"Event loop bloqueado há {duracao * 1000:.0f} ms na tarefa {nome}; pilha:\n{pilha.rstrip()}"
+        )
@@ -1,13 +1,16 @@
 """
 Serviço para geração de PDFs de proposta
 """
+import hashlib
+import time
 import uuid
-import httpx
+from dataclasses import dataclass
 from datetime import datetime
 from typing import Dict, Any, Optional
+from app.config import TEMPLATE_CACHE_SEGUNDOS
 from app.services import logger_service
+from app.services.dinheiro import formatar_reais
 import io
-from PyPDF2 import PdfReader, PdfWriter
 
 # URLs dos templates de PDF no Supabase
 PDF_COM_DESCONTO_URL = "https://ahvryabvarxisvfdnmye.supabase.co/storage/v1/object/public/preenchivel-com-desconto//com-desconto.pdf"
@@ -54,11 +57,15 @@ async def baixar_template(url: str) -> bytes:
     Returns:
         Conteúdo binário do template
     """
+    # httpx só é importado na primeira chamada externa (ou no aquecimento)
+    import httpx
+    from app.services.rastreamento_http import cliente_http
+
     logger_service.log_info(f"Baixando template PDF: {url}")
     try:
         # Usando um timeout maior (60 segundos) para garantir que arquivos maiores sejam baixados
         timeout = httpx.Timeout(60.0, connect=30.0)
-        async with httpx.AsyncClient(timeout=timeout) as client:
+        async with cliente_http(timeout=timeout) as client:
             logger_service.log_info("Iniciando download do template...")
             response = await client.get(url)
             
@@ -79,6 +86,70 @@ async def baixar_template(url: str) -> bytes:
         raise Exception(erro)
 
 
+@dataclass(frozen=True, slots=True)
+class TemplateCarregado:
+    """Template baixado e mantido em memória"""
+    url: str
+    conteudo: bytes
+    versao: str  # hash do conteúdo, para identificar a versão em uso
+    carregado_em: float  # time.monotonic() do download
+
+
+# Templates em cache, por URL. No servidor de produção são carregados antes do
+# fork e compartilhados (copy-on-write) pelos workers.
+_templates: Dict[str, TemplateCarregado] = {}
+
+
+async def obter_template(url: str) -> bytes:
+    """
+    Conteúdo do template, do cache ou baixado (e guardado) se ausente ou expirado
+    
+    Se o download de um template expirado falhar, a versão em cache é usada.
+    
+    Args:
+        url: URL do template de PDF
+        
+    Returns:
+        Conteúdo binário do template
+    """
+    template = _templates.get(url)
+    if template is not None and time.monotonic() - template.carregado_em < TEMPLATE_CACHE_SEGUNDOS:
+        return template.conteudo
+    try:
+        conteudo = await baixar_template(url)
+    except Exception:
+        if template is None:
+            raise
+        # Mantém a versão anterior se o template expirado não puder ser baixado
+        logger_service.log_warning(f"Usando template em cache (versão {template.versao}) após falha no download")
+        return template.conteudo
+    if TEMPLATE_CACHE_SEGUNDOS > 0:
+        _templates[url] = TemplateCarregado(url, conteudo, hashlib.sha1(conteudo).hexdigest()[:12], time.monotonic())
+    return conteudo
+
+
+def estado_templates() -> Dict[str, Dict[str, Any]]:
+    """Situação do cache de cada template: carregado, expirado, versão e idade (em segundos)"""
+    estado = {}
+    for tipo, url in ((TEMPLATE_COM_DESCONTO, PDF_COM_DESCONTO_URL), (TEMPLATE_SEM_DESCONTO, PDF_SEM_DESCONTO_URL)):
+        template = _templates.get(url)
+        idade = time.monotonic() - template.carregado_em if template is not None else None
+        estado[tipo] = {
+            "carregado": template is not None,
+            "expirado": idade is not None and idade >= TEMPLATE_CACHE_SEGUNDOS,
+            "versao": template.versao if template is not None else None,
+            "idade_segundos": round(idade, 1) if idade is not None else None,
+            "bytes": len(template.conteudo) if template is not None else 0,
+        }
+    return estado
+
+
+async def carregar_templates() -> None:
+    """Baixa os dois templates para o cache (pré-carregamento)"""
+    for url in (PDF_COM_DESCONTO_URL, PDF_SEM_DESCONTO_URL):
+        await obter_template(url)
+
+
 async def mapear_dados_para_formulario(dados: Dict[str, Any]) -> Dict[str, Any]:
     """
     Mapeia os dados da proposta para os campos do formulário PDF
@@ -113,7 +184,7 @@ async def mapear_dados_para_formulario(dados: Dict[str, Any]) -> Dict[str, Any]:
     campos["vidro_5_anos_ultralight"] = vidro_5_anos_valor
     # Desconto aplicado
     desconto_val = dados.get("desconto_aplicado", 0)
-    campos["desconto"] = f"R$ {desconto_val:.2f}" if desconto_val else ""
+    campos["desconto"] = formatar_reais(desconto_val) if desconto_val else ""
     # Cenários e condições de pagamento
     cenarios = dados.get("cenarios", {})
     suffix_map = {"Comfort 10 anos": "10_anos", "Comfort 18 mm": "18mm", "Ultralight": "ultralight"}
@@ -126,46 +197,46 @@ async def mapear_dados_para_formulario(dados: Dict[str, Any]) -> Dict[str, Any]:
         
         # À vista
         a_v = cond_pagto.get("a_vista", {})
-        campos[f"a_vista_{sufixo}"] = f"R$ {a_v.get('valor_total', 0):.2f}"
-        campos[f"total_{sufixo}"] = f"R$ {a_v.get('valor_total', 0):.2f}"
+        campos[f"a_vista_{sufixo}"] = formatar_reais(a_v.get('valor_total', 0))
+        campos[f"total_{sufixo}"] = formatar_reais(a_v.get('valor_total', 0))
         
         # 2x sem juros
         duas = cond_pagto.get("duas_vezes", {})
         parcelas2 = duas.get("parcelas", [])
         if len(parcelas2) >= 2:
-            campos[f"primeira_parcela_2x_{sufixo}"] = f"R$ {parcelas2[0]['valor']:.2f}"
-            campos[f"segunda_parcela_2x_{sufixo}"] = f"R$ {parcelas2[1]['valor']:.2f}"
-        campos[f"total_2x_{sufixo}"] = f"R$ {duas.get('valor_total', 0):.2f}"
+            campos[f"primeira_parcela_2x_{sufixo}"] = formatar_reais(parcelas2[0]['valor'])
+            campos[f"segunda_parcela_2x_{sufixo}"] = formatar_reais(parcelas2[1]['valor'])
+        campos[f"total_2x_{sufixo}"] = formatar_reais(duas.get('valor_total', 0))
         
         # 3x
         tres = cond_pagto.get("tres_vezes", {})
         parcelas3 = tres.get("parcelas", [])
         if len(parcelas3) >= 1:
-            campos[f"sinal_50_3x_{sufixo}"] = f"R$ {parcelas3[0]['valor']:.2f}"
+            campos[f"sinal_50_3x_{sufixo}"] = formatar_reais(parcelas3[0]['valor'])
         if len(parcelas3) >= 2:
-            campos[f"primeira_parcela_3x_{sufixo}"] = f"R$ {parcelas3[1]['valor']:.2f}"
+            campos[f"primeira_parcela_3x_{sufixo}"] = formatar_reais(parcelas3[1]['valor'])
         if len(parcelas3) >= 3:
-            campos[f"segunda_parcela_3x_{sufixo}"] = f"R$ {parcelas3[2]['valor']:.2f}"
-        campos[f"total_3x_{sufixo}"] = f"R$ {tres.get('valor_total', 0):.2f}"
+            campos[f"segunda_parcela_3x_{sufixo}"] = formatar_reais(parcelas3[2]['valor'])
+        campos[f"total_3x_{sufixo}"] = formatar_reais(tres.get('valor_total', 0))
         
         # 4x
         quatro = cond_pagto.get("quatro_vezes", {})
         parcelas4 = quatro.get("parcelas", [])
         if len(parcelas4) >= 1:
-            campos[f"sinal_60_4x_{sufixo}"] = f"R$ {parcelas4[0]['valor']:.2f}"
+            campos[f"sinal_60_4x_{sufixo}"] = formatar_reais(parcelas4[0]['valor'])
         if len(parcelas4) >= 2:
-            campos[f"primeira_parcela_4x_{sufixo}"] = f"R$ {parcelas4[1]['valor']:.2f}"
+            campos[f"primeira_parcela_4x_{sufixo}"] = formatar_reais(parcelas4[1]['valor'])
         if len(parcelas4) >= 3:
-            campos[f"segunda_parcela_4x_{sufixo}"] = f"R$ {parcelas4[2]['valor']:.2f}"
+            campos[f"segunda_parcela_4x_{sufixo}"] = formatar_reais(parcelas4[2]['valor'])
         if len(parcelas4) >= 4:
-            campos[f"terceira_parcela_4x_{sufixo}"] = f"R$ {parcelas4[3]['valor']:.2f}"
-        campos[f"total_4x_{sufixo}"] = f"R$ {quatro.get('valor_total', 0):.2f}"
+            campos[f"terceira_parcela_4x_{sufixo}"] = formatar_reais(parcelas4[3]['valor'])
+        campos[f"total_4x_{sufixo}"] = formatar_reais(quatro.get('valor_total', 0))
         
         # Cartão de crédito
         cartao = cond_pagto.get("cartao", {})
         for n in range(4, 11):
             opc = cartao.get(f"{n}x", {})
-            campos[f"cartao_{n}_parcelas_{sufixo}"] = f"R$ {opc.get('valor_parcela', 0):.2f}"
+            campos[f"cartao_{n}_parcelas_{sufixo}"] = formatar_reais(opc.get('valor_parcela', 0))
     
     # Contagem de campos preenchidos para log
     campos_preenchidos = len([k for k, v in campos.items() if v])
@@ -186,6 +257,8 @@ def fill_pdf_form(template_path: str, output_path: str, form_data: dict) -> None
     Returns:
         None
     """
+    from PyPDF2 import PdfReader, PdfWriter
+
     logger_service.log_info(f"Preenchendo formulário PDF: {template_path}")
     
     reader = PdfReader(template_path)
@@ -224,7 +297,8 @@ async def upload_pdf_para_supabase(pdf_bytes: bytes, nome_arquivo: str) -> str:
     }
     
     # Fazer o upload
-    async with httpx.AsyncClient() as client:
+    from app.services.rastreamento_http import cliente_http
+    async with cliente_http() as client:
         response = await client.post(
             upload_url,
             content=pdf_bytes,
@@ -265,7 +339,7 @@ async def gerar_pdf_proposta(dados: Dict[str, Any]) -> str:
         
         # Baixar o template
         logger_service.log_info(f"Baixando template: {template_url}")
-        template_bytes = await baixar_template(template_url)
+        template_bytes = await obter_template(template_url)
         
         # Verificar se o template foi baixado com sucesso
         if not template_bytes:
@@ -0,0 +1,156 @@
+"""
+Regras dos planos de pagamento
+
+As regras (desconto à vista, entrada e acréscimo de cada parcelamento) ficam
+em uma tabela JSON (config/planos_pagamento.json). A tabela é compilada em um
+objeto imutável (PlanoPagamento) na inicialização e recarregada
+automaticamente quando o arquivo é alterado.
+"""
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import PLANOS_PAGAMENTO_FILE, PLANOS_PAGAMENTO_VERIFICACAO
+from app.services import logger_service
+
+
+@dataclass(frozen=True)
+class RegraParcelamento:
+    """Regra de uma opção parcelada (direta ou no cartão)"""
+    parcelas: int
+    acrescimo_percentual: int
+    entrada_percentual: int = 0
+    chave: str = ""
+
+
+@dataclass(frozen=True)
+class PlanoPagamento:
+    """
+    Conjunto imutável de regras de pagamento
+
+    Dois planos são iguais quando têm a mesma versão (hash do conteúdo da
+    tabela), o que permite usar o plano como chave de cache.
+    """
+    versao: str
+    desconto_a_vista: int = field(compare=False)
+    parcelado_direto: Tuple[RegraParcelamento, ...] = field(compare=False)
+    cartao: Tuple[RegraParcelamento, ...] = field(compare=False)
+
+
+def compilar_plano(tabela: Dict[str, Any], versao: str) -> PlanoPagamento:
+    """
+    Compila a tabela de regras em um PlanoPagamento
+
+    Args:
+        tabela: Conteúdo da tabela de regras
+        versao: Identificador da versão da tabela
+
+    Returns:
+        Plano de pagamento imutável
+
+    Raises:
+        ValueError: Se a tabela tiver regras inválidas
+    """
+    try:
+        desconto_a_vista = int(tabela["a_vista"]["desconto_percentual"])
+        parcelado_direto = tuple(
+            RegraParcelamento(
+                parcelas=int(regra["parcelas"]),
+                acrescimo_percentual=int(regra.get("acrescimo_percentual", 0)),
+                entrada_percentual=int(regra.get("entrada_percentual", 0)),
+                chave=str(regra["chave"]),
+            )
+            for regra in tabela["parcelado_direto"]
+        )
+        cartao = tuple(
+            RegraParcelamento(
+                parcelas=int(regra["parcelas"]),
+                acrescimo_percentual=int(regra["acrescimo_percentual"]),
+                chave=f"{int(regra['parcelas'])}x",
+            )
+            for regra in tabela["cartao"]
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Tabela de planos de pagamento inválida: {e}")
+
+    for regra in parcelado_direto + cartao:
+        if regra.parcelas < 1 or not 0 <= regra.entrada_percentual < 100:
+            raise ValueError(f"Regra de parcelamento inválida: {regra}")
+        if regra.entrada_percentual and regra.parcelas < 2:
+            raise ValueError(f"Regra com entrada precisa de ao menos 2 parcelas: {regra}")
+    if not 0 <= desconto_a_vista < 100:
+        raise ValueError(f"Desconto à vista inválido: {desconto_a_vista}")
+
+    return PlanoPagamento(
+        versao=versao,
+        desconto_a_vista=desconto_a_vista,
+        parcelado_direto=parcelado_direto,
+        cartao=cartao,
+    )
+
+
+def carregar_plano(caminho: Path = PLANOS_PAGAMENTO_FILE) -> PlanoPagamento:
+    """
+    Lê e compila a tabela de regras do arquivo
+
+    Args:
+        caminho: Caminho do arquivo JSON com a tabela
+
+    Returns:
+        Plano de pagamento compilado
+    """
+    conteudo = Path(caminho).read_bytes()
+    versao = hashlib.sha1(conteudo).hexdigest()[:12]
+    return compilar_plano(json.loads(conteudo), versao)
+
+
+class _RegistroPlano:
+    """Mantém o plano atual e o recarrega quando o arquivo é alterado"""
+
+    def __init__(self, caminho: Path, intervalo: float):
+        self.caminho = Path(caminho)
+        self.intervalo = intervalo
+        self._plano: Optional[PlanoPagamento] = None
+        self._mtime: Optional[int] = None
+        self._proxima_verificacao = 0.0
+        self._lock = threading.Lock()
+
+    def obter(self) -> PlanoPagamento:
+        """Retorna o plano atual, verificando alterações no máximo a cada intervalo"""
+        plano = self._plano
+        if plano is not None and time.monotonic() < self._proxima_verificacao:
+            return plano
+        with self._lock:
+            self._verificar()
+            return self._plano
+
+    def _verificar(self) -> None:
+        self._proxima_verificacao = time.monotonic() + self.intervalo
+        try:
+            mtime = self.caminho.stat().st_mtime_ns
+            if self._plano is not None and mtime == self._mtime:
+                return
+            plano = carregar_plano(self.caminho)
+        except (OSError, ValueError) as e:
+            if self._plano is None:
+                raise
+            # Mantém o plano anterior se a tabela estiver inacessível ou inválida
+            logger_service.log_warning(f"Erro ao recarregar planos de pagamento: {e} - mantendo versão {self._plano.versao}")
+            self._mtime = None if isinstance(e, OSError) else mtime
+            return
+        if self._plano is not None and plano.versao != self._plano.versao:
+            logger_service.log_info(f"Planos de pagamento recarregados: versão {plano.versao}")
+        self._plano = plano
+        self._mtime = mtime
+
+
+_registro = _RegistroPlano(PLANOS_PAGAMENTO_FILE, PLANOS_PAGAMENTO_VERIFICACAO)
+
+
+def obter_plano() -> PlanoPagamento:
+    """Retorna o plano de pagamento vigente"""
+    return _registro.obter()
@@ -0,0 +1,211 @@
+"""
+Profiling sob demanda de requisições
+
+O MiddlewareProfiling executa uma requisição sob um profiler e grava o
+resultado em PROFILING_DIR, com o request_id no nome do arquivo:
+
+- "amostragem" (padrão): uma thread lê a pilha do event loop a cada
+  PROFILING_AMOSTRA_MS e grava as pilhas no formato "folded"
+  (<request_id>.folded), aceito por flamegraph.pl, speedscope e similares;
+- "deterministico": cProfile, gravado como <request_id>.prof (pstats,
+  aceito por snakeviz, flameprof e similares).
+
+O profiling é pedido pelo cabeçalho X-Profile (com o modo) e autorizado por
+X-Profile-Assinatura, o HMAC-SHA256 do X-Request-ID com PROFILING_SEGREDO,
+ou por PROFILING_ADMIN. No máximo um profile por PROFILING_INTERVALO_MINIMO
+segundos é feito, em toda a aplicação. Sem segredo nem flag, o middleware não
+é instalado.
+
+Os profilers observam a thread do event loop inteira: requisições
+concorrentes que executarem durante o profile também aparecem nele.
+"""
+import asyncio
+import cProfile
+import hashlib
+import hmac
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional
+
+from starlette.datastructures import MutableHeaders
+
+from app.config import (
+    PROFILING_ADMIN,
+    PROFILING_AMOSTRA_MS,
+    PROFILING_DIR,
+    PROFILING_INTERVALO_MINIMO,
+    PROFILING_SEGREDO,
+)
+from app.services import logger_service
+from app.services.contexto_requisicao import contexto_atual
+
+CABECALHO_PROFILE = "X-Profile"
+CABECALHO_ASSINATURA = "X-Profile-Assinatura"
+
+MODO_PADRAO = "amostragem"
+
+
+def assinar(request_id: str, segredo: str = PROFILING_SEGREDO) -> str:
+    """Assinatura que autoriza o profiling da requisição com este request_id"""
+    return hmac.new(segredo.encode(), request_id.encode(), hashlib.sha256).hexdigest()
+
+
+def habilitado() -> bool:
+    """Se o middleware deve ser instalado"""
+    return bool(PROFILING_SEGREDO) or PROFILING_ADMIN
+
+
+class AmostradorPilhas:
+    """Profiler por amostragem: lê periodicamente a pilha de uma thread"""
+    extensao = "folded"
+
+    def __init__(self, intervalo_ms: float = PROFILING_AMOSTRA_MS):
+        self.intervalo = intervalo_ms / 1000
+        self.contagens: Counter = Counter()
+        self._thread_alvo = threading.get_ident()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._amostrar, name="profiling-amostras", daemon=True)
+
+    def iniciar(self) -> None:
+        self._thread.start()
+
+    def parar(self) -> None:
+        self._parar.set()
+        self._thread.join()
+
+    def _amostrar(self) -> None:
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self._thread_alvo)
+            pilha = []
+            while frame is not None:
+                codigo = frame.f_code
+                pilha.append(f"{codigo.co_qualname} ({Path(codigo.co_filename).name}:{codigo.co_firstlineno})")
+                frame = frame.f_back
+            if pilha:
+                self.contagens[";".join(reversed(pilha))] += 1
+
+    def gravar(self, caminho: Path) -> None:
+        """Uma linha por pilha: "raiz;...;folha quantidade" """
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            for pilha, quantidade in self.contagens.most_common():
+                arquivo.write(f"{pilha} {quantidade}\n")
+
+
+class ProfilerDeterministico:
+    """Profiler determinístico (cProfile) da thread do event loop"""
+    extensao = "prof"
+
+    def __init__(self):
+        self.perfil = cProfile.Profile()
+
+    def iniciar(self) -> None:
+        self.perfil.enable()
+
+    def parar(self) -> None:
+        self.perfil.disable()
+
+    def gravar(self, caminho: Path) -> None:
+        self.perfil.dump_stats(str(caminho))
+
+
+PROFILERS = {"amostragem": AmostradorPilhas, "deterministico": ProfilerDeterministico}
+
+
+class MiddlewareProfiling:
+    """
+    Middleware ASGI que perfila as requisições autorizadas
+
+    Deve ficar dentro do MiddlewareContexto (o request_id nomeia o arquivo).
+    A resposta informa o arquivo gravado no cabeçalho X-Profile, ou
+    "limitado" quando outro profile foi feito há pouco.
+    """
+
+    def __init__(
+        self,
+        app,
+        segredo: str = PROFILING_SEGREDO,
+        admin: bool = PROFILING_ADMIN,
+        diretorio: Path = PROFILING_DIR,
+        intervalo_minimo: float = PROFILING_INTERVALO_MINIMO,
+    ):
+        self.app = app
+        self.segredo = segredo
+        self.admin = admin
+        self.diretorio = Path(diretorio)
+        self.intervalo_minimo = intervalo_minimo
+        self._ultimo: Optional[float] = None
+        self._em_andamento = False
+
+    def _modo_autorizado(self, cabecalhos: Dict[bytes, bytes], request_id: str) -> Optional[str]:
+        """Modo de profiling pedido e autorizado, ou None"""
+        pedido = cabecalhos.get(b"x-profile")
+        if pedido is None and not self.admin:
+            return None
+        modo = (pedido or b"").decode("latin-1").strip().lower() or MODO_PADRAO
+        if modo not in PROFILERS:
+            modo = MODO_PADRAO
+        if self.admin:
+            return modo
+        assinatura = cabecalhos.get(b"x-profile-assinatura", b"").decode("latin-1")
+        if self.segredo and hmac.compare_digest(assinatura, assinar(request_id, self.segredo)):
+            return modo
+        return None
+
+    def _reservar(self) -> bool:
+        """Limite global: um profile por vez e no máximo um por intervalo"""
+        agora = time.monotonic()
+        if self._em_andamento or (self._ultimo is not None and agora - self._ultimo < self.intervalo_minimo):
+            return False
+        self._em_andamento, self._ultimo = True, agora
+        return True
+
+    async def __call__(self, scope, receive, send):
+        contexto = contexto_atual()
+        if scope["type"] != "http" or contexto is None:
+            await self.app(scope, receive, send)
+            return
+        modo = self._modo_autorizado(dict(scope["headers"]), contexto.request_id)
+        if modo is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not self._reservar():
+            await self.app(scope, receive, _com_cabecalho(send, "limitado"))
+            return
+
+        try:
+            profiler = PROFILERS[modo]()
+            caminho = self.diretorio / f"{contexto.request_id}.{profiler.extensao}"
+            try:
+                profiler.iniciar()
+            except ValueError as e:  # outro profiler já ativo na thread
+                logger_service.log_warning(f"Profiling indisponível: {e}")
+                await self.app(scope, receive, send)
+                return
+            inicio = time.perf_counter()
+            try:
+                await self.app(scope, receive, _com_cabecalho(send, caminho.name))
+            finally:
+                profiler.parar()
+                duracao = (time.perf_counter() - inicio) * 1000
+                await asyncio.to_thread(_gravar, profiler, caminho)
+                logger_service.log_info(f"Profile ({modo}) da requisição gravado em {caminho} ({duracao:.1f} ms)")
+        finally:
+            self._em_andamento = False
+
+
+def _gravar(profiler, caminho: Path) -> None:
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    profiler.gravar(caminho)
+
+
+def _com_cabecalho(send, valor: str):
+    """Envia a resposta com o cabeçalho X-Profile"""
+    async def enviar(mensagem):
+        if mensagem["type"] == "http.response.start":
+            MutableHeaders(scope=mensagem)[CABECALHO_PROFILE] = valor
+        await send(mensagem)
+    return enviar
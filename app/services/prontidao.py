@@ -0,0 +1,80 @@
+"""
+Prontidão da instância para receber tráfego (/ready)
+
+/health só indica que o processo responde. /ready indica se o balanceador
+deve enviar requisições a esta instância e, se não, por quê:
+
+- regras de pagamento compiladas;
+- templates de PDF no cache (quando o cache está ativo);
+- event loop sem atraso acima de LOOP_BLOQUEIO_LIMITE na última medição;
+- filas de log e de spans abaixo de LIMITE_FILA da capacidade;
+- fila do controle de admissão com vaga (novas propostas não seriam recusadas);
+- encerramento não iniciado.
+
+A resposta também informa, sem afetar a prontidão, as propostas e
+requisições em andamento e as chamadas externas aguardando resposta. Cada
+chamada externa abre a própria conexão (não há pool compartilhado) e não há
+circuit breakers: as chamadas em andamento são o estado correspondente.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import TEMPLATE_CACHE_SEGUNDOS
+from app.services import admissao, encerramento, logger_service, metricas, pdf_service, planos_pagamento, rastreamento
+
+# Fração da capacidade a partir da qual uma fila é considerada cheia
+LIMITE_FILA = 0.9
+
+
+def verificar(monitor=None) -> Tuple[bool, Dict[str, Any]]:
+    """
+    Verifica a prontidão da instância
+
+    Args:
+        monitor: MonitorLoop em execução (None se o monitor estiver desativado)
+
+    Returns:
+        (pronta, estado detalhado com os motivos de não estar pronta)
+    """
+    motivos: List[str] = []
+
+    try:
+        versao_plano: Optional[str] = planos_pagamento.obter_plano().versao
+    except Exception as e:
+        versao_plano = None
+        motivos.append(f"planos de pagamento indisponíveis ({type(e).__name__})")
+
+    templates = pdf_service.estado_templates()
+    if TEMPLATE_CACHE_SEGUNDOS > 0:
+        motivos.extend(f"template {tipo} não carregado" for tipo, estado in templates.items()
+                       if not estado["carregado"])
+
+    filas = {"log": logger_service.estado_log(), "spans": rastreamento.estado_exportador()}
+    motivos.extend(f"fila de {nome} cheia" for nome, fila in filas.items()
+                   if fila is not None and fila["pendentes"] >= LIMITE_FILA * fila["capacidade"])
+
+    loop = None
+    if monitor is not None:
+        loop = {"atraso_ms": round(monitor.ultimo_atraso * 1000, 1), "bloqueios": len(monitor.bloqueios)}
+        if monitor.ultimo_atraso >= monitor.limite:
+            motivos.append("event loop saturado")
+
+    if admissao.fila_cheia():
+        motivos.append("fila de propostas cheia")
+    if encerramento.encerrando():
+        motivos.append("encerrando")
+
+    estado = {
+        "status": "not_ready" if motivos else "ready",
+        "motivos": motivos,
+        "planos_pagamento": {"versao": versao_plano},
+        "templates": templates,
+        "em_andamento": {
+            "requisicoes": metricas.REQUISICOES_EM_ANDAMENTO.valor(),
+            "propostas": metricas.PROPOSTAS_EM_ANDAMENTO.valor(),
+            "chamadas_externas": metricas.CHAMADAS_EXTERNAS_EM_ANDAMENTO.valor(),
+        },
+        "filas": filas,
+        "admissao": admissao.estado(),
+        "loop": loop,
+    }
+    return not motivos, estado
@@ -0,0 +1,285 @@
+"""
+Rastreamento (tracing) local, no estilo OpenTelemetry
+
+Cada requisição HTTP amostrada gera uma árvore de spans:
+
+- o span raiz, aberto pelo MiddlewareRastreamento ("POST /api/...");
+- um span por etapa medida com logger_service.etapa() (validar, calcular,
+  template, preencher_pdf, upload, whatsapp);
+- um span por chamada externa feita com o TransporteRastreado
+  (rastreamento_http), com status, bytes enviados e recebidos; o span
+  termina quando o corpo da resposta termina de ser lido.
+
+A amostragem é decidida no span raiz (TRACING_AMOSTRAGEM): em requisições
+não amostradas os spans filhos não são criados. Os spans concluídos vão para
+uma fila e são gravados por uma thread, um JSON por linha, em
+TRACING_ARQUIVO, e opcionalmente enviados em lote a TRACING_COLETOR_URL. Os
+nomes dos campos seguem o OTLP (traceId, spanId, parentSpanId, ...).
+
+Spans com erro guardam apenas o tipo da exceção (mensagens de validação
+contêm os dados do cliente); o detalhe fica no log, pelo request_id.
+"""
+import atexit
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+from app.config import TRACING_AMOSTRAGEM, TRACING_ARQUIVO, TRACING_COLETOR_URL
+from app.services.contexto_requisicao import contexto_atual
+
+# Quantidade máxima de spans aguardando exportação; o excedente é descartado
+TAMANHO_FILA_SPANS = 10000
+# Spans gravados/enviados de uma só vez
+TAMANHO_LOTE_SPANS = 512
+
+
+@dataclass(slots=True)
+class Span:
+    """Operação rastreada, com início e fim em nanossegundos desde a época"""
+    nome: str
+    trace_id: str
+    span_id: str
+    pai_id: Optional[str]
+    tipo: str = "internal"
+    inicio_ns: int = field(default_factory=time.time_ns)
+    fim_ns: Optional[int] = None
+    atributos: Dict[str, Any] = field(default_factory=dict)
+    erro: Optional[str] = None
+
+    def definir(self, chave: str, valor: Any) -> None:
+        self.atributos[chave] = valor
+
+    def encerrar(self) -> None:
+        """Encerra o span (uma única vez) e o envia para exportação"""
+        if self.fim_ns is None:
+            self.fim_ns = time.time_ns()
+            _exportador.exportar(self)
+
+    @property
+    def traceparent(self) -> str:
+        """Cabeçalho W3C traceparent para propagar o trace nas chamadas externas"""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def para_dict(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.pai_id,
+            "name": self.nome,
+            "kind": self.tipo,
+            "startTimeUnixNano": self.inicio_ns,
+            "endTimeUnixNano": self.fim_ns,
+            "durationMs": round((self.fim_ns - self.inicio_ns) / 1e6, 3),
+            "status": "ERROR" if self.erro else "OK",
+            "error": self.erro,
+            "attributes": self.atributos,
+        }
+
+
+class _SpanVazio:
+    """Span de requisições não amostradas: não registra nada"""
+    __slots__ = ()
+
+    def definir(self, chave: str, valor: Any) -> None:
+        pass
+
+
+NAO_AMOSTRADO = _SpanVazio()
+
+_span_atual: ContextVar[Any] = ContextVar("span_atual", default=None)
+
+
+def span_atual():
+    """Span em andamento (None fora de um trace, NAO_AMOSTRADO se não amostrado)"""
+    return _span_atual.get()
+
+
+def _novo_id(tamanho: int) -> str:
+    return os.urandom(tamanho).hex()
+
+
+def iniciar_span(nome: str, tipo: str, atributos: Dict[str, Any]):
+    """Novo span filho do atual; sem span atual, sorteia a amostragem de um novo trace"""
+    pai = _span_atual.get()
+    if pai is NAO_AMOSTRADO:
+        return NAO_AMOSTRADO
+    if pai is None:
+        if random.random() >= TRACING_AMOSTRAGEM:
+            return NAO_AMOSTRADO
+        return Span(nome, _novo_id(16), _novo_id(8), None, tipo, atributos=atributos)
+    return Span(nome, pai.trace_id, _novo_id(8), pai.span_id, tipo, atributos=atributos)
+
+
+@contextmanager
+def span(nome: str, tipo: str = "internal", **atributos):
+    """Abre um span em torno do bloco; exceções marcam o span com erro"""
+    if _span_atual.get() is NAO_AMOSTRADO:
+        yield NAO_AMOSTRADO
+        return
+    novo = iniciar_span(nome, tipo, atributos)
+    token = _span_atual.set(novo)
+    try:
+        yield novo
+    except BaseException as e:
+        if novo is not NAO_AMOSTRADO:
+            novo.erro = type(e).__name__
+        raise
+    finally:
+        _span_atual.reset(token)
+        if novo is not NAO_AMOSTRADO:
+            novo.encerrar()
+
+
+# ---------------------------------------------------------------------------
+# Span raiz de cada requisição HTTP
+# ---------------------------------------------------------------------------
+
+class MiddlewareRastreamento:
+    """
+    Middleware ASGI que abre o span raiz de cada requisição
+
+    Deve ficar dentro do MiddlewareContexto: request_id e proposta_id viram
+    atributos do span.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or TRACING_AMOSTRAGEM <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        with span(f"{scope['method']} {scope['path']}", "server",
+                  **{"http.method": scope["method"], "http.target": scope["path"]}) as raiz:
+            if raiz is NAO_AMOSTRADO:
+                await self.app(scope, receive, send)
+                return
+
+            async def enviar(mensagem):
+                if mensagem["type"] == "http.response.start":
+                    raiz.definir("http.status_code", mensagem["status"])
+                await send(mensagem)
+
+            try:
+                await self.app(scope, receive, enviar)
+            finally:
+                contexto = contexto_atual()
+                if contexto is not None:
+                    raiz.definir("request_id", contexto.request_id)
+                    if contexto.proposta_id:
+                        raiz.definir("proposta_id", contexto.proposta_id)
+
+
+# ---------------------------------------------------------------------------
+# Exportação
+# ---------------------------------------------------------------------------
+
+class ExportadorSpans:
+    """
+    Fila de spans concluídos, gravada por uma thread
+
+    A thread só é iniciada no primeiro span; com a fila cheia, spans são
+    descartados (e contados) em vez de atrasar a requisição.
+    """
+
+    def __init__(self, arquivo: Optional[Path] = TRACING_ARQUIVO, coletor_url: str = TRACING_COLETOR_URL):
+        self.arquivo = Path(arquivo) if arquivo else None
+        self.coletor_url = coletor_url
+        self.descartados = 0
+        self._fila: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=TAMANHO_FILA_SPANS)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def exportar(self, span_concluido: Span) -> None:
+        if self._thread is None:
+            self._iniciar()
+        try:
+            self._fila.put_nowait(span_concluido)
+        except queue.Full:
+            self.descartados += 1
+
+    def _iniciar(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._escrever, name="exportador-spans", daemon=True)
+                self._thread.start()
+
+    def _escrever(self) -> None:
+        cliente = None
+        if self.coletor_url:
+            import httpx
+            cliente = httpx.Client(timeout=5)
+        continuar = True
+        while continuar:
+            lote: List[Span] = [self._fila.get()]
+            while len(lote) < TAMANHO_LOTE_SPANS:
+                try:
+                    lote.append(self._fila.get_nowait())
+                except queue.Empty:
+                    break
+            if lote[-1] is None or None in lote:
+                continuar = False
+            spans = [s.para_dict() for s in lote if s is not None]
+            try:
+                self._gravar(spans, cliente)
+            except Exception as e:  # exportação nunca derruba a aplicação
+                print(f"Falha ao exportar {len(spans)} spans: {e}", file=sys.stderr)
+            for _ in lote:
+                self._fila.task_done()
+        if cliente is not None:
+            cliente.close()
+
+    def _gravar(self, spans: List[Dict[str, Any]], cliente) -> None:
+        if not spans:
+            return
+        if self.arquivo is not None:
+            self.arquivo.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.arquivo, "ab") as arquivo:
+                arquivo.write(b"".join(orjson.dumps(s, default=str) + b"\n" for s in spans))
+        if cliente is not None:
+            cliente.post(self.coletor_url, content=orjson.dumps({"spans": spans}, default=str),
+                         headers={"Content-Type": "application/json"})
+
+    def estado(self) -> Dict[str, int]:
+        """Spans aguardando exportação, capacidade e descartes"""
+        return {"pendentes": self._fila.qsize(), "capacidade": self._fila.maxsize, "descartados": self.descartados}
+
+    def aguardar(self) -> None:
+        """Aguarda a gravação dos spans já enfileirados"""
+        if self._thread is not None:
+            self._fila.join()
+
+    def encerrar(self, timeout: float = 5) -> None:
+        """Grava os spans pendentes e encerra a thread"""
+        if self._thread is None:
+            return
+        self._fila.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+
+_exportador = ExportadorSpans()
+
+
+def estado_exportador() -> Dict[str, int]:
+    """Estado da fila de spans aguardando exportação"""
+    return _exportador.estado()
+
+
+def encerrar(timeout: float = 5) -> None:
+    """Grava os spans pendentes (chamado no encerramento da aplicação)"""
+    _exportador.encerrar(timeout)
+
+
+atexit.register(encerrar)
@@ -0,0 +1,87 @@
+"""
+Chamadas externas rastreadas (httpx)
+
+Separado de rastreamento para que o httpx só seja importado por quem faz
+chamadas externas, e não por todo módulo que registra logs ou spans.
+"""
+from typing import Optional
+
+import httpx
+
+from app.services import metricas
+from app.services.contexto_requisicao import HOOKS_HTTP
+from app.services.rastreamento import NAO_AMOSTRADO, Span, iniciar_span
+
+
+class _CorpoRastreado(httpx.AsyncByteStream):
+    """Corpo da resposta que conta os bytes lidos e encerra o span ao fechar"""
+
+    def __init__(self, corpo, span_http: Span):
+        self._corpo = corpo
+        self._span = span_http
+        self._bytes = 0
+
+    async def __aiter__(self):
+        async for parte in self._corpo:
+            self._bytes += len(parte)
+            yield parte
+
+    async def aclose(self) -> None:
+        try:
+            await self._corpo.aclose()
+        finally:
+            self._span.definir("http.bytes_recebidos", self._bytes)
+            self._span.encerrar()
+
+
+class TransporteRastreado(httpx.AsyncBaseTransport):
+    """
+    Transporte httpx que abre um span por chamada externa
+
+    Registra método, host, status, bytes enviados e recebidos e propaga o
+    trace no cabeçalho traceparent. O caminho da URL não é registrado (a
+    URL da Z-API contém o token). Também mantém o medidor de chamadas
+    externas aguardando resposta.
+    """
+
+    def __init__(self, transporte: Optional[httpx.AsyncBaseTransport] = None):
+        self._transporte = transporte or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        with metricas.CHAMADAS_EXTERNAS_EM_ANDAMENTO.em_andamento():
+            return await self._rastrear(request)
+
+    async def _rastrear(self, request: httpx.Request) -> httpx.Response:
+        novo = iniciar_span(f"HTTP {request.method} {request.url.host}", "client", {
+            "http.method": request.method,
+            "http.host": request.url.host,
+            "http.bytes_enviados": int(request.headers.get("content-length", 0)),
+        })
+        if novo is NAO_AMOSTRADO:
+            return await self._transporte.handle_async_request(request)
+
+        request.headers["traceparent"] = novo.traceparent
+        try:
+            resposta = await self._transporte.handle_async_request(request)
+        except BaseException as e:
+            novo.erro = type(e).__name__
+            novo.encerrar()
+            raise
+        novo.definir("http.status_code", resposta.status_code)
+        if resposta.status_code >= 400:
+            novo.erro = f"HTTP {resposta.status_code}"
+        if resposta.is_closed:
+            # Corpo já lido pelo transporte (ex.: httpx.MockTransport)
+            novo.definir("http.bytes_recebidos", len(resposta.content))
+            novo.encerrar()
+        else:
+            resposta.stream = _CorpoRastreado(resposta.stream, novo)
+        return resposta
+
+    async def aclose(self) -> None:
+        await self._transporte.aclose()
+
+
+def cliente_http(**opcoes) -> httpx.AsyncClient:
+    """Cliente httpx com os ids da requisição nos cabeçalhos e um span por chamada"""
+    return httpx.AsyncClient(event_hooks=HOOKS_HTTP, transport=TransporteRastreado(), **opcoes)
@@ -3,7 +3,6 @@ Serviço para envio de mensagens e arquivos via WhatsApp usando Z-API
 """
 import json
 from typing import Dict, Any, Optional
-import httpx
 from app.services import logger_service
 
 # Credenciais da Z-API
@@ -65,8 +64,9 @@ async def enviar_mensagem_whatsapp(telefone: str, mensagem: str) -> Dict[str, An
         "message": mensagem
     }
     
-    # Enviar a requisição
-    async with httpx.AsyncClient() as client:
+    # Enviar a requisição (o httpx só é importado no primeiro envio)
+    from app.services.rastreamento_http import cliente_http
+    async with cliente_http() as client:
         try:
             response = await client.post(
                 url, 
@@ -120,8 +120,9 @@ async def enviar_pdf_whatsapp(telefone: str, url_pdf: str, mensagem: str) -> Dic
         "fileName": "Proposta_ForceCarBlindagens.pdf"
     }
     
-    # Enviar a requisição
-    async with httpx.AsyncClient() as client:
+    # Enviar a requisição (o httpx só é importado no primeiro envio)
+    from app.services.rastreamento_http import cliente_http
+    async with cliente_http() as client:
         try:
             response = await client.post(
                 url, 
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Benchmark do cálculo vetorizado de condições de pagamento
+
+Compara o cálculo escalar (calcular_condicoes_pagamento chamado uma vez por
+valor base) com o cálculo vetorizado para 1, 100 e 100 mil valores.
+
+Uso:
+    python -m benchmarks.bench_calculos_vetorizado
+"""
+import random
+import timeit
+
+from app.services import calculos
+
+TAMANHOS = [1, 100, 100_000]
+
+
+def escalar(valores):
+    """Calcula as condições de pagamento valor a valor"""
+    return [calculos.calcular_condicoes_pagamento({"valor_base": v}) for v in valores]
+
+
+def vetorizado(valores):
+    """Calcula as condições de pagamento de uma só vez"""
+    return calculos.calcular_condicoes_pagamento_vetorizado(valores)
+
+
+def medir(funcao, valores) -> float:
+    """Retorna o melhor tempo (em segundos) de algumas execuções"""
+    repeticoes = max(1, 1000 // len(valores))
+    tempos = timeit.repeat(lambda: funcao(valores), number=repeticoes, repeat=5)
+    return min(tempos) / repeticoes
+
+
+def main():
+    """Função principal"""
+    rng = random.Random(42)
+    print(f"{'valores':>10} | {'escalar (ms)':>14} | {'vetorizado (ms)':>16} | {'ganho':>8}")
+    print("-" * 58)
+    for tamanho in TAMANHOS:
+        valores = [round(rng.uniform(1, 500000), 2) for _ in range(tamanho)]
+        t_escalar = medir(escalar, valores)
+        t_vetorizado = medir(vetorizado, valores)
+        ganho = t_escalar / t_vetorizado
+        print(f"{tamanho:>10} | {t_escalar * 1000:>14.4f} | {t_vetorizado * 1000:>16.4f} | {ganho:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
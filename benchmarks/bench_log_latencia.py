@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark da latência da rota de proposta com e sem logging
+
+Executa POST /gerar_proposta_rodrigo com os serviços externos (template,
+upload e WhatsApp) substituídos por funções locais e compara:
+
+- desativado: logger desabilitado;
+- sincrono: console e arquivo gravados por quem registra (comportamento
+  anterior);
+- fila: registros enfileirados e gravados pela thread de escrita.
+
+Console e arquivo são redirecionados para um diretório temporário. Os modos
+"lento" repetem a medição com um console que leva 1 ms por escrita (como um
+pipe para um coletor de logs congestionado).
+
+Uso:
+    python -m benchmarks.bench_log_latencia
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from app.services import logger_service
+from main import app
+
+REQUISICOES = 300
+
+PAYLOAD = {
+    "nome_cliente": "João Silva",
+    "telefone_cliente": "(11) 99999-9999",
+    "email_cliente": "joao@exemplo.com",
+    "marca_veiculo": "Toyota",
+    "modelo_veiculo": "Corolla",
+    "tipo_documentacao": "CNH",
+    "desconto_aplicado": 1000,
+    "tipo_blindagem": "Nenhuma",
+    "comfort10YearsSubTotal": 45000,
+    "comfort18mmSubTotal": 52000,
+    "ultralightSubTotal": 61000,
+}
+
+
+async def _selecionar_template(desconto):
+    return "http://template", "com_desconto"
+
+
+async def _baixar_template(url):
+    return b"%PDF-1.4 template"
+
+
+async def _upload_pdf(pdf_bytes, nome_arquivo):
+    return f"http://pdf/{nome_arquivo}"
+
+
+async def _enviar_whatsapp(telefone, url_pdf, mensagem):
+    return {"status": "success"}
+
+
+def _preencher_pdf(template_path, output_path, form_data):
+    with open(output_path, "wb") as f:
+        f.write(b"%PDF-1.4")
+
+
+class ConsoleLento:
+    """Arquivo de console em que cada escrita leva ATRASO_CONSOLE segundos"""
+
+    ATRASO_CONSOLE = 0.001
+
+    def __init__(self, arquivo):
+        self.arquivo = arquivo
+
+    def write(self, texto):
+        time.sleep(self.ATRASO_CONSOLE)
+        return self.arquivo.write(texto)
+
+    def flush(self):
+        self.arquivo.flush()
+
+
+def medir(client) -> list:
+    """Latência (em milissegundos) de cada requisição"""
+    latencias = []
+    for _ in range(REQUISICOES):
+        inicio = time.perf_counter()
+        client.post("/api/gerar_proposta_rodrigo", json=PAYLOAD)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    return latencias
+
+
+def main():
+    """Função principal"""
+    patches = [
+        mock.patch("app.services.pdf_service.selecionar_template", _selecionar_template),
+        mock.patch("app.services.pdf_service.baixar_template", _baixar_template),
+        mock.patch("app.services.pdf_service.upload_pdf_para_supabase", _upload_pdf),
+        mock.patch("app.services.pdf_service.fill_pdf_form", _preencher_pdf),
+        mock.patch("app.services.whatsapp_service.enviar_pdf_whatsapp", _enviar_whatsapp),
+    ]
+    for patch in patches:
+        patch.start()
+
+    stderr_original = sys.stderr
+    with tempfile.TemporaryDirectory() as diretorio:
+        console = open(os.path.join(diretorio, "console.log"), "w")
+        logger_service.LOG_FILE = os.path.join(diretorio, "app.log")
+        sys.stderr = console
+        client = TestClient(app)
+        resultados = {}
+        try:
+            for modo in ("desativado", "sincrono", "fila", "sincrono lento", "fila lento"):
+                sys.stderr = ConsoleLento(console) if modo.endswith("lento") else console
+                logger_service.configurar_log(assincrono=modo.startswith("fila"))
+                if modo == "desativado":
+                    logger_service.logger.disable("")
+                medir(client)  # aquecimento
+                resultados[modo] = medir(client)
+                logger_service.logger.enable("")
+                logger_service.aguardar_log()
+        finally:
+            logger_service.encerrar_log()
+            sys.stderr = stderr_original
+            console.close()
+
+    print(f"{'modo':>15} | {'mediana (ms)':>12} | {'p95 (ms)':>9}")
+    print("-" * 43)
+    for modo, latencias in resultados.items():
+        p95 = statistics.quantiles(latencias, n=20)[-1]
+        print(f"{modo:>15} | {statistics.median(latencias):>12.3f} | {p95:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark de memória e alocações das condições de pagamento
+
+Compara, para uma proposta do tipo "Nenhuma" (três cenários), a matriz de
+cenários com objetos imutáveis (QuadroPagamento, com __slots__) contra a
+mesma matriz convertida em dicionários, formato usado antes na rota inteira
+e agora apenas na resposta.
+
+Uso:
+    python -m benchmarks.bench_memoria_condicoes
+"""
+import gc
+import timeit
+import tracemalloc
+
+from app.services import calculos
+
+REQUISICOES = 1000
+
+SUBTOTAIS = {
+    "tipo_blindagem": "Nenhuma",
+    "comfort10_anos": {"subtotal": 45000.0, "valor_final": 44000.0},
+    "comfort18mm": {"subtotal": 52000.0, "valor_final": 51000.0},
+    "ultralight": {"subtotal": 61000.0, "valor_final": 60000.0},
+}
+
+
+def matriz_objetos():
+    """Matriz de cenários como objetos imutáveis"""
+    return calculos.calcular_matriz_cenarios(SUBTOTAIS)
+
+
+def matriz_dicionarios():
+    """Matriz de cenários convertida em dicionários"""
+    return {
+        rotulo: cenario.condicoes.para_dict()
+        for rotulo, cenario in calculos.calcular_matriz_cenarios(SUBTOTAIS).items()
+    }
+
+
+def medir_memoria(funcao):
+    """Retorna (bytes retidos, blocos alocados) por requisição"""
+    gc.collect()
+    funcao()  # aquece o cache de condições
+    tracemalloc.start()
+    inicio = tracemalloc.take_snapshot()
+    resultados = [funcao() for _ in range(REQUISICOES)]
+    fim = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    estatisticas = fim.compare_to(inicio, "filename")
+    retidos = sum(s.size_diff for s in estatisticas)
+    blocos = sum(s.count_diff for s in estatisticas)
+    del resultados
+    return retidos / REQUISICOES, blocos / REQUISICOES
+
+
+def medir_tempo(funcao) -> float:
+    """Retorna o melhor tempo (em microssegundos) por requisição"""
+    tempos = timeit.repeat(funcao, number=REQUISICOES, repeat=5)
+    return min(tempos) / REQUISICOES * 1e6
+
+
+def main():
+    """Função principal"""
+    print(f"{'formato':>12} | {'bytes/req':>10} | {'blocos/req':>10} | {'tempo (µs)':>10}")
+    print("-" * 52)
+    for nome, funcao in (("objetos", matriz_objetos), ("dicionarios", matriz_dicionarios)):
+        retidos, blocos = medir_memoria(funcao)
+        print(f"{nome:>12} | {retidos:>10.0f} | {blocos:>10.1f} | {medir_tempo(funcao):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks das etapas da proposta, com resultados em JSON
+
+Mede, isoladamente e sem logging:
+
+- calcular_subtotais_blindagem (proposta validada do tipo "Nenhuma");
+- calcular_condicoes_pagamento, com o cache de condições (mesmo valor base)
+  e sem ele (cálculo completo do quadro);
+- mapear_dados_para_formulario (três cenários com desconto);
+- fill_pdf_form com o template sintético (benchmarks/template_sintetico.py:
+  todos os campos dos mapas do formulário, 12 páginas e 4 MB) e todos os
+  campos com desconto preenchidos.
+
+Cada medição repete a função em rodadas de pelo menos TEMPO_RODADA segundos
+e registra mínimo, mediana, média, p95 e desvio por chamada. O resultado é
+gravado em benchmarks/resultados/micro-<commit>.json (ou em --saida) e pode
+ser comparado com o de outra versão:
+
+    python -m benchmarks.bench_micro
+    python -m benchmarks.bench_micro --comparar benchmarks/resultados/micro-abc1234.json
+
+A comparação usa o menor tempo por chamada, menos sujeito a interferências
+da máquina que a mediana. Pioras acima de --limite (padrão 10%) são
+marcadas como regressão e o código de saída é 1.
+"""
+import argparse
+import asyncio
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+from unittest import mock
+
+import orjson
+
+from app.routes.proposta import FORM_MAPS
+from app.schemas.proposta_schema import PROPOSTA_ADAPTER
+from app.services import calculos, pdf_service, planos_pagamento
+from benchmarks.template_sintetico import PAGINAS, gerar_template, nomes_campos
+
+VERSAO_RESULTADOS = 1
+RAIZ = Path(__file__).resolve().parent.parent
+DIRETORIO_RESULTADOS = RAIZ / "benchmarks" / "resultados"
+# Duração mínima (em segundos) de cada rodada e quantidade de rodadas
+TEMPO_RODADA = 0.2
+RODADAS = 15
+LIMITE_REGRESSAO = 0.10
+
+PROPOSTA = {
+    "nome_cliente": "João Silva",
+    "telefone_cliente": "(11) 99999-9999",
+    "email_cliente": "joao@exemplo.com",
+    "marca_veiculo": "Toyota",
+    "modelo_veiculo": "Corolla",
+    "teto_solar": "PANORAMICO XL",
+    "abertura_porta_malas": "manual",
+    "tipo_documentacao": "CNH",
+    "desconto_aplicado": 1000,
+    "vidro_10_anos": "ARGUS",
+    "vidro_5_anos": "",
+    "pacote_revisao": "5 ANOS",
+    "tipo_blindagem": "Nenhuma",
+    "comfort10YearsSubTotal": 45000,
+    "comfort18mmSubTotal": 52000,
+    "ultralightSubTotal": 61000,
+}
+
+
+def _commit() -> Optional[str]:
+    try:
+        resultado = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                                   capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return resultado.stdout.strip()
+
+
+def medir(funcao: Callable[[], Any], rodadas: int = RODADAS) -> Dict[str, float]:
+    """Tempo por chamada (em microssegundos) de `rodadas` rodadas calibradas"""
+    funcao()  # aquecimento
+    chamadas = 1
+    while True:
+        inicio = time.perf_counter()
+        for _ in range(chamadas):
+            funcao()
+        if time.perf_counter() - inicio >= TEMPO_RODADA:
+            break
+        chamadas *= 2
+
+    tempos = []
+    for _ in range(rodadas):
+        inicio = time.perf_counter()
+        for _ in range(chamadas):
+            funcao()
+        tempos.append((time.perf_counter() - inicio) / chamadas * 1e6)
+    tempos.sort()
+    return {
+        "chamadas_por_rodada": chamadas,
+        "rodadas": rodadas,
+        "min_us": round(tempos[0], 3),
+        "mediana_us": round(statistics.median(tempos), 3),
+        "media_us": round(statistics.fmean(tempos), 3),
+        "p95_us": round(tempos[min(len(tempos) - 1, int(len(tempos) * 0.95))], 3),
+        "desvio_us": round(statistics.stdev(tempos), 3) if len(tempos) > 1 else 0.0,
+    }
+
+
+def _dados_formulario(matriz) -> Dict[str, Any]:
+    """Dados no formato de mapear_dados_para_formulario"""
+    return dict(PROPOSTA, cenarios={
+        rotulo: {"subtotal": cenario.subtotal / 100, "condicoes_pagamento": cenario.condicoes.para_dict()}
+        for rotulo, cenario in matriz.items()
+    })
+
+
+def executar(rodadas: int = RODADAS) -> Dict[str, Any]:
+    """Executa todos os microbenchmarks e retorna o documento de resultados"""
+    proposta = PROPOSTA_ADAPTER.validate_python(PROPOSTA)
+    subtotais = calculos.calcular_subtotais_blindagem(proposta)
+    matriz = calculos.calcular_matriz_cenarios(subtotais)
+    dados = _dados_formulario(matriz)
+    plano = planos_pagamento.obter_plano()
+    sem_cache = calculos._condicoes_em_centavos.__wrapped__
+    form_data = {campo: "R$ 12.345,67" for campo in FORM_MAPS[True].values()}
+    loop = asyncio.new_event_loop()
+
+    with tempfile.TemporaryDirectory() as diretorio, mock.patch("app.services.logger_service.logger"):
+        template = gerar_template(Path(diretorio) / "template.pdf")
+        saida = str(Path(diretorio) / "preenchido.pdf")
+        medicoes = {
+            "calcular_subtotais_blindagem": lambda: calculos.calcular_subtotais_blindagem(proposta),
+            "calcular_condicoes_pagamento": lambda: calculos.calcular_condicoes_pagamento({"valor_base": 44000}),
+            "calcular_condicoes_pagamento_sem_cache": lambda: sem_cache(plano, 4400000),
+            "mapear_dados_para_formulario": lambda: loop.run_until_complete(
+                pdf_service.mapear_dados_para_formulario(dados)),
+            "fill_pdf_form": lambda: pdf_service.fill_pdf_form(str(template), saida, form_data),
+        }
+        resultados = {}
+        for nome, funcao in medicoes.items():
+            resultados[nome] = medir(funcao, rodadas)
+            print(f"{nome:<42} {resultados[nome]['mediana_us']:>12.1f} µs", file=sys.stderr)
+        tamanho_template = template.stat().st_size
+    loop.close()
+
+    return {
+        "versao": VERSAO_RESULTADOS,
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "template": {"paginas": PAGINAS, "campos": len(nomes_campos()), "bytes": tamanho_template,
+                     "campos_preenchidos": len(form_data)},
+        "resultados": resultados,
+    }
+
+
+def comparar(base: Dict[str, Any], atual: Dict[str, Any], limite: float = LIMITE_REGRESSAO) -> int:
+    """Imprime a variação do menor tempo por chamada; retorna a quantidade de regressões"""
+    print(f"{'benchmark (mínimo)':<42} {'base (µs)':>12} {'atual (µs)':>12} {'variação':>9}")
+    regressoes = 0
+    for nome, medicao in atual["resultados"].items():
+        anterior = base["resultados"].get(nome)
+        if anterior is None:
+            print(f"{nome:<42} {'—':>12} {medicao['min_us']:>12.1f}")
+            continue
+        variacao = medicao["min_us"] / anterior["min_us"] - 1
+        marca = "  REGRESSÃO" if variacao > limite else ""
+        regressoes += bool(marca)
+        print(f"{nome:<42} {anterior['min_us']:>12.1f} {medicao['min_us']:>12.1f} "
+              f"{variacao:>+8.1%}{marca}")
+    return regressoes
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks das etapas da proposta")
+    parser.add_argument("--saida", type=Path, help="arquivo JSON de resultados")
+    parser.add_argument("--comparar", type=Path, help="resultados de outra versão para comparação")
+    parser.add_argument("--limite", type=float, default=LIMITE_REGRESSAO,
+                        help="piora relativa considerada regressão (padrão: 0.10)")
+    parser.add_argument("--rodadas", type=int, default=RODADAS)
+    args = parser.parse_args()
+
+    resultado = executar(args.rodadas)
+    saida = args.saida or DIRETORIO_RESULTADOS / f"micro-{resultado['commit'] or 'local'}.json"
+    saida.parent.mkdir(parents=True, exist_ok=True)
+    saida.write_bytes(orjson.dumps(resultado, option=orjson.OPT_INDENT_2))
+    print(f"Resultados gravados em {saida}")
+
+    if args.comparar:
+        return 1 if comparar(orjson.loads(args.comparar.read_bytes()), resultado, args.limite) else 0
+    for nome, medicao in resultado["resultados"].items():
+        print(f"{nome:<42} {medicao['mediana_us']:>12.1f} µs (p95 {medicao['p95_us']:.1f})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
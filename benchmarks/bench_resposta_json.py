@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Benchmark da leitura do corpo e da serialização da resposta da proposta
+
+Usa o payload do tipo "Nenhuma" (maior resposta: três cenários completos) e
+compara o caminho anterior com o atual:
+
+- requisição: json.loads do corpo (feito pelo FastAPI para Body(...)) seguido
+  das conversões na rota, contra PROPOSTA_ADAPTER.validate_json direto dos
+  bytes brutos;
+- resposta: PropostaResponse(**resultado) validado e serializado pelo
+  FastAPI com json.dumps, contra orjson direto dos resultados tipados.
+
+Também mede tamanho e tempo de serialização dos formatos de resposta
+(completo, compacto e com seleção de campos via ?fields=).
+
+Uso:
+    python -m benchmarks.bench_resposta_json
+"""
+import json
+import timeit
+from datetime import datetime
+
+import orjson
+
+from app.schemas.proposta_schema import PROPOSTA_ADAPTER, PropostaResponse
+from app.services import calculos
+
+REPETICOES = 2000
+
+PAYLOAD = json.dumps({
+    "nome_cliente": "João Silva",
+    "telefone_cliente": "(11) 99999-9999",
+    "email_cliente": "joao@exemplo.com",
+    "marca_veiculo": "Toyota",
+    "modelo_veiculo": "Corolla",
+    "teto_solar": "PANORAMICO XL",
+    "abertura_porta_malas": "manual",
+    "tipo_documentacao": "CNH",
+    "possui_documentacao": True,
+    "desconto_aplicado": 1000,
+    "vidro_10_anos": "ARGUS",
+    "vidro_5_anos": "",
+    "pacote_revisao": "5 ANOS",
+    "tipo_blindagem": "Nenhuma",
+    "comfort10YearsSubTotal": 45000,
+    "comfort18mmSubTotal": 52000,
+    "ultralightSubTotal": 61000,
+}).encode()
+
+
+def requisicao_anterior():
+    """Corpo decodificado em dicionário, sem validação de tipos"""
+    data = json.loads(PAYLOAD)
+    return calculos.calcular_subtotais_blindagem(data)
+
+
+def requisicao_atual():
+    """Corpo validado em uma passada direto dos bytes"""
+    return calculos.calcular_subtotais_blindagem(PROPOSTA_ADAPTER.validate_json(PAYLOAD))
+
+
+def resposta_anterior(matriz):
+    """Modelo de resposta validado e serializado com json.dumps"""
+    resultado = {
+        "status": "success",
+        "message": "Proposta gerada com sucesso",
+        "tipo_blindagem": "Nenhuma",
+        "valor_blindagem": 0,
+        "condicoes_pagamento": {rotulo: c.condicoes.para_dict() for rotulo, c in matriz.items()},
+    }
+    conteudo = PropostaResponse(**resultado).model_dump(mode="json")
+    return json.dumps(conteudo, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def resposta_atual(matriz, compacto=False, campos=None):
+    """Resultados tipados serializados direto com orjson"""
+    return orjson.dumps({
+        "status": "success",
+        "message": "Proposta gerada com sucesso",
+        "tipo_blindagem": "Nenhuma",
+        "valor_blindagem": 0.0,
+        "condicoes_pagamento": {rotulo: c.condicoes.para_resposta(compacto, campos) for rotulo, c in matriz.items()},
+        "timestamp": datetime.now().isoformat(),
+    })
+
+
+# Formatos de resposta comparados: (nome, compacto, campos das condições)
+FORMATOS = (
+    ("completo", False, None),
+    ("compacto", True, None),
+    ("a_vista", False, {"valor_base", "a_vista"}),
+    ("cartao", True, {"parcelado_cartao"}),
+)
+
+
+def medir(funcao) -> float:
+    """Retorna o melhor tempo (em microssegundos) por chamada"""
+    tempos = timeit.repeat(funcao, number=REPETICOES, repeat=5)
+    return min(tempos) / REPETICOES * 1e6
+
+
+def main():
+    """Função principal"""
+    matriz = calculos.calcular_matriz_cenarios(requisicao_atual())
+    print(f"resposta: {len(resposta_atual(matriz))} bytes")
+    print(f"{'etapa':>10} | {'anterior (µs)':>14} | {'atual (µs)':>11} | {'ganho':>7}")
+    print("-" * 52)
+    for etapa, anterior, atual in (
+        ("requisição", requisicao_anterior, requisicao_atual),
+        ("resposta", lambda: resposta_anterior(matriz), lambda: resposta_atual(matriz)),
+    ):
+        t_anterior, t_atual = medir(anterior), medir(atual)
+        print(f"{etapa:>10} | {t_anterior:>14.2f} | {t_atual:>11.2f} | {t_anterior / t_atual:>6.1f}x")
+
+    print()
+    print(f"{'formato':>10} | {'bytes':>7} | {'tempo (µs)':>11}")
+    print("-" * 34)
+    for nome, compacto, campos in FORMATOS:
+        tamanho = len(resposta_atual(matriz, compacto, campos))
+        tempo = medir(lambda: resposta_atual(matriz, compacto, campos))
+        print(f"{nome:>10} | {tamanho:>7} | {tempo:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
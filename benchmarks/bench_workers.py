@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark da vazão do servidor de produção de 1 a N workers
+
+Inicia servidor.py com 1, 2, ... N workers (padrão: um por núcleo) e, para
+cada quantidade, envia requisições concorrentes a /api/simular_descontos
+durante alguns segundos. A rota só calcula (sem PDF nem chamadas externas),
+com valores diferentes a cada requisição para não reaproveitar o cache de
+condições: mede a parte da proposta limitada por CPU, que é a que escala
+com os workers.
+
+Os clientes executam na mesma máquina e também consomem CPU; para medir
+com todos os núcleos dedicados ao servidor, execute a carga de outra
+máquina.
+
+Uso:
+    python -m benchmarks.bench_workers [N]
+"""
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import httpx
+
+from servidor import quantidade_workers
+
+DURACAO = 5.0
+CLIENTES_POR_WORKER = 4
+RAIZ = Path(__file__).resolve().parent.parent
+
+
+def _porta_livre() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _iniciar_servidor(workers: int, porta: int) -> subprocess.Popen:
+    ambiente = dict(os.environ, SERVIDOR_WORKERS=str(workers), SERVIDOR_HOST="127.0.0.1",
+                    SERVIDOR_PORTA=str(porta), TRACING_AMOSTRAGEM="0")
+    processo = subprocess.Popen([sys.executable, "servidor.py"], cwd=RAIZ, env=ambiente,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    prazo = time.monotonic() + 30
+    while time.monotonic() < prazo:
+        try:
+            httpx.get(f"http://127.0.0.1:{porta}/health", timeout=1)
+            return processo
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    processo.kill()
+    raise RuntimeError(f"Servidor com {workers} workers não respondeu")
+
+
+def _carga(porta: int, clientes: int) -> float:
+    """Requisições por segundo com `clientes` conexões concorrentes"""
+    url = f"http://127.0.0.1:{porta}/api/simular_descontos"
+    contagens = [0] * clientes
+    fim = time.monotonic() + DURACAO
+
+    def cliente(indice: int):
+        with httpx.Client(timeout=30) as http:
+            while time.monotonic() < fim:
+                http.get(url, params={
+                    "comfort10YearsSubTotal": random.randint(30000, 90000),
+                    "ultralightSubTotal": random.randint(30000, 90000),
+                    "desconto_final": 5000,
+                    "desconto_passo": 100,
+                }).raise_for_status()
+                contagens[indice] += 1
+
+    threads = [threading.Thread(target=cliente, args=(i,)) for i in range(clientes)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(contagens) / DURACAO
+
+
+def main():
+    maximo = int(sys.argv[1]) if len(sys.argv) > 1 else quantidade_workers()
+    print(f"Vazão de /api/simular_descontos ({DURACAO:.0f} s por medição, "
+          f"{CLIENTES_POR_WORKER} clientes por worker)")
+    print(f"{'workers':>8} {'req/s':>10} {'ganho':>8}")
+    base = None
+    for workers in range(1, maximo + 1):
+        porta = _porta_livre()
+        processo = _iniciar_servidor(workers, porta)
+        try:
+            vazao = _carga(porta, CLIENTES_POR_WORKER * workers)
+        finally:
+            processo.send_signal(signal.SIGTERM)
+            processo.wait(60)
+        base = base or vazao
+        print(f"{workers:>8} {vazao:>10.1f} {vazao / base:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Template de proposta sintético (formulário AcroForm)
+
+Os templates reais ficam no Supabase e não estão no repositório. Este módulo
+gera um PDF equivalente para benchmarks e testes: um campo de texto para
+cada nome de FORM_MAP_WITH_DESCONTO, FORM_MAP_SEM_DESCONTO e
+PAYMENT_CONDITIONS_MAP, distribuídos pelas páginas, e cada página com uma
+imagem de fundo (como as páginas digitalizadas do template real) de bytes
+aleatórios, não comprimidos, para que o arquivo tenha o tamanho pedido.
+
+Uso:
+    python -m benchmarks.template_sintetico [caminho] [--paginas 12] [--mb 4]
+"""
+import argparse
+import random
+from pathlib import Path
+from typing import List
+
+from config.form_map import FORM_MAP_SEM_DESCONTO, FORM_MAP_WITH_DESCONTO, PAYMENT_CONDITIONS_MAP
+
+PAGINAS = 12
+TAMANHO_BYTES = 4 * 1024 * 1024
+# Página A4 em pontos
+LARGURA, ALTURA = 595, 842
+ALTURA_CAMPO = 16
+SEMENTE = 42
+
+
+def nomes_campos() -> List[str]:
+    """Todos os campos do formulário usados pela aplicação, sem repetição"""
+    nomes = {}
+    for mapa in (FORM_MAP_WITH_DESCONTO, FORM_MAP_SEM_DESCONTO, PAYMENT_CONDITIONS_MAP):
+        nomes.update(dict.fromkeys(mapa.values()))
+    return list(nomes)
+
+
+def gerar_template(caminho, paginas: int = PAGINAS, tamanho: int = TAMANHO_BYTES) -> Path:
+    """
+    Grava o template sintético em `caminho`
+
+    Args:
+        paginas: quantidade de páginas
+        tamanho: tamanho aproximado do arquivo, em bytes (0: sem imagens)
+
+    Returns:
+        Caminho do arquivo gerado
+    """
+    from PyPDF2 import PdfWriter
+    from PyPDF2.generic import (
+        ArrayObject,
+        BooleanObject,
+        DecodedStreamObject,
+        DictionaryObject,
+        FloatObject,
+        NameObject,
+        NumberObject,
+        TextStringObject,
+    )
+
+    rng = random.Random(SEMENTE)
+    writer = PdfWriter()
+    fonte = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+        NameObject("/Encoding"): NameObject("/WinAnsiEncoding"),
+    }))
+
+    campos = nomes_campos()
+    por_pagina = -(-len(campos) // paginas)
+    # Lado da imagem (tons de cinza, 1 byte por pixel) para o tamanho pedido
+    lado = int((tamanho / paginas) ** 0.5) if tamanho > 0 else 0
+    todos = ArrayObject()
+
+    for numero in range(paginas):
+        writer.add_blank_page(LARGURA, ALTURA)
+        referencia = writer.get_object(writer._pages)["/Kids"][-1]
+        pagina = referencia.get_object()
+        recursos = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/Helv"): fonte}),
+        })
+        conteudo = [f"BT /Helv 14 Tf 50 {ALTURA - 50} Td (Proposta de blindagem - pagina {numero + 1}) Tj ET"]
+        if lado:
+            imagem = DecodedStreamObject()
+            imagem.update({
+                NameObject("/Type"): NameObject("/XObject"),
+                NameObject("/Subtype"): NameObject("/Image"),
+                NameObject("/Width"): NumberObject(lado),
+                NameObject("/Height"): NumberObject(lado),
+                NameObject("/ColorSpace"): NameObject("/DeviceGray"),
+                NameObject("/BitsPerComponent"): NumberObject(8),
+            })
+            imagem.set_data(rng.randbytes(lado * lado))
+            recursos[NameObject("/XObject")] = DictionaryObject({NameObject("/Fundo"): writer._add_object(imagem)})
+            conteudo.insert(0, f"q {LARGURA} 0 0 {ALTURA} 0 0 cm /Fundo Do Q")
+        pagina[NameObject("/Resources")] = recursos
+
+        anotacoes = ArrayObject()
+        for indice, nome in enumerate(campos[numero * por_pagina:(numero + 1) * por_pagina]):
+            y = ALTURA - 100 - indice * (ALTURA_CAMPO + 30)
+            conteudo.append(f"BT /Helv 9 Tf 50 {y + ALTURA_CAMPO + 4} Td (Campo {numero}.{indice}) Tj ET")
+            campo = writer._add_object(DictionaryObject({
+                NameObject("/Type"): NameObject("/Annot"),
+                NameObject("/Subtype"): NameObject("/Widget"),
+                NameObject("/FT"): NameObject("/Tx"),
+                NameObject("/T"): TextStringObject(nome),
+                NameObject("/V"): TextStringObject(""),
+                NameObject("/F"): NumberObject(4),
+                NameObject("/DA"): TextStringObject("/Helv 9 Tf 0 g"),
+                NameObject("/Rect"): ArrayObject([FloatObject(v) for v in (50, y, 400, y + ALTURA_CAMPO)]),
+                NameObject("/P"): referencia,
+            }))
+            anotacoes.append(campo)
+            todos.append(campo)
+        pagina[NameObject("/Annots")] = anotacoes
+
+        fluxo = DecodedStreamObject()
+        fluxo.set_data("\n".join(conteudo).encode("latin-1"))
+        pagina[NameObject("/Contents")] = writer._add_object(fluxo)
+
+    writer._root_object[NameObject("/AcroForm")] = DictionaryObject({
+        NameObject("/Fields"): todos,
+        NameObject("/NeedAppearances"): BooleanObject(True),
+        NameObject("/DA"): TextStringObject("/Helv 0 Tf 0 g"),
+        NameObject("/DR"): DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/Helv"): fonte}),
+        }),
+    })
+
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    with open(caminho, "wb") as saida:
+        writer.write(saida)
+    return caminho
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera o template de proposta sintético")
+    parser.add_argument("caminho", nargs="?", default="templates/sintetico.pdf")
+    parser.add_argument("--paginas", type=int, default=PAGINAS)
+    parser.add_argument("--mb", type=float, default=TAMANHO_BYTES / 1024 / 1024)
+    args = parser.parse_args()
+    caminho = gerar_template(args.caminho, args.paginas, int(args.mb * 1024 * 1024))
+    print(f"{caminho}: {args.paginas} páginas, {len(nomes_campos())} campos, "
+          f"{caminho.stat().st_size / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
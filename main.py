@@ -2,19 +2,106 @@
 Aplicação principal do backend Forsecar
 """
 
-import uvicorn
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.routes import proposta
-from app.config import APP_NAME, APP_VERSION, APP_DESCRIPTION, API_PREFIX
+from app.routes import proposta, simulacao
+from app.config import (
+    APP_NAME,
+    APP_VERSION,
+    APP_DESCRIPTION,
+    API_PREFIX,
+    IMPORTACAO_AQUECIMENTO,
+    LOOP_MONITOR,
+    SERVIDOR_ENCERRAMENTO,
+    TEMPLATE_CACHE_SEGUNDOS,
+)
+from app.services import (
+    encerramento,
+    idempotencia,
+    importacao,
+    logger_service,
+    metricas,
+    pdf_service,
+    planos_pagamento,
+    profiling,
+    prontidao,
+    rastreamento,
+)
+from app.services.monitor_loop import MonitorLoop
+from app.services.contexto_requisicao import CABECALHO_PROPOSTA_ID, CABECALHO_REQUEST_ID, MiddlewareContexto
 from app.services.logger_service import logger
 
+
+async def _aquecer():
+    duracao = await asyncio.to_thread(importacao.aquecer)
+    logger.info(f"Módulos pesados importados em {duracao * 1000:.0f} ms")
+
+
+async def _carregar_templates():
+    """Baixa os templates, tentando de novo (até a cada minuto) enquanto falhar"""
+    espera = 1
+    while True:
+        try:
+            await pdf_service.carregar_templates()
+            return
+        except Exception as e:
+            logger.warning(f"Templates não carregados, nova tentativa em {espera} s: {e}")
+        await asyncio.sleep(espera)
+        espera = min(espera * 2, 60)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Inicialização e encerramento da aplicação"""
+    # Compila as regras de pagamento antes de aceitar requisições
+    plano = planos_pagamento.obter_plano()
+    logger.info(f"Planos de pagamento carregados: versão {plano.versao}")
+    encerramento.reiniciar()
+    # Arquivos temporários de um processo finalizado à força
+    encerramento.limpar_abandonados()
+    # Envios por WhatsApp interrompidos no último encerramento
+    pendentes = asyncio.create_task(encerramento.reenviar_pendentes())
+    # Mede o atraso do event loop e captura a pilha de chamadas bloqueantes
+    monitor = app.state.monitor_loop = MonitorLoop() if LOOP_MONITOR else None
+    if monitor is not None:
+        monitor.iniciar()
+    # Módulos pesados importados em uma thread, com a aplicação já atendendo
+    aquecimento = asyncio.create_task(_aquecer()) if IMPORTACAO_AQUECIMENTO else None
+    # Templates baixados em segundo plano (já em cache se pré-carregados pelo
+    # servidor de produção); /ready só responde 200 depois deles, por isso o
+    # download é repetido até conseguir
+    templates = asyncio.create_task(_carregar_templates()) if TEMPLATE_CACHE_SEGUNDOS > 0 else None
+    yield
+    # Recusa novas propostas e aguarda as em andamento (com o servidor de
+    # produção isso já começou no sinal, e o Uvicorn aguardou as requisições)
+    await encerramento.drenar(SERVIDOR_ENCERRAMENTO)
+    if not pendentes.done():
+        pendentes.cancel()
+    if templates is not None and not templates.done():
+        templates.cancel()
+    if aquecimento is not None:
+        await aquecimento
+    if monitor is not None:
+        await monitor.parar()
+    # Grava os spans e os registros de log ainda na fila antes de encerrar
+    logger.info("Encerrando aplicação")
+    idempotencia.fechar()
+    rastreamento.encerrar()
+    logger_service.encerrar_log()
+
+
 # Inicialização da aplicação FastAPI
 app = FastAPI(
     title=APP_NAME,
     description=APP_DESCRIPTION,
     version=APP_VERSION,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # Configuração de CORS
@@ -24,10 +111,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[CABECALHO_REQUEST_ID, CABECALHO_PROPOSTA_ID, idempotencia.CABECALHO_REPETIDA],
 )
 
+# Profiling sob demanda (instalado só com PROFILING_SEGREDO ou PROFILING_ADMIN);
+# fica dentro do contexto, que fornece o request_id
+if profiling.habilitado():
+    app.add_middleware(profiling.MiddlewareProfiling)
+
+# Span raiz de cada requisição amostrada (dentro do contexto, que fornece os ids)
+app.add_middleware(rastreamento.MiddlewareRastreamento)
+
+# Contexto (ids) de cada requisição, anexado aos logs e às chamadas externas
+app.add_middleware(MiddlewareContexto)
+app.add_middleware(metricas.MiddlewareMetricas)
+
 # Inclusão das rotas
 app.include_router(proposta.router, prefix=API_PREFIX)
+app.include_router(simulacao.router, prefix=API_PREFIX)
 
 
 @app.get("/")
@@ -46,6 +147,25 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def ready_check():
+    """
+    Prontidão para receber tráfego: 200 se pronta, 503 com os motivos se não
+    
+    Informa também o cache de templates, as filas e o trabalho em andamento.
+    """
+    pronta, estado = prontidao.verificar(getattr(app.state, "monitor_loop", None))
+    return ORJSONResponse(estado, status_code=200 if pronta else 503)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Métricas no formato do Prometheus (duração das etapas, propostas, requisições em andamento)"""
+    return Response(metricas.exportar(), media_type=metricas.TIPO_CONTEUDO)
+
+
 if __name__ == "__main__":
+    import uvicorn
+
     logger.info(f"Iniciando {APP_NAME} v{APP_VERSION}")
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,248 @@
+"""
+Servidor de produção do backend Forsecar
+
+`python main.py` (e `uvicorn main:app --reload`) executa um único processo,
+com recarga automática: adequado ao desenvolvimento. Este módulo é o ponto
+de entrada de produção:
+
+- o processo principal importa a aplicação, compila as regras de pagamento e
+  os mapas de campos e baixa os templates de PDF, e só então cria os workers
+  com fork: todos compartilham essa memória (copy-on-write) em vez de
+  carregar uma cópia cada;
+- um worker por núcleo (SERVIDOR_WORKERS), sem recarga automática, todos
+  aceitando conexões no mesmo socket;
+- cada worker é substituído após SERVIDOR_MAX_REQUISICOES requisições (mais
+  uma variação aleatória), o que limita o crescimento da memória;
+- SIGTERM/SIGINT encerram os workers: cada um deixa de aceitar conexões e
+  de iniciar propostas e termina as requisições em andamento em até
+  SERVIDOR_ENCERRAMENTO segundos (ver app/services/encerramento.py).
+
+Uso:
+    python servidor.py
+"""
+import asyncio
+import gc
+import os
+import random
+import signal
+import socket
+import sys
+import time
+from typing import Dict, Optional
+
+import uvicorn
+
+from app.config import (
+    APP_NAME,
+    APP_VERSION,
+    SERVIDOR_ENCERRAMENTO,
+    SERVIDOR_HOST,
+    SERVIDOR_MAX_REQUISICOES,
+    SERVIDOR_MAX_REQUISICOES_VARIACAO,
+    SERVIDOR_PORTA,
+    SERVIDOR_WORKERS,
+)
+
+# Intervalo (em segundos) entre verificações dos workers pelo processo principal
+INTERVALO_SUPERVISAO = 0.5
+# Worker que termina antes disso é considerado falha de inicialização: a
+# substituição espera o mesmo tempo, para não recriar workers em sequência
+VIDA_MINIMA_WORKER = 1.0
+# Tempo além de SERVIDOR_ENCERRAMENTO para o worker concluir o encerramento
+# da aplicação (gravar logs e spans) antes de ser finalizado
+MARGEM_ENCERRAMENTO = 5.0
+
+
+def quantidade_workers(configurado: int = SERVIDOR_WORKERS) -> int:
+    """Workers configurados, ou um por núcleo disponível para o processo"""
+    if configurado > 0:
+        return configurado
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # sem sched_getaffinity (macOS)
+        return os.cpu_count() or 1
+
+
+def limite_requisicoes(maximo: int = SERVIDOR_MAX_REQUISICOES,
+                       variacao: int = SERVIDOR_MAX_REQUISICOES_VARIACAO) -> Optional[int]:
+    """Requisições até a reciclagem de um worker (None: nunca reciclar)"""
+    if maximo <= 0:
+        return None
+    return maximo + random.randint(0, max(variacao, 0))
+
+
+def criar_socket(host: str = SERVIDOR_HOST, porta: int = SERVIDOR_PORTA) -> socket.socket:
+    """Socket de escuta criado no processo principal e herdado pelos workers"""
+    familia = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(familia, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, porta))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def precarregar():
+    """
+    Carrega no processo principal tudo o que os workers compartilham
+
+    Importar main compila os schemas, as rotas e os mapas de campos do
+    formulário; em seguida os módulos pesados são importados, as regras de pagamento são compiladas e os
+    templates baixados. Falhar no download não impede a inicialização: os
+    workers baixam o template no primeiro uso.
+
+    Returns:
+        A aplicação ASGI
+    """
+    from main import app
+    from app.services import importacao, logger_service, pdf_service, planos_pagamento
+
+    # Módulos que a aplicação importa sob demanda são carregados aqui, uma vez
+    importacao.aquecer()
+    plano = planos_pagamento.obter_plano()
+    logger_service.log_info(f"Planos de pagamento carregados: versão {plano.versao}")
+    try:
+        asyncio.run(pdf_service.carregar_templates())
+        logger_service.log_info(f"Templates pré-carregados: {len(pdf_service._templates)}")
+    except Exception as e:
+        logger_service.log_warning(f"Templates não pré-carregados, serão baixados pelos workers: {e}")
+    return app
+
+
+class Supervisor:
+    """Processo principal: cria, acompanha e substitui os workers"""
+
+    def __init__(self, app, sock: socket.socket, workers: int, encerramento: float = SERVIDOR_ENCERRAMENTO):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.encerramento = encerramento
+        self.encerrando = False
+        # pid -> instante (time.monotonic) em que o worker foi criado
+        self._processos: Dict[int, float] = {}
+
+    def _criar_worker(self) -> None:
+        pid = os.fork()
+        if pid:
+            self._processos[pid] = time.monotonic()
+            return
+        codigo = 1
+        try:
+            codigo = _executar_worker(self.app, self.sock, self.encerramento)
+        finally:
+            os._exit(codigo)
+
+    def _encerrar(self, sinal, _frame) -> None:
+        self.encerrando = True
+
+    def executar(self) -> None:
+        from app.services import logger_service, rastreamento
+
+        signal.signal(signal.SIGTERM, self._encerrar)
+        signal.signal(signal.SIGINT, self._encerrar)
+
+        # Threads não sobrevivem ao fork: a fila de log e o exportador de
+        # spans são esvaziados aqui e recriados em cada worker
+        logger_service.log_info(f"Iniciando {self.workers} workers de {APP_NAME} v{APP_VERSION}")
+        logger_service.encerrar_log()
+        rastreamento.encerrar()
+        # Objetos já carregados saem da coleta de lixo, que de outra forma
+        # tocaria neles nos workers e copiaria as páginas compartilhadas
+        gc.collect()
+        gc.freeze()
+
+        for _ in range(self.workers):
+            self._criar_worker()
+        while not self.encerrando:
+            self._recolher()
+            time.sleep(INTERVALO_SUPERVISAO)
+        self._parar_workers()
+
+    def _recolher(self) -> None:
+        """Substitui os workers que terminaram (reciclados ou com falha)"""
+        from app.services import logger_service
+
+        while self._processos:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                return
+            criado_em = self._processos.pop(pid, None)
+            if criado_em is None or self.encerrando:
+                continue
+            codigo = os.waitstatus_to_exitcode(status)
+            if codigo != 0:
+                logger_service.log_warning(f"Worker {pid} terminou com código {codigo}")
+            if time.monotonic() - criado_em < VIDA_MINIMA_WORKER:
+                time.sleep(VIDA_MINIMA_WORKER)
+            self._criar_worker()
+
+    def _parar_workers(self) -> None:
+        """Pede o encerramento dos workers e finaliza os que passarem do prazo"""
+        from app.services import logger_service
+
+        logger_service.log_info(f"Encerrando {len(self._processos)} workers")
+        for pid in self._processos:
+            _sinalizar(pid, signal.SIGTERM)
+        prazo = time.monotonic() + self.encerramento + MARGEM_ENCERRAMENTO
+        while self._processos and time.monotonic() < prazo:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+            if pid:
+                self._processos.pop(pid, None)
+            else:
+                time.sleep(0.05)
+        for pid in self._processos:
+            logger_service.log_warning(f"Worker {pid} não encerrou no prazo; finalizando")
+            _sinalizar(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self._processos.clear()
+
+
+def _sinalizar(pid: int, sinal: int) -> None:
+    try:
+        os.kill(pid, sinal)
+    except ProcessLookupError:
+        pass
+
+
+class _ServidorUvicorn(uvicorn.Server):
+    """Servidor Uvicorn que inicia o encerramento da aplicação ao receber o sinal"""
+
+    def handle_exit(self, sig, frame) -> None:
+        from app.services import encerramento
+
+        encerramento.iniciar()
+        super().handle_exit(sig, frame)
+
+
+def _executar_worker(app, sock: socket.socket, encerramento: float) -> int:
+    """Executa o Uvicorn no worker criado pelo fork; retorna o código de saída"""
+    from app.services import logger_service
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    random.seed()
+    logger_service.configurar_log()
+
+    config = uvicorn.Config(
+        app,
+        lifespan="on",
+        limit_max_requests=limite_requisicoes(),
+        timeout_graceful_shutdown=max(int(encerramento), 1),
+    )
+    servidor = _ServidorUvicorn(config)
+    servidor.run(sockets=[sock])
+    if not servidor.started:
+        return 1
+    logger_service.encerrar_log()
+    return 0
+
+
+def main() -> None:
+    app = precarregar()
+    sock = criar_socket()
+    Supervisor(app, sock, quantidade_workers()).executar()
+    sock.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Testes do controle de admissão das propostas
+"""
+import asyncio
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from main import app
+from app.config import ADMISSAO_RETRY_AFTER
+from app.services import admissao, metricas
+from app.services.admissao import ControleAdmissao
+from test_proposta_route import PAYLOAD_COMFORT10, RotaPropostaTestCase
+
+
+async def _ocupar(controle: ControleAdmissao, resultados: list, nome: str, liberar: asyncio.Event):
+    async with controle.vaga() as admitida:
+        resultados.append((nome, admitida))
+        if admitida:
+            await liberar.wait()
+
+
+class TestControleAdmissao(unittest.TestCase):
+
+    def test_limite_fila_e_recusa(self):
+        """Com 1 vaga e fila de 1: a segunda espera e a terceira é recusada"""
+        controle = ControleAdmissao(limite=1, fila=1, espera=5)
+        resultados = []
+
+        async def cenario():
+            liberar = asyncio.Event()
+            tarefas = [asyncio.create_task(_ocupar(controle, resultados, nome, liberar))
+                       for nome in ("a", "b", "c")]
+            await asyncio.sleep(0.01)
+            estado = controle.estado()
+            liberar.set()
+            await asyncio.gather(*tarefas)
+            return estado
+
+        estado = asyncio.run(cenario())
+        self.assertEqual(resultados, [("a", True), ("c", False), ("b", True)])
+        self.assertEqual((estado["em_execucao"], estado["aguardando"]), (1, 1))
+        self.assertEqual(controle.estado()["recusadas"], 1)
+        self.assertEqual((controle.em_execucao, controle.aguardando), (0, 0))
+
+    def test_espera_esgotada(self):
+        controle = ControleAdmissao(limite=1, fila=4, espera=0.05)
+        resultados = []
+
+        async def cenario():
+            liberar = asyncio.Event()
+            primeira = asyncio.create_task(_ocupar(controle, resultados, "a", liberar))
+            await asyncio.sleep(0)
+            await _ocupar(controle, resultados, "b", liberar)
+            liberar.set()
+            await primeira
+
+        asyncio.run(cenario())
+        self.assertEqual(resultados, [("a", True), ("b", False)])
+        self.assertEqual((controle.em_execucao, controle.aguardando), (0, 0))
+
+    def test_cancelada_na_fila_libera_a_vaga(self):
+        controle = ControleAdmissao(limite=1, fila=1, espera=5)
+        resultados = []
+
+        async def cenario():
+            liberar = asyncio.Event()
+            primeira = asyncio.create_task(_ocupar(controle, resultados, "a", liberar))
+            await asyncio.sleep(0)
+            segunda = asyncio.create_task(_ocupar(controle, resultados, "b", liberar))
+            await asyncio.sleep(0)
+            segunda.cancel()
+            await asyncio.sleep(0.01)
+            terceira = asyncio.create_task(_ocupar(controle, resultados, "c", liberar))
+            await asyncio.sleep(0)
+            liberar.set()
+            await asyncio.gather(primeira, terceira)
+
+        asyncio.run(cenario())
+        self.assertEqual(resultados, [("a", True), ("c", True)])
+        self.assertEqual((controle.em_execucao, controle.aguardando), (0, 0))
+
+    def test_desativado(self):
+        controle = ControleAdmissao(limite=0, fila=0, espera=0)
+
+        async def cenario():
+            async with controle.vaga() as primeira, controle.vaga() as segunda:
+                return primeira, segunda
+
+        self.assertEqual(asyncio.run(cenario()), (True, True))
+
+
+class TestRotaSobrecarregada(RotaPropostaTestCase):
+    """Recusa da rota com o limite atingido"""
+
+    def setUp(self):
+        super().setUp()
+        self.controle = ControleAdmissao(limite=1, fila=0, espera=1)
+        patch = mock.patch.object(admissao, "_controle", self.controle)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_recusa_com_retry_after(self):
+        self.controle.em_execucao = 1
+        recusadas = metricas.PROPOSTAS.valor(tipo_blindagem="", template="", resultado="recusada")
+        resposta = self.gerar(PAYLOAD_COMFORT10)
+        self.assertEqual(resposta.status_code, 503)
+        self.assertEqual(resposta.headers["Retry-After"], str(ADMISSAO_RETRY_AFTER))
+        self.assertEqual(resposta.json()["status"], "error")
+        self.fill_pdf_form.assert_not_called()
+        self.assertEqual(metricas.PROPOSTAS.valor(tipo_blindagem="", template="", resultado="recusada"),
+                         recusadas + 1)
+
+        ready = TestClient(app).get("/ready").json()
+        self.assertIn("fila de propostas cheia", ready["motivos"])
+        self.assertEqual(ready["admissao"]["recusadas"], 1)
+
+    def test_vaga_liberada_ao_final(self):
+        self.assertEqual(self.gerar(PAYLOAD_COMFORT10).json()["status"], "success")
+        self.assertEqual(self.gerar(PAYLOAD_COMFORT10).json()["status"], "success")
+        self.assertEqual(self.controle.em_execucao, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+Testes para os cálculos de condições de pagamento
+"""
+import random
+import unittest
+
+import numpy as np
+
+from app.services import calculos
+from app.services.planos_pagamento import obter_plano
+
+
+class TestCondicoesPagamentoVetorizado(unittest.TestCase):
+    """Compara o cálculo vetorizado com o cálculo escalar"""
+
+    def setUp(self):
+        """Gera um conjunto de valores base representativos"""
+        rng = random.Random(42)
+        self.valores = [0, 0.01, 1, 99.99, 45000, 43000.5, 123456.78]
+        self.valores += [round(rng.uniform(1, 500000), 2) for _ in range(500)]
+
+    def test_mesmos_valores_do_calculo_escalar(self):
+        """Cada coluna deve ser idêntica ao valor calculado individualmente"""
+        vetor = calculos.calcular_condicoes_pagamento_vetorizado(self.valores)
+
+        for i, valor_base in enumerate(self.valores):
+            conds = calculos.calcular_condicoes_pagamento({"valor_base": valor_base}).para_dict()
+            self.assertEqual(vetor["a_vista"][i], conds["a_vista"]["valor_total"])
+            self.assertEqual(vetor["duas_vezes_total"][i], conds["duas_vezes"]["valor_total"])
+            self.assertEqual(vetor["duas_vezes_parcela"][i], conds["duas_vezes"]["parcelas"][0]["valor"])
+            self.assertEqual(vetor["tres_vezes_total"][i], conds["tres_vezes"]["valor_total"])
+            self.assertEqual(vetor["tres_vezes_entrada"][i], conds["tres_vezes"]["parcelas"][0]["valor"])
+            self.assertEqual(vetor["tres_vezes_parcela"][i], conds["tres_vezes"]["parcelas"][1]["valor"])
+            self.assertEqual(vetor["quatro_vezes_total"][i], conds["quatro_vezes"]["valor_total"])
+            self.assertEqual(vetor["quatro_vezes_entrada"][i], conds["quatro_vezes"]["parcelas"][0]["valor"])
+            self.assertEqual(vetor["quatro_vezes_parcela"][i], conds["quatro_vezes"]["parcelas"][1]["valor"])
+
+            for j, n in enumerate(vetor["cartao_parcelas"]):
+                cartao = conds["cartao"][f"{n}x"]
+                self.assertEqual(vetor["cartao_acrescimos"][j], cartao["acrescimo"])
+                self.assertEqual(vetor["cartao_total"][i, j], cartao["valor_total"])
+                self.assertEqual(vetor["cartao_parcela"][i, j], cartao["valor_parcela"])
+
+    def test_mesmo_valor_formatado_em_centavos(self):
+        """Os valores formatados com duas casas devem coincidir"""
+        vetor = calculos.calcular_condicoes_pagamento_vetorizado(self.valores)
+
+        for i, valor_base in enumerate(self.valores):
+            conds = calculos.calcular_condicoes_pagamento({"valor_base": valor_base}).para_dict()
+            self.assertEqual(f"{vetor['a_vista'][i]:.2f}", f"{conds['a_vista']['valor_total']:.2f}")
+            self.assertEqual(f"{vetor['cartao_parcela'][i, -1]:.2f}", f"{conds['cartao']['10x']['valor_parcela']:.2f}")
+
+    def test_formato_das_colunas(self):
+        """Colunas simples têm uma posição por valor; cartão tem uma coluna por opção"""
+        vetor = calculos.calcular_condicoes_pagamento_vetorizado(self.valores)
+
+        self.assertEqual(vetor["a_vista"].shape, (len(self.valores),))
+        self.assertEqual(vetor["cartao_total"].shape, (len(self.valores), len(obter_plano().cartao)))
+        np.testing.assert_array_equal(vetor["cartao_parcelas"], [4, 5, 6, 7, 8, 9, 10])
+
+    def test_valor_unico(self):
+        """Um escalar é tratado como array de uma posição"""
+        vetor = calculos.calcular_condicoes_pagamento_vetorizado(45000)
+        self.assertEqual(vetor["a_vista"].shape, (1,))
+        self.assertEqual(vetor["a_vista"][0], 45000 * 0.98)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+Testes do contexto da requisição (ids nos logs, nas chamadas externas e na resposta)
+"""
+import asyncio
+import unittest
+import uuid
+from unittest import mock
+
+import httpx
+from fastapi.testclient import TestClient
+
+from main import app
+from app.services import contexto_requisicao, logger_service
+from app.services.contexto_requisicao import HOOKS_HTTP, iniciar_contexto
+
+
+class TestMiddlewareContexto(unittest.TestCase):
+    """Cabeçalhos devolvidos pelo MiddlewareContexto"""
+
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def test_gera_request_id(self):
+        resposta = self.client.get("/health")
+        self.assertRegex(resposta.headers["X-Request-ID"], r"^[0-9a-f]{32}$")
+        self.assertNotIn("X-Proposta-ID", resposta.headers)
+
+    def test_reaproveita_request_id_valido(self):
+        resposta = self.client.get("/health", headers={"X-Request-ID": "req-123"})
+        self.assertEqual(resposta.headers["X-Request-ID"], "req-123")
+
+        resposta = self.client.get("/health", headers={"X-Request-ID": "id com espacos"})
+        self.assertNotEqual(resposta.headers["X-Request-ID"], "id com espacos")
+
+    @mock.patch("app.services.logger_service.logger")
+    def test_proposta_id_na_resposta(self, _):
+        """A rota de proposta devolve o id gerado, mesmo quando a validação falha"""
+        resposta = self.client.post("/api/gerar_proposta_rodrigo", content=b"{}")
+        self.assertEqual(resposta.status_code, 422)
+        uuid.UUID(resposta.headers["X-Proposta-ID"])
+
+    def test_contexto_isolado_entre_requisicoes(self):
+        """Fora de uma requisição não há contexto"""
+        self.client.get("/health")
+        self.assertIsNone(contexto_requisicao.contexto_atual())
+
+
+class TestPropagacaoContexto(unittest.TestCase):
+    """Ids anexados aos registros de log e às chamadas HTTP"""
+
+    def test_registros_de_log(self):
+        registros = []
+        origem = logger_service.novo_logger()
+        origem.add(lambda m: registros.append(m.record["extra"]), format="{message}")
+
+        origem.info("fora")
+        with iniciar_contexto("req-1"):
+            contexto_requisicao.definir_proposta("prop-1")
+            origem.info("dentro")
+
+        self.assertNotIn("request_id", registros[0])
+        self.assertEqual((registros[1]["request_id"], registros[1]["proposta_id"]), ("req-1", "prop-1"))
+
+    def test_texto_com_request_id(self):
+        linhas = []
+        arquivo = logger_service.novo_logger()
+        arquivo.add(lambda m: linhas.append(str(m)), format=logger_service._formato_arquivo,
+                    filter=logger_service.format_time_brazil)
+        with iniciar_contexto("req-1"):
+            arquivo.info("mensagem")
+        self.assertTrue(linhas[0].endswith("| INFO     | [req-1] mensagem\n"))
+
+    def test_chamadas_http(self):
+        recebidos = []
+
+        def responder(request):
+            recebidos.append(request.headers)
+            return httpx.Response(200)
+
+        async def chamar():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(responder), event_hooks=HOOKS_HTTP) as client:
+                await client.get("http://externo/")
+                with iniciar_contexto("req-2"):
+                    contexto_requisicao.definir_proposta("prop-2")
+                    await client.get("http://externo/")
+
+        asyncio.run(chamar())
+        self.assertNotIn("x-request-id", recebidos[0])
+        self.assertEqual((recebidos[1]["x-request-id"], recebidos[1]["x-proposta-id"]), ("req-2", "prop-2"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,212 @@
+"""
+Testes para a representação monetária em centavos
+"""
+import math
+import random
+import unittest
+from fractions import Fraction
+
+from app.services import calculos
+from app.services.dinheiro import (
+    Centavos,
+    arredondar,
+    formatar_centavos,
+    formatar_reais,
+)
+
+# Quantidade de valores aleatórios gerados nos testes de propriedade
+AMOSTRAS = 2000
+
+# Acréscimos originais do cartão (número de parcelas -> acréscimo percentual)
+ACRESCIMOS_CARTAO = {4: 6, 5: 7, 6: 8, 7: 9, 8: 10, 9: 11, 10: 12}
+
+
+def _valores_aleatorios(semente: int):
+    """Gera valores base em reais (com centavos) para os testes de propriedade"""
+    rng = random.Random(semente)
+    for _ in range(AMOSTRAS):
+        yield rng.randint(1, 100_000_000) / 100
+
+
+def _calculo_float(valor_base: float) -> dict:
+    """Fórmulas originais em ponto flutuante (referência dos valores atuais)"""
+    total_3x = valor_base * 1.01
+    total_4x = valor_base * 1.03
+    valores = {
+        "a_vista": valor_base * 0.98,
+        "parcela_2x": valor_base / 2,
+        "total_3x": total_3x,
+        "entrada_3x": total_3x * 0.5,
+        "parcela_3x": (total_3x - total_3x * 0.5) / 2,
+        "total_4x": total_4x,
+        "entrada_4x": total_4x * 0.6,
+        "parcela_4x": (total_4x - total_4x * 0.6) / 3,
+    }
+    for n, acrescimo in ACRESCIMOS_CARTAO.items():
+        valores[f"cartao_{n}x"] = valor_base * (1 + acrescimo / 100) / n
+    return valores
+
+
+def _calculo_exato(valor_base: float) -> dict:
+    """Mesmas fórmulas com frações exatas (em reais)"""
+    base = Fraction(str(valor_base))
+    total_3x = base * Fraction(101, 100)
+    total_4x = base * Fraction(103, 100)
+    valores = {
+        "a_vista": base * Fraction(98, 100),
+        "parcela_2x": base / 2,
+        "total_3x": total_3x,
+        "entrada_3x": total_3x / 2,
+        "parcela_3x": total_3x / 4,
+        "total_4x": total_4x,
+        "entrada_4x": total_4x * Fraction(60, 100),
+        "parcela_4x": total_4x * Fraction(40, 100) / 3,
+    }
+    for n, acrescimo in ACRESCIMOS_CARTAO.items():
+        valores[f"cartao_{n}x"] = base * Fraction(100 + acrescimo, 100) / n
+    return valores
+
+
+def _calculo_centavos(valor_base: float) -> dict:
+    """Valores produzidos por calcular_condicoes_pagamento"""
+    quadro = calculos.calcular_condicoes_pagamento({"valor_base": valor_base})
+    tres_vezes = quadro.opcao("tres_vezes")
+    quatro_vezes = quadro.opcao("quatro_vezes")
+    valores = {
+        "a_vista": quadro.a_vista.valor_total / 100,
+        "parcela_2x": quadro.opcao("duas_vezes").valor_parcela / 100,
+        "total_3x": tres_vezes.valor_total / 100,
+        "entrada_3x": tres_vezes.valor_entrada / 100,
+        "parcela_3x": tres_vezes.valor_parcela / 100,
+        "total_4x": quatro_vezes.valor_total / 100,
+        "entrada_4x": quatro_vezes.valor_entrada / 100,
+        "parcela_4x": quatro_vezes.valor_parcela / 100,
+    }
+    for n in ACRESCIMOS_CARTAO:
+        valores[f"cartao_{n}x"] = quadro.opcao(f"{n}x").valor_parcela / 100
+    return valores
+
+
+class TestArredondamento(unittest.TestCase):
+    """Testes do ponto único de arredondamento"""
+
+    def test_meio_centavo_arredonda_para_cima(self):
+        """Empates são arredondados para cima"""
+        self.assertEqual(arredondar(5, 10), 1)
+        self.assertEqual(arredondar(15, 10), 2)
+        self.assertEqual(arredondar(14, 10), 1)
+        self.assertEqual(arredondar(-15, 10), -1)
+
+    def test_conversao_de_reais(self):
+        """Floats são interpretados pela representação decimal"""
+        self.assertEqual(Centavos.de_reais(0.1), 10)
+        self.assertEqual(Centavos.de_reais(45000), 4_500_000)
+        self.assertEqual(Centavos.de_reais("1234.565"), 123_457)
+        self.assertEqual(Centavos.de_reais(1.005), 101)
+        self.assertEqual(Centavos.de_reais(-2.5), -250)
+
+    def test_valores_nao_finitos(self):
+        """Infinito e NaN são recusados com ValueError (422 na validação)"""
+        for valor in (float("inf"), float("-inf"), float("nan"), "Infinity", "NaN"):
+            with self.assertRaises(ValueError, msg=valor):
+                Centavos.de_reais(valor)
+
+    def test_centavos_e_um_inteiro_compacto(self):
+        """Centavos não carrega atributos além do inteiro"""
+        valor = Centavos.de_reais(10.5)
+        self.assertIsInstance(valor, int)
+        self.assertFalse(hasattr(valor, "__dict__"))
+        self.assertEqual(valor.reais, 10.5)
+
+
+class TestFormatacao(unittest.TestCase):
+    """Testes da formatação no padrão brasileiro"""
+
+    def test_formato_pt_br(self):
+        """Separador de milhar é ponto e decimal é vírgula"""
+        self.assertEqual(formatar_centavos(0), "R$ 0,00")
+        self.assertEqual(formatar_centavos(5), "R$ 0,05")
+        self.assertEqual(formatar_centavos(123_456), "R$ 1.234,56")
+        self.assertEqual(formatar_centavos(123_456_789_00), "R$ 123.456.789,00")
+        self.assertEqual(formatar_centavos(-123_456), "-R$ 1.234,56")
+
+    def test_formatar_reais(self):
+        """Valores em reais passam pela mesma conversão para centavos"""
+        self.assertEqual(formatar_reais(44100.0), "R$ 44.100,00")
+        self.assertEqual(formatar_reais(0.1 + 0.2), "R$ 0,30")
+        self.assertEqual(Centavos(4_410_000).formatar(), "R$ 44.100,00")
+
+    def test_formatacao_em_cache(self):
+        """Valores repetidos são atendidos pelo cache"""
+        formatar_centavos.cache_clear()
+        formatar_centavos(99_999)
+        formatar_centavos(99_999)
+        self.assertEqual(formatar_centavos.cache_info().hits, 1)
+
+
+class TestPropriedadesCalculos(unittest.TestCase):
+    """Propriedades dos cálculos em centavos contra as fórmulas originais"""
+
+    def test_valores_sao_o_arredondamento_exato(self):
+        """Cada valor é a fração exata arredondada uma única vez ao centavo"""
+        for valor_base in _valores_aleatorios(1):
+            centavos = _calculo_centavos(valor_base)
+            for chave, exato in _calculo_exato(valor_base).items():
+                esperado = arredondar(exato.numerator * 100, exato.denominator) / 100
+                self.assertEqual(centavos[chave], esperado, f"{chave} para {valor_base}")
+
+    def test_coincide_com_valores_atuais(self):
+        """
+        Coincide ao centavo com a formatação dos valores atuais em float.
+
+        A única divergência admitida é o empate de meio centavo, em que o
+        float pode cair de qualquer lado e a nova regra arredonda para cima.
+        """
+        for valor_base in _valores_aleatorios(2):
+            centavos = _calculo_centavos(valor_base)
+            exatos = _calculo_exato(valor_base)
+            for chave, atual in _calculo_float(valor_base).items():
+                self.assertLessEqual(abs(centavos[chave] - atual), 0.005 + 1e-6)
+                empate = (exatos[chave] * 100 % 1) == Fraction(1, 2)
+                if not empate:
+                    self.assertEqual(f"{centavos[chave]:.2f}", f"{atual:.2f}", f"{chave} para {valor_base}")
+
+    def test_vetorizado_coincide_com_escalar(self):
+        """O cálculo vetorizado usa o mesmo arredondamento"""
+        valores = list(_valores_aleatorios(3))
+        vetor = calculos.calcular_condicoes_pagamento_vetorizado(valores)
+        for i, valor_base in enumerate(valores):
+            centavos = _calculo_centavos(valor_base)
+            self.assertEqual(vetor["a_vista"][i], centavos["a_vista"])
+            self.assertEqual(vetor["quatro_vezes_parcela"][i], centavos["parcela_4x"])
+            self.assertEqual(vetor["cartao_parcela"][i, -1], centavos["cartao_10x"])
+
+    def test_vetorizado_meio_centavo(self):
+        """Valores com meio centavo são convertidos como no cálculo escalar"""
+        rng = random.Random(5)
+        empates = [(rng.randint(1, 10_000_000) * 10 + 5) / 1000 for _ in range(AMOSTRAS)]
+        # Vizinhos imediatos dos empates não são empates
+        vizinhos = [math.nextafter(v, sentido) for v in empates[:200] for sentido in (0, math.inf)]
+        valores = [1.005, 2.675, 1234.565, 0.145, 0.29, -1.005, -2.675] + empates + vizinhos
+        vetor = calculos.calcular_condicoes_pagamento_vetorizado(valores)
+        for i, valor_base in enumerate(valores):
+            quadro = calculos.calcular_condicoes_pagamento({"valor_base": valor_base})
+            self.assertEqual(vetor["valor_base"][i], quadro.valor_base / 100, valor_base)
+            self.assertEqual(vetor["a_vista"][i], quadro.a_vista.valor_total / 100, valor_base)
+            self.assertEqual(vetor["cartao_parcela"][i, -1], quadro.opcao("10x").valor_parcela / 100, valor_base)
+        self.assertEqual((vetor["valor_base"][0], vetor["a_vista"][0]), (1.01, 0.99))
+
+    def test_funcoes_legadas_concordam(self):
+        """As funções legadas produzem os mesmos valores do cálculo principal"""
+        for valor_base in list(_valores_aleatorios(4))[:200]:
+            centavos = _calculo_centavos(valor_base)
+            self.assertEqual(calculos.calcular_a_vista(valor_base)["valor_final"], centavos["a_vista"])
+            direto = calculos.calcular_parcelado_direto(valor_base)
+            self.assertEqual(direto[1]["valor_parcela"], centavos["parcela_3x"])
+            self.assertEqual(direto[2]["valor_entrada"], centavos["entrada_4x"])
+            cartao = calculos.calcular_parcelado_cartao(valor_base)
+            self.assertEqual(cartao[-1]["valor_parcela"], centavos["cartao_10x"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,255 @@
+"""
+Testes do encerramento coordenado (propostas em andamento, envios pendentes
+e arquivos temporários)
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import httpx
+import orjson
+from fastapi.testclient import TestClient
+
+from main import app
+from app.routes.proposta import _processar_proposta
+from app.schemas.proposta_schema import PROPOSTA_ADAPTER
+from app.services import encerramento
+from app.services.encerramento import Encerramento
+from test_proposta_route import PAYLOAD_COMFORT10, RotaPropostaTestCase
+
+
+class TestDrenagem(unittest.TestCase):
+    """Espera pelas propostas em andamento"""
+
+    def setUp(self):
+        patch = mock.patch("app.services.logger_service.logger")
+        self.logger = patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_aguarda_propostas_em_andamento(self):
+        estado = Encerramento()
+
+        async def proposta():
+            with estado.pipeline():
+                await asyncio.sleep(0.2)
+
+        async def cenario():
+            tarefa = asyncio.create_task(proposta())
+            await asyncio.sleep(0)
+            estado.iniciar()
+            concluiu = await estado.drenar(5)
+            await tarefa
+            return concluiu
+
+        self.assertTrue(asyncio.run(cenario()))
+        self.assertTrue(estado.encerrando)
+        self.assertEqual(estado.em_andamento, 0)
+        self.assertGreaterEqual(estado.drenado_em - estado.iniciado_em, 0.15)
+        mensagem = self.logger.info.call_args[0][0]
+        self.assertIn("encerradas em 0.2", mensagem)
+
+    def test_prazo_esgotado(self):
+        estado = Encerramento()
+
+        async def cenario():
+            with estado.pipeline():
+                inicio = time.monotonic()
+                concluiu = await estado.drenar(0.1)
+                return concluiu, time.monotonic() - inicio
+
+        concluiu, duracao = asyncio.run(cenario())
+        self.assertFalse(concluiu)
+        self.assertLess(duracao, 1)
+        self.assertIn("1 propostas em andamento", self.logger.warning.call_args[0][0])
+
+    def test_conta_canceladas(self):
+        estado = Encerramento()
+
+        async def proposta():
+            with estado.pipeline():
+                await asyncio.sleep(10)
+
+        async def cenario():
+            tarefa = asyncio.create_task(proposta())
+            await asyncio.sleep(0)
+            estado.iniciar()
+            tarefa.cancel()
+            return await estado.drenar(5)
+
+        self.assertTrue(asyncio.run(cenario()))
+        self.assertEqual(estado.canceladas, 1)
+        self.assertIn("1 canceladas", self.logger.info.call_args[0][0])
+
+
+class TestRotaNoEncerramento(RotaPropostaTestCase):
+    """Recusa de novas propostas, arquivos temporários e envios interrompidos"""
+
+    def setUp(self):
+        super().setUp()
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.diretorio.cleanup)
+        self.temporarios = Path(self.diretorio.name) / "pdf"
+        self.pendentes = Path(self.diretorio.name) / "envios_pendentes.jsonl"
+        for patch in (mock.patch.object(encerramento, "_estado", Encerramento()),
+                      mock.patch.object(encerramento, "PDF_TEMP_DIR", self.temporarios),
+                      mock.patch.object(encerramento, "ENVIOS_PENDENTES_FILE", self.pendentes)):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_recusa_durante_encerramento(self):
+        encerramento.iniciar()
+        resposta = self.gerar(PAYLOAD_COMFORT10)
+        self.assertEqual(resposta.status_code, 503)
+        self.assertEqual(resposta.headers["Retry-After"], str(encerramento.RETRY_AFTER_ENCERRAMENTO))
+        self.assertEqual(resposta.json()["status"], "error")
+        self.fill_pdf_form.assert_not_called()
+
+    def test_ready_informa_encerramento(self):
+        encerramento.iniciar()
+        resposta = TestClient(app).get("/ready")
+        self.assertEqual(resposta.status_code, 503)
+        self.assertIn("encerrando", resposta.json()["motivos"])
+
+    def test_temporarios_removidos(self):
+        self.assertEqual(self.gerar(PAYLOAD_COMFORT10).json()["status"], "success")
+        self.assertEqual(list(self.temporarios.iterdir()), [])
+
+        with mock.patch("app.services.pdf_service.upload_pdf_para_supabase", side_effect=OSError("falhou")):
+            self.assertEqual(self.gerar(PAYLOAD_COMFORT10).json()["status"], "error")
+        self.assertEqual(list(self.temporarios.iterdir()), [])
+
+    def test_cancelada_no_whatsapp_grava_envio_pendente(self):
+        proposta = PROPOSTA_ADAPTER.validate_python(PAYLOAD_COMFORT10)
+        with mock.patch("app.services.whatsapp_service.enviar_pdf_whatsapp", side_effect=asyncio.CancelledError):
+            with self.assertRaises(asyncio.CancelledError):
+                asyncio.run(_processar_proposta(proposta, "id-1", False, None, None))
+
+        self.assertEqual(list(self.temporarios.iterdir()), [])
+        envio = orjson.loads(self.pendentes.read_bytes())
+        self.assertEqual(envio["proposta_id"], "id-1")
+        self.assertEqual(envio["telefone"], PAYLOAD_COMFORT10["telefone_cliente"])
+        self.assertTrue(envio["url_pdf"].startswith("http://pdf/proposta_id-1_"))
+
+
+class TestEnviosPendentes(unittest.TestCase):
+    """Reenvio dos envios interrompidos na inicialização"""
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.diretorio.cleanup)
+        self.arquivo = Path(self.diretorio.name) / "envios_pendentes.jsonl"
+        patch = mock.patch("app.services.logger_service.logger")
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_falhas_continuam_pendentes(self):
+        for indice in range(3):
+            encerramento.registrar_envio_pendente(
+                {"proposta_id": f"id-{indice}", "telefone": "11999999999",
+                 "url_pdf": f"http://pdf/{indice}", "mensagem": "Olá"}, self.arquivo)
+
+        async def enviar(telefone, url_pdf, mensagem):
+            if url_pdf.endswith("/1"):
+                raise OSError("Z-API indisponível")
+            return {"status": "success"}
+
+        with mock.patch("app.services.whatsapp_service.enviar_pdf_whatsapp", side_effect=enviar):
+            self.assertEqual(asyncio.run(encerramento.reenviar_pendentes(self.arquivo)), 2)
+
+        restantes = [orjson.loads(linha) for linha in self.arquivo.read_bytes().splitlines()]
+        self.assertEqual([envio["proposta_id"] for envio in restantes], ["id-1"])
+        self.assertEqual(os.listdir(self.diretorio.name), [self.arquivo.name])
+
+    def test_sem_pendentes(self):
+        self.assertEqual(asyncio.run(encerramento.reenviar_pendentes(self.arquivo)), 0)
+
+    def _registrar(self, quantidade: int, arquivo: Path = None) -> None:
+        for indice in range(quantidade):
+            encerramento.registrar_envio_pendente(
+                {"proposta_id": f"id-{indice}", "telefone": "11999999999",
+                 "url_pdf": f"http://pdf/{indice}", "mensagem": "Olá"}, arquivo or self.arquivo)
+
+    def _pendentes(self):
+        return [orjson.loads(linha)["proposta_id"] for linha in self.arquivo.read_bytes().splitlines()]
+
+    def test_erro_500_da_z_api_continua_pendente(self):
+        """Uma resposta de erro da Z-API, sem exceção, não conta como envio"""
+        self._registrar(2)
+
+        def responder(request):
+            if orjson.loads(request.content)["url"].endswith("/1"):
+                return httpx.Response(500, json={"error": "Internal Server Error"})
+            return httpx.Response(200, json={"status": "success"})
+
+        cliente = lambda **opcoes: httpx.AsyncClient(transport=httpx.MockTransport(responder), **opcoes)
+        with mock.patch("app.services.rastreamento_http.cliente_http", cliente):
+            self.assertEqual(asyncio.run(encerramento.reenviar_pendentes(self.arquivo)), 1)
+
+        self.assertEqual(self._pendentes(), ["id-1"])
+        self.assertEqual(os.listdir(self.diretorio.name), [self.arquivo.name])
+
+    def test_reserva_mantida_ate_o_fim_dos_envios(self):
+        """Os envios não saem do disco antes de serem feitos"""
+        self._registrar(2)
+        reservas = []
+
+        async def enviar(telefone, url_pdf, mensagem):
+            reservas.append(sorted(os.listdir(self.diretorio.name)))
+            return {"status": "success"}
+
+        with mock.patch("app.services.whatsapp_service.enviar_pdf_whatsapp", side_effect=enviar):
+            self.assertEqual(asyncio.run(encerramento.reenviar_pendentes(self.arquivo)), 2)
+
+        reserva = f"envios_pendentes.{os.getpid()}.0.jsonl"
+        self.assertEqual(reservas, [[reserva], [reserva]])
+        self.assertEqual(os.listdir(self.diretorio.name), [])
+
+    def test_cancelamento_devolve_os_restantes(self):
+        self._registrar(3)
+
+        async def enviar(telefone, url_pdf, mensagem):
+            if url_pdf.endswith("/1"):
+                raise asyncio.CancelledError
+            return {"status": "success"}
+
+        with mock.patch("app.services.whatsapp_service.enviar_pdf_whatsapp", side_effect=enviar):
+            with self.assertRaises(asyncio.CancelledError):
+                asyncio.run(encerramento.reenviar_pendentes(self.arquivo))
+
+        self.assertEqual(self._pendentes(), ["id-1", "id-2"])
+        self.assertEqual(os.listdir(self.diretorio.name), [self.arquivo.name])
+
+    def test_reserva_de_processo_finalizado_e_assumida(self):
+        """A reserva deixada por um worker finalizado à força é reenviada"""
+        processo = subprocess.Popen([sys.executable, "-c", "pass"])
+        processo.wait()
+        self._registrar(2, self.arquivo.with_name(f"envios_pendentes.{processo.pid}.0.jsonl"))
+
+        with mock.patch("app.services.whatsapp_service.enviar_pdf_whatsapp", return_value={"status": "success"}):
+            self.assertEqual(asyncio.run(encerramento.reenviar_pendentes(self.arquivo)), 2)
+        self.assertEqual(os.listdir(self.diretorio.name), [])
+
+
+class TestTemporariosAbandonados(unittest.TestCase):
+
+    def test_remove_apenas_antigos(self):
+        with tempfile.TemporaryDirectory() as diretorio, mock.patch("app.services.logger_service.logger"):
+            antigo = Path(diretorio) / "proposta_antiga.pdf"
+            recente = Path(diretorio) / "proposta_recente.pdf"
+            antigo.write_bytes(b"%PDF")
+            recente.write_bytes(b"%PDF")
+            duas_horas = time.time() - 7200
+            os.utime(antigo, (duas_horas, duas_horas))
+
+            self.assertEqual(encerramento.limpar_abandonados(diretorio), 1)
+            self.assertEqual(os.listdir(diretorio), [recente.name])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,194 @@
+"""
+Testes das chaves de idempotência da rota de propostas
+"""
+import asyncio
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from fastapi.responses import ORJSONResponse
+
+from app.services import idempotencia
+from app.services.idempotencia import CABECALHO_CHAVE, CABECALHO_REPETIDA, RegistroIdempotencia
+from test_proposta_route import PAYLOAD_COMFORT10, PAYLOAD_NENHUMA, RotaPropostaTestCase, _preencher_pdf
+
+
+class RegistroTestCase(unittest.TestCase):
+    """Base com um registro em um arquivo temporário"""
+
+    def setUp(self):
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.caminho = Path(diretorio.name) / "idempotencia.sqlite"
+        self.registro = RegistroIdempotencia(self.caminho, ttl=60, espera=2, reserva=60)
+        self.addCleanup(self.registro.fechar)
+        self.chamadas = 0
+
+    async def processar(self, status_code=200, atraso=0.0, status="success"):
+        self.chamadas += 1
+        await asyncio.sleep(atraso)
+        return ORJSONResponse({"status": status, "chamada": self.chamadas}, status_code=status_code)
+
+    def executar(self, chave="chave-1", impressao="a", **opcoes):
+        return asyncio.run(self.registro.executar(chave, impressao, "proposta-1",
+                                                  lambda: self.processar(**opcoes)))
+
+
+class TestRegistroIdempotencia(RegistroTestCase):
+
+    def test_concluida_e_repetida(self):
+        primeira = self.executar()
+        segunda = self.executar()
+        self.assertEqual(self.chamadas, 1)
+        self.assertNotIn(CABECALHO_REPETIDA, primeira.headers)
+        self.assertEqual(segunda.headers[CABECALHO_REPETIDA], "true")
+        self.assertEqual(segunda.body, primeira.body)
+
+    def test_em_andamento_compartilha_resultado(self):
+        async def cenario():
+            return await asyncio.gather(*(
+                self.registro.executar("chave-1", "a", "proposta-1", lambda: self.processar(atraso=0.1))
+                for _ in range(3)
+            ))
+
+        respostas = asyncio.run(cenario())
+        self.assertEqual(self.chamadas, 1)
+        self.assertEqual({resposta.body for resposta in respostas}, {respostas[0].body})
+        self.assertEqual(sum(CABECALHO_REPETIDA in resposta.headers for resposta in respostas), 2)
+
+    def test_outra_requisicao_com_a_mesma_chave(self):
+        self.executar(impressao="a")
+        resposta = self.executar(impressao="b")
+        self.assertEqual(resposta.status_code, 422)
+        self.assertEqual(self.chamadas, 1)
+
+    def test_falha_libera_a_chave(self):
+        self.assertEqual(self.executar(status_code=503).status_code, 503)
+        with self.assertRaises(RuntimeError):
+            asyncio.run(self.registro.executar("chave-1", "a", "proposta-1", mock.AsyncMock(
+                side_effect=RuntimeError("falhou"))))
+        self.assertEqual(self.executar().status_code, 200)
+        self.assertEqual(self.chamadas, 2)
+
+    def test_erro_no_processamento_libera_a_chave(self):
+        """Respostas com status "error" (ex.: falha no upload) não são repetidas"""
+        self.assertEqual(self.executar(status="error").status_code, 200)
+        resposta = self.executar()
+        self.assertNotIn(CABECALHO_REPETIDA, resposta.headers)
+        self.assertEqual(self.chamadas, 2)
+        self.assertEqual(self.executar().headers[CABECALHO_REPETIDA], "true")
+
+    def test_banco_fora_do_event_loop(self):
+        """As consultas ao SQLite não rodam na thread do event loop"""
+        threads = []
+        reservar = self.registro._reservar
+
+        def registrar_thread(*args):
+            threads.append(threading.get_ident())
+            return reservar(*args)
+
+        async def cenario():
+            with mock.patch.object(self.registro, "_reservar", registrar_thread):
+                await self.registro.executar("chave-1", "a", "proposta-1", self.processar)
+            return threading.get_ident()
+
+        self.assertNotIn(asyncio.run(cenario()), threads)
+        self.assertEqual(len(threads), 1)
+
+    def test_expiracao(self):
+        self.registro.ttl = -1
+        self.executar()
+        self.executar()
+        self.assertEqual(self.chamadas, 2)
+
+    def test_em_andamento_em_outro_worker(self):
+        """A repetição consulta o banco até a original (de outro processo) concluir"""
+        outro = sqlite3.connect(str(self.caminho), isolation_level=None)
+        self.addCleanup(outro.close)
+        self.registro.conexao.execute(
+            "INSERT INTO chaves (chave, impressao, proposta_id, expira_em) VALUES ('chave-1', 'a', 'p0', ?)",
+            (time.time() + 60,),
+        )
+
+        async def cenario():
+            repeticao = asyncio.create_task(self.registro.executar("chave-1", "a", "proposta-1", self.processar))
+            await asyncio.sleep(0.2)
+            outro.execute("UPDATE chaves SET status_code = 200, corpo = ? WHERE chave = 'chave-1'",
+                          (b'{"status":"success"}',))
+            return await repeticao
+
+        resposta = asyncio.run(cenario())
+        self.assertEqual(self.chamadas, 0)
+        self.assertEqual(resposta.body, b'{"status":"success"}')
+
+    def test_espera_esgotada(self):
+        self.registro.espera = 0.2
+        self.registro.conexao.execute(
+            "INSERT INTO chaves (chave, impressao, proposta_id, expira_em) VALUES ('chave-1', 'a', 'p0', ?)",
+            (time.time() + 60,),
+        )
+        resposta = self.executar()
+        self.assertEqual(resposta.status_code, 409)
+        self.assertIn("Retry-After", resposta.headers)
+        self.assertEqual(self.chamadas, 0)
+
+
+class TestRotaIdempotente(RotaPropostaTestCase):
+    """Idempotency-Key na rota de propostas"""
+
+    def setUp(self):
+        super().setUp()
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        registro = RegistroIdempotencia(Path(diretorio.name) / "idempotencia.sqlite")
+        self.addCleanup(registro.fechar)
+        patch = mock.patch.object(idempotencia, "_registro", registro)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_repeticao_nao_gera_outra_proposta(self):
+        primeira = self.gerar(PAYLOAD_COMFORT10, headers={CABECALHO_CHAVE: "pedido-123"})
+        segunda = self.gerar(PAYLOAD_COMFORT10, headers={CABECALHO_CHAVE: "pedido-123"})
+        self.assertEqual(self.fill_pdf_form.call_count, 1)
+        self.assertEqual(segunda.json(), primeira.json())
+        self.assertEqual(segunda.headers[CABECALHO_REPETIDA], "true")
+        self.assertEqual(segunda.headers["X-Proposta-ID"], primeira.headers["X-Proposta-ID"])
+
+    def test_parametros_fazem_parte_da_requisicao(self):
+        self.gerar(PAYLOAD_COMFORT10, headers={CABECALHO_CHAVE: "pedido-123"})
+        outra = self.client.post("/api/gerar_proposta_rodrigo?formato=compacto", json=PAYLOAD_COMFORT10,
+                                 headers={CABECALHO_CHAVE: "pedido-123"})
+        self.assertEqual(outra.status_code, 422)
+        self.assertEqual(self.gerar(PAYLOAD_NENHUMA, headers={CABECALHO_CHAVE: "pedido-123"}).status_code, 422)
+
+    def test_sem_chave_ou_chaves_diferentes(self):
+        self.gerar(PAYLOAD_COMFORT10)
+        self.gerar(PAYLOAD_COMFORT10)
+        self.gerar(PAYLOAD_COMFORT10, headers={CABECALHO_CHAVE: "pedido-1"})
+        self.gerar(PAYLOAD_COMFORT10, headers={CABECALHO_CHAVE: "pedido-2"})
+        self.assertEqual(self.fill_pdf_form.call_count, 4)
+
+    def test_falha_no_envio_permite_nova_tentativa(self):
+        """Uma proposta que falhou é processada de novo com a mesma chave"""
+        self.fill_pdf_form.side_effect = RuntimeError("PDF inválido")
+        primeira = self.gerar(PAYLOAD_COMFORT10, headers={CABECALHO_CHAVE: "pedido-123"})
+        self.assertEqual(primeira.json()["status"], "error")
+
+        self.fill_pdf_form.side_effect = _preencher_pdf
+        segunda = self.gerar(PAYLOAD_COMFORT10, headers={CABECALHO_CHAVE: "pedido-123"})
+        self.assertEqual(segunda.json()["status"], "success")
+        self.assertNotIn(CABECALHO_REPETIDA, segunda.headers)
+        self.assertEqual(self.fill_pdf_form.call_count, 2)
+
+    def test_chave_invalida(self):
+        resposta = self.gerar(PAYLOAD_COMFORT10, headers={CABECALHO_CHAVE: "x" * 300})
+        self.assertEqual(resposta.status_code, 400)
+        self.fill_pdf_form.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+"""
+Testes do tempo de importação da aplicação
+"""
+import sys
+import unittest
+
+from app.services import importacao
+
+SAIDA_IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       300 |        300 | site
+import time:       250 |        250 |     pydantic.fields
+import time:       250 |        500 |   pydantic
+import time:      1500 |       1500 |     app.services.calculos
+import time:       500 |       2000 |   app.routes.proposta
+import time:      1000 |       3500 | main
+"""
+
+
+class TestImportacao(unittest.TestCase):
+    """Orçamento de importação de main e relatório por módulo"""
+
+    def test_sem_modulos_pesados(self):
+        """httpx, PyPDF2 e NumPy não são importados com a aplicação"""
+        self.assertEqual(importacao.modulos_pesados_importados("main"), [])
+
+    def test_orcamento(self):
+        tempos = importacao.medir_importacao("main")
+        total = sum(tempos.values())
+        self.assertLess(total, importacao.ORCAMENTO_IMPORTACAO_MS, "\n" + importacao.relatorio(tempos))
+
+    def test_interpretar_importtime(self):
+        tempos = importacao.interpretar_importtime(SAIDA_IMPORTTIME, "main")
+        self.assertEqual(tempos, {"pydantic": 0.5, "app.services.calculos": 1.5, "app.routes.proposta": 0.5, "main": 1.0})
+        with self.assertRaises(ValueError):
+            importacao.interpretar_importtime(SAIDA_IMPORTTIME, "servidor")
+
+    def test_aquecer(self):
+        importacao.aquecer()
+        for modulo in importacao.MODULOS_PESADOS:
+            self.assertIn(modulo, sys.modules)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+"""
+Testes do índice de busca dos logs
+"""
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from app.services.indice_logs import IndiceLogs, ler_segmento, normalizar_horario
+
+PROPOSTA_JOAO = "bacca826-f1ad-4c10-a4a8-129df9bb0338"
+PROPOSTA_MARIA = "d70efb86-fbc7-43d4-aba3-72b37e4027d5"
+
+
+def requisicao(horario, nome, telefone, proposta_id):
+    """Linhas de log de uma requisição, no formato do arquivo de texto"""
+    corpo = json.dumps({"nome_cliente": nome, "telefone_cliente": "***99"}, ensure_ascii=False)
+    return (
+        f"{horario} | INFO     | RAW REQUEST BODY: {corpo}\n"
+        f"{horario} | INFO     | Requisição recebida - Cliente: {nome} | Tipo blindagem: Ultralight\n"
+        f"{horario} | INFO     | Dados para PDF:\n"
+        f"nome_cliente     : {nome}\n"
+        f"telefone_cliente : {telefone}\n"
+        f"{horario} | INFO     | Fazendo upload do PDF: proposta_{proposta_id}_20250504.pdf\n"
+    )
+
+
+class TestIndiceLogs(unittest.TestCase):
+    """Indexação e busca sobre um diretório de logs temporário"""
+
+    def setUp(self):
+        temporario = tempfile.TemporaryDirectory()
+        self.addCleanup(temporario.cleanup)
+        self.diretorio = Path(temporario.name)
+        self.log = self.diretorio / "app.log"
+        self.log.write_text(
+            "2025-05-03 12:25:56 | INFO | Iniciando Forsecar Backend API v1.0.0\n"
+            + requisicao("04/05/2025 20:48:13", "João Silva", "(11) 99999-9999", PROPOSTA_JOAO),
+            encoding="utf-8",
+        )
+        self.indice = IndiceLogs(self.diretorio / "indice.sqlite", self.diretorio)
+        self.addCleanup(self.indice.fechar)
+
+    def anexar(self, texto):
+        with open(self.log, "a", encoding="utf-8") as arquivo:
+            arquivo.write(texto)
+        # Garante mtime diferente mesmo em sistemas de arquivos com baixa resolução
+        estado = self.log.stat()
+        os.utime(self.log, ns=(estado.st_atime_ns, estado.st_mtime_ns + 1_000_000))
+
+    def test_busca_por_chaves(self):
+        """Cliente (sem acentos, sobrenome), final do telefone e início do id"""
+        self.indice.atualizar()
+        for filtros in ({"cliente": "joao silva"}, {"cliente": "SILVA"}, {"telefone": "99999-9999"},
+                        {"proposta_id": PROPOSTA_JOAO[:8]}):
+            segmentos = self.indice.buscar(**filtros)
+            self.assertEqual(len(segmentos), 1, filtros)
+            self.assertIn("Cliente: João Silva", ler_segmento(segmentos[0]))
+        self.assertEqual(self.indice.buscar(cliente="maria"), [])
+
+    def test_busca_por_horario(self):
+        """Intervalos em dd/mm/YYYY; o log antigo em YYYY-MM-DD também é datado"""
+        self.indice.atualizar()
+        self.assertEqual(len(self.indice.buscar(inicio="04/05/2025", fim="04/05/2025")), 1)
+        antigos = self.indice.buscar(fim="03/05/2025")
+        self.assertEqual([s.ts_inicio for s in antigos], ["2025-05-03 12:25:56"])
+        with self.assertRaises(ValueError):
+            self.indice.buscar(inicio="ontem")
+
+    def test_atualizacao_incremental(self):
+        """Apenas o último segmento (ainda aberto) e o trecho novo são relidos"""
+        self.indice.atualizar()
+        self.anexar(requisicao("05/05/2025 09:00:00", "Maria Souza", "21980407422", PROPOSTA_MARIA))
+        resumo = self.indice.atualizar()
+        self.assertEqual(resumo["atualizados"], 1)
+        self.assertEqual(resumo["segmentos"], 2)
+        self.assertEqual(len(self.indice.buscar(telefone="0407422")), 1)
+        self.assertEqual(len(self.indice.buscar(cliente="joao")), 1)
+        self.assertEqual(self.indice.atualizar()["atualizados"], 0)
+
+    def test_linha_incompleta_nao_indexada(self):
+        """Uma linha ainda sem quebra de linha fica para a próxima atualização"""
+        self.anexar("05/05/2025 09:00:00 | INFO     | RAW REQUEST BODY: {\"nome_cliente\": \"Maria")
+        self.indice.atualizar()
+        self.assertEqual(self.indice.buscar(cliente="maria"), [])
+        self.anexar(" Souza\"}\n")
+        self.indice.atualizar()
+        self.assertEqual(len(self.indice.buscar(cliente="maria souza")), 1)
+
+    def test_rotacao_com_compressao(self):
+        """O arquivo rotacionado e comprimido herda o índice; o novo app.log é indexado do início"""
+        self.indice.atualizar()
+        arquivado = self.diretorio / "app.2025-05-05_00-00-00_000000.log.gz"
+        with gzip.open(arquivado, "wb") as arquivo:
+            arquivo.write(self.log.read_bytes())
+        self.log.unlink()
+        self.log.write_text(requisicao("06/05/2025 10:00:00", "Maria Souza", "21980407422", PROPOSTA_MARIA),
+                            encoding="utf-8")
+
+        resumo = self.indice.atualizar()
+        self.assertEqual((resumo["rotacionados"], resumo["novos"], resumo["removidos"]), (1, 1, 0))
+        [joao] = self.indice.buscar(proposta_id=PROPOSTA_JOAO)
+        self.assertEqual(joao.arquivo, str(arquivado))
+        self.assertIn("João Silva", ler_segmento(joao))
+        [maria] = self.indice.buscar(cliente="maria")
+        self.assertEqual(maria.arquivo, str(self.log))
+
+        arquivado.unlink()
+        self.assertEqual(self.indice.atualizar()["removidos"], 1)
+        self.assertEqual(self.indice.buscar(proposta_id=PROPOSTA_JOAO), [])
+
+    def test_log_estruturado(self):
+        """No JSON, proposta_id e client vêm dos campos do registro"""
+        registros = [
+            {"timestamp": "2025-05-06T10:00:00.1-03:00", "level": "INFO", "message": "RAW REQUEST BODY: {}",
+             "proposta_id": PROPOSTA_MARIA, "stage": None, "duration_ms": None, "client": None},
+            {"timestamp": "2025-05-06T10:00:01.2-03:00", "level": "INFO", "message": "Dados para PDF:",
+             "proposta_id": PROPOSTA_MARIA, "stage": None, "duration_ms": None, "client": "Maria Souza",
+             "dados": {"telefone_cliente": "(21) 98040-7422"}},
+            {"timestamp": "2025-05-06T11:00:00.0-03:00", "level": "INFO", "message": "Encerrando aplicação",
+             "proposta_id": None, "stage": None, "duration_ms": None, "client": None},
+        ]
+        (self.diretorio / "app.jsonl").write_text("".join(json.dumps(r) + "\n" for r in registros))
+        self.indice.atualizar()
+        [segmento] = self.indice.buscar(proposta_id=PROPOSTA_MARIA, telefone="7422")
+        self.assertEqual((segmento.ts_inicio, segmento.ts_fim), ("2025-05-06 10:00:00", "2025-05-06 10:00:01"))
+        self.assertEqual(len(ler_segmento(segmento).splitlines()), 2)
+
+
+class TestNormalizarHorario(unittest.TestCase):
+    """Conversão dos horários informados na busca"""
+
+    def test_formatos(self):
+        self.assertEqual(normalizar_horario("04/05/2025"), "2025-05-04 00:00:00")
+        self.assertEqual(normalizar_horario("04/05/2025", fim=True), "2025-05-04 23:59:59")
+        self.assertEqual(normalizar_horario("04/05/2025 20:48"), "2025-05-04 20:48:00")
+        self.assertEqual(normalizar_horario("2025-05-04T20:48:13"), "2025-05-04 20:48:13")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,270 @@
+"""
+Testes da fila de escrita de logs
+"""
+import gzip
+import json
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from app.services import logger_service
+from app.services.logger_service import FilaLog
+
+
+class ArquivoBloqueavel:
+    """Sink de teste que guarda as linhas gravadas e pode segurar a thread de escrita"""
+
+    def __init__(self):
+        self.linhas = []
+        self.liberado = threading.Event()
+        self.liberado.set()
+        self.entrou = threading.Event()
+
+    def __call__(self, mensagem):
+        self.entrou.set()
+        self.liberado.wait(5)
+        self.linhas.extend(mensagem.splitlines())
+
+    @property
+    def registros(self):
+        """(nível, mensagem) de cada linha no formato do arquivo de log"""
+        return [tuple(parte.strip() for parte in linha.split(" | ", 2)[1:]) for linha in self.linhas]
+
+
+class TestFilaLog(unittest.TestCase):
+    """Testes da FilaLog com logger e sinks independentes"""
+
+    def setUp(self):
+        self.sink = ArquivoBloqueavel()
+        self.arquivo = logger_service.novo_logger()
+        self.arquivo.add(self.sink, format="{message}")
+        self.origem = logger_service.novo_logger()
+
+    def criar_fila(self, **opcoes):
+        fila = FilaLog(None, self.arquivo, **opcoes)
+        self.origem.add(fila, format="{message}", catch=False)
+        self.addCleanup(fila.encerrar, 1)
+        return fila
+
+    def segurar_escrita(self):
+        """Prende a thread de escrita no primeiro registro"""
+        self.sink.liberado.clear()
+        self.origem.info("primeiro")
+        self.assertTrue(self.sink.entrou.wait(5))
+
+    def test_grava_em_ordem_no_formato_do_arquivo(self):
+        """Os registros chegam ao arquivo na ordem, com horário no padrão brasileiro"""
+        fila = self.criar_fila()
+        for i in range(50):
+            self.origem.info(f"mensagem {i} {{chaves}} <tag>")
+        self.origem.warning("aviso")
+        fila.aguardar()
+        esperado = [("INFO", f"mensagem {i} {{chaves}} <tag>") for i in range(50)] + [("WARNING", "aviso")]
+        self.assertEqual(self.sink.registros, esperado)
+        self.assertRegex(self.sink.linhas[0], r"^\d{2}/\d{2}/\d{4} \d{2}:\d{2}:\d{2} \| INFO     \| ")
+
+    def test_console_com_cores(self):
+        """O console recebe as linhas coloridas e sem interpretar a mensagem"""
+        linhas = []
+        console = logger_service.novo_logger()
+        console.add(lambda m: linhas.append(str(m)), format="{message}", colorize=False)
+        fila = FilaLog(console, None)
+        self.origem.add(fila, format="{message}")
+        self.origem.error("falhou <red>")
+        fila.encerrar(1)
+        self.assertTrue(linhas[0].endswith("| ERROR    | falhou <red>\n"))
+
+    def test_politica_descartar(self):
+        """Com a fila cheia, INFO é descartado e WARNING aguarda vaga"""
+        fila = self.criar_fila(tamanho=2, politica="descartar")
+        self.segurar_escrita()
+        for i in range(4):
+            self.origem.info(f"info {i}")
+        self.assertEqual(fila.descartados, 2)
+
+        threading.Timer(0.2, self.sink.liberado.set).start()
+        self.origem.warning("aviso")
+        fila.aguardar()
+        self.assertEqual(self.sink.registros[-1], ("WARNING", "aviso"))
+        self.assertEqual(len(self.sink.registros), 4)
+
+    def test_politica_amostrar(self):
+        """Com a fila cheia, apenas 1 de cada N registros descartáveis é mantido"""
+        fila = self.criar_fila(tamanho=2, politica="amostrar", amostra=3)
+        self.segurar_escrita()
+        self.origem.info("a")
+        self.origem.info("b")
+        threading.Timer(0.2, self.sink.liberado.set).start()
+        for i in range(3):
+            self.origem.info(f"amostra {i}")
+        fila.aguardar()
+        self.assertEqual(fila.descartados, 2)
+        self.assertIn(("INFO", "amostra 2"), self.sink.registros)
+
+    def test_politica_bloquear(self):
+        """Com a política de bloqueio nenhum registro é perdido"""
+        fila = self.criar_fila(tamanho=1, politica="bloquear")
+        self.segurar_escrita()
+        threading.Timer(0.2, self.sink.liberado.set).start()
+        inicio = time.monotonic()
+        for i in range(5):
+            self.origem.info(f"info {i}")
+        self.assertGreaterEqual(time.monotonic() - inicio, 0.1)
+        fila.aguardar()
+        self.assertEqual(fila.descartados, 0)
+        self.assertEqual(len(self.sink.registros), 6)
+
+    def test_encerrar_grava_pendentes(self):
+        """O encerramento grava a fila inteira e informa os descartes"""
+        fila = self.criar_fila(tamanho=1, politica="descartar")
+        self.segurar_escrita()
+        self.origem.info("na fila")
+        self.origem.info("descartado")
+        self.sink.liberado.set()
+        self.assertTrue(fila.encerrar(1))
+        registros = self.sink.registros
+        self.assertEqual(registros[:2], [("INFO", "primeiro"), ("INFO", "na fila")])
+        self.assertEqual(registros[-1], ("WARNING", "1 registros de log descartados com a fila cheia"))
+
+    def test_politica_invalida(self):
+        """Políticas desconhecidas são rejeitadas"""
+        with self.assertRaises(ValueError):
+            FilaLog(None, self.arquivo, politica="ignorar")
+
+
+class TestLogEstruturado(unittest.TestCase):
+    """Testes do log estruturado (JSON) e da formatação sob demanda"""
+
+    def setUp(self):
+        self.linhas_json = []
+        estruturado = logger_service.novo_logger()
+        estruturado.add(lambda m: self.linhas_json.extend(m.splitlines()), format="{message}")
+        self.fila = FilaLog(None, None, estruturado)
+        # Logger da aplicação substituído por um que só grava o JSON
+        patch = mock.patch.object(logger_service, "logger", logger_service.novo_logger())
+        patch.start()
+        self.addCleanup(patch.stop)
+        logger_service.logger.add(self.fila, format="{message}")
+
+    def tearDown(self):
+        self.fila.encerrar(1)
+
+    def registros(self):
+        self.fila.aguardar()
+        return [json.loads(linha) for linha in self.linhas_json]
+
+    def test_esquema_fixo(self):
+        """Toda linha tem os campos do esquema, preenchidos pelo contexto"""
+        logger_service.logger.info("fora do contexto")
+        with logger_service.contexto_log(proposta_id="abc", client="Maria"):
+            with logger_service.etapa("calcular"):
+                logger_service.log_info("dentro da etapa")
+
+        fora, dentro, etapa = self.registros()[-3:]
+        for registro in (fora, dentro, etapa):
+            self.assertTrue(set(logger_service.CAMPOS_ESTRUTURADOS) <= set(registro))
+        self.assertIsNone(fora["proposta_id"])
+        self.assertEqual((dentro["proposta_id"], dentro["client"], dentro["stage"]), ("abc", "Maria", "calcular"))
+        self.assertIsNone(dentro["duration_ms"])
+        self.assertEqual(etapa["stage"], "calcular")
+        self.assertGreaterEqual(etapa["duration_ms"], 0)
+
+    def test_etapa_com_erro(self):
+        """Uma etapa interrompida registra a falha com a duração"""
+        with self.assertRaises(ValueError):
+            with logger_service.etapa("upload"):
+                raise ValueError("falhou")
+        registro = self.registros()[-1]
+        self.assertEqual((registro["level"], registro["stage"]), ("WARNING", "upload"))
+
+    def test_tabela_sem_sink_de_texto_nao_formata(self):
+        """Sem log de texto, format_dict_table não é executado e os dados vão como JSON"""
+        with mock.patch.object(logger_service, "format_dict_table") as formatar:
+            logger_service.log_tabela("Dados para PDF:", {"nome_cliente": "Maria", "desconto": 1000.0})
+            registro = self.registros()[-1]
+        formatar.assert_not_called()
+        self.assertEqual(registro["message"], "Dados para PDF:")
+        self.assertEqual(registro["dados"], {"nome_cliente": "Maria", "desconto": 1000.0})
+
+    def test_tabela_em_sink_de_texto(self):
+        """No log de texto a tabela é montada na gravação"""
+        linhas = []
+        arquivo = logger_service.novo_logger()
+        arquivo.add(lambda m: linhas.append(str(m)), format="{message}")
+        fila = FilaLog(None, arquivo)
+        origem = logger_service.novo_logger()
+        origem.add(fila, format="{message}")
+        origem.bind(dados={"nome_cliente": "Maria"}).info("Dados para PDF:")
+        fila.encerrar(1)
+        self.assertTrue(linhas[0].endswith("| INFO     | Dados para PDF:\nnome_cliente : Maria\n"))
+
+
+CORPO = json.dumps({
+    "nome_cliente": "João Silva",
+    "telefone_cliente": "(11) 99999-9999",
+    "email_cliente": "joao@exemplo.com",
+    "observations": "x" * 100,
+}, ensure_ascii=False).encode()
+
+
+@mock.patch.object(logger_service, "logger")
+class TestCorpoBruto(unittest.TestCase):
+    """Testes do registro do corpo bruto da requisição"""
+
+    def mensagem(self, logger):
+        return logger.info.call_args[0][0]
+
+    def test_campos_sensiveis_mascarados(self, logger):
+        """Telefone e e-mail não aparecem em texto puro"""
+        logger_service.log_raw_request_body(CORPO)
+        mensagem = self.mensagem(logger)
+        self.assertNotIn("99999-9999", mensagem)
+        self.assertNotIn("joao@", mensagem)
+        self.assertIn('"telefone_cliente": "***99"', mensagem)
+        self.assertIn('"email_cliente": "j***@exemplo.com"', mensagem)
+        self.assertIn("João Silva", mensagem)
+
+    def test_telefone_numerico_mascarado(self, logger):
+        """Campos sensíveis enviados como número também são mascarados"""
+        logger_service.log_raw_request_body(b'{"nome_cliente": "Ana", "telefone_cliente": 11987654321, "x": 1}')
+        mensagem = self.mensagem(logger)
+        self.assertNotIn("11987654321", mensagem)
+        self.assertIn('"telefone_cliente": "***21", "x": 1', mensagem)
+
+    def test_limite_de_bytes(self, logger):
+        """Corpos maiores que o limite são truncados"""
+        with mock.patch.object(logger_service, "CORPO_BRUTO_MAX_BYTES", 50):
+            logger_service.log_raw_request_body(CORPO)
+        mensagem = self.mensagem(logger)
+        self.assertTrue(mensagem.endswith(f"... [truncado: {len(logger_service.mascarar_corpo(CORPO))} bytes]"))
+        self.assertLess(len(mensagem), 120)
+
+    def test_amostragem_por_rota(self, logger):
+        """Rotas com taxa zero não registram; as demais seguem a taxa configurada"""
+        taxas = {"/silenciosa": 0.0, "/metade": 0.5}
+        with mock.patch.object(logger_service, "CORPO_BRUTO_AMOSTRAGEM", taxas):
+            logger_service.log_raw_request_body(CORPO, rota="/silenciosa")
+            logger.info.assert_not_called()
+
+            with mock.patch.object(logger_service.random, "random", side_effect=[0.7, 0.2]):
+                logger_service.log_raw_request_body(CORPO, rota="/metade")
+                logger_service.log_raw_request_body(CORPO, rota="/metade")
+            self.assertEqual(logger.info.call_count, 1)
+
+    def test_arquivo_de_depuracao(self, logger):
+        """Com a depuração ativa, o corpo completo mascarado é gravado comprimido"""
+        with tempfile.TemporaryDirectory() as diretorio, \
+                mock.patch.object(logger_service, "CORPO_BRUTO_DEBUG", True), \
+                mock.patch.object(logger_service, "CORPO_BRUTO_DIR", logger_service.Path(diretorio)), \
+                mock.patch.object(logger_service, "CORPO_BRUTO_MAX_BYTES", 10):
+            logger_service.log_raw_request_body(CORPO, proposta_id="abc")
+            with gzip.open(f"{diretorio}/abc.json.gz") as arquivo:
+                gravado = json.loads(arquivo.read())
+        self.assertEqual(gravado["observations"], "x" * 100)
+        self.assertEqual(gravado["telefone_cliente"], "***99")
+
+
+if __name__ == "__main__":
+    unittest.main()
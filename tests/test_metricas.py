@@ -0,0 +1,67 @@
+"""
+Testes das métricas no formato do Prometheus
+"""
+import unittest
+
+from fastapi.testclient import TestClient
+
+from main import app
+from app.services import metricas
+from app.services.metricas import Contador, Histograma, Medidor
+
+
+class TestMetricas(unittest.TestCase):
+    """Exportação de contadores, medidores e histogramas"""
+
+    def test_contador(self):
+        contador = Contador("teste_total", "Contador de teste", ("tipo",))
+        contador.inc(tipo="a")
+        contador.inc(2, tipo='com "aspas"')
+        self.assertEqual(contador.exportar().splitlines(), [
+            "# HELP teste_total Contador de teste",
+            "# TYPE teste_total counter",
+            'teste_total{tipo="a"} 1',
+            'teste_total{tipo="com \\"aspas\\""} 2',
+        ])
+
+    def test_rotulos_obrigatorios(self):
+        with self.assertRaises(ValueError):
+            Contador("teste_total", "Contador de teste", ("tipo",)).inc()
+
+    def test_medidor_em_andamento(self):
+        medidor = Medidor("teste_em_andamento", "Medidor de teste")
+        self.assertIn("teste_em_andamento 0", medidor.exportar())
+        with medidor.em_andamento():
+            self.assertIn("teste_em_andamento 1", medidor.exportar())
+        self.assertIn("teste_em_andamento 0", medidor.exportar())
+
+    def test_histograma_cumulativo(self):
+        histograma = Histograma("teste_segundos", "Histograma de teste", ("etapa",), limites=(0.1, 1))
+        for valor in (0.05, 0.1, 0.5, 3):
+            histograma.observar(valor, etapa="upload")
+        linhas = histograma.exportar().splitlines()[2:]
+        self.assertEqual(linhas, [
+            'teste_segundos_bucket{etapa="upload",le="0.1"} 2',
+            'teste_segundos_bucket{etapa="upload",le="1"} 3',
+            'teste_segundos_bucket{etapa="upload",le="+Inf"} 4',
+            'teste_segundos_sum{etapa="upload"} 3.65',
+            'teste_segundos_count{etapa="upload"} 4',
+        ])
+
+
+class TestEndpointMetricas(unittest.TestCase):
+    """Endpoint /metrics"""
+
+    def test_formato_prometheus(self):
+        resposta = TestClient(app).get("/metrics")
+        self.assertEqual(resposta.status_code, 200)
+        self.assertTrue(resposta.headers["content-type"].startswith("text/plain; version=0.0.4"))
+        for nome in ("forsecar_propostas_em_andamento", "forsecar_requisicoes_em_andamento"):
+            self.assertIn(f"# TYPE {nome} gauge", resposta.text)
+        # A própria consulta a /metrics está em andamento
+        self.assertIn("forsecar_requisicoes_em_andamento 1", resposta.text)
+        self.assertEqual(metricas.exportar().count("# TYPE"), len(metricas.REGISTRO.metricas))
+
+
+if __name__ == "__main__":
+    unittest.main()
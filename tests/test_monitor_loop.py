@@ -0,0 +1,62 @@
+"""
+Testes do monitor do event loop
+"""
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+from app.services import monitor_loop
+from app.services.monitor_loop import MonitorLoop
+
+
+def chamada_bloqueante():
+    time.sleep(0.3)
+
+
+@mock.patch("app.services.logger_service.logger")
+class TestMonitorLoop(unittest.TestCase):
+    """Medição do atraso e captura da pilha dos bloqueios"""
+
+    def executar(self, corpo):
+        monitor = MonitorLoop(intervalo=0.01, limite=0.1)
+
+        async def principal():
+            monitor.iniciar()
+            await asyncio.sleep(0.05)
+            await asyncio.create_task(corpo(), name="requisicao-lenta")
+            await asyncio.sleep(0.05)
+            await monitor.parar()
+
+        asyncio.run(principal())
+        return monitor
+
+    def test_bloqueio_capturado(self, logger):
+        """A pilha aponta a chamada bloqueante e a tarefa que a fez"""
+        bloqueios = monitor_loop.BLOQUEIOS_LOOP.valor()
+        atrasos = monitor_loop.ATRASO_LOOP.contagem()
+
+        async def handler():
+            chamada_bloqueante()
+
+        monitor = self.executar(handler)
+        [bloqueio] = monitor.bloqueios
+        self.assertIn("chamada_bloqueante", bloqueio.pilha)
+        self.assertIn("requisicao-lenta", bloqueio.tarefa)
+        self.assertGreaterEqual(bloqueio.duracao, 0.1)
+        self.assertEqual(monitor_loop.BLOQUEIOS_LOOP.valor(), bloqueios + 1)
+        self.assertGreater(monitor_loop.ATRASO_LOOP.contagem(), atrasos)
+        self.assertIn("Event loop bloqueado", logger.warning.call_args[0][0])
+
+    def test_sem_bloqueio(self, logger):
+        """Código que só aguarda não gera capturas"""
+        async def handler():
+            for _ in range(10):
+                await asyncio.sleep(0.01)
+
+        self.assertEqual(list(self.executar(handler).bloqueios), [])
+        logger.warning.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -187,5 +187,40 @@ class TestPDFFill(unittest.TestCase):
             self.fail(f"Erro ao ler campos do formulário PDF: {str(e)}")
 
 
+
+class TestPDFFillSintetico(unittest.TestCase):
+    """Preenchimento do template sintético, com todos os campos dos mapas"""
+
+    @classmethod
+    def setUpClass(cls):
+        from benchmarks.template_sintetico import gerar_template
+
+        cls.diretorio = tempfile.TemporaryDirectory()
+        cls.template_path = str(gerar_template(os.path.join(cls.diretorio.name, "template.pdf"), tamanho=0))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.diretorio.cleanup()
+
+    def test_todos_os_campos_preenchidos(self):
+        from benchmarks.template_sintetico import nomes_campos
+
+        self.assertEqual(set(PdfReader(self.template_path).get_fields()), set(nomes_campos()))
+        for form_map in (FORM_MAP_WITH_DESCONTO, FORM_MAP_SEM_DESCONTO):
+            form_data = {campo: f"valor {indice}" for indice, campo in
+                         enumerate({**form_map, **PAYMENT_CONDITIONS_MAP}.values())}
+            output_path = os.path.join(self.diretorio.name, "preenchido.pdf")
+            fill_pdf_form(self.template_path, output_path, form_data)
+
+            preenchidos = {}
+            for page in PdfReader(output_path).pages:
+                for annot in page.get("/Annots", []):
+                    annot = annot.get_object()
+                    preenchidos[annot["/T"]] = annot.get("/V")
+            for campo, valor in form_data.items():
+                self.assertEqual(preenchidos[campo], valor, campo)
+
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,118 @@
+"""
+Testes para as regras dos planos de pagamento
+"""
+import json
+import os
+import tempfile
+import unittest
+from dataclasses import FrozenInstanceError
+from unittest import mock
+
+from app.config import PLANOS_PAGAMENTO_FILE
+from app.services import calculos
+from app.services.planos_pagamento import (
+    _RegistroPlano,
+    carregar_plano,
+    compilar_plano,
+    obter_plano,
+)
+
+
+class TestCompilacaoPlano(unittest.TestCase):
+    """Testes da compilação da tabela de regras"""
+
+    def setUp(self):
+        with open(PLANOS_PAGAMENTO_FILE, encoding="utf-8") as f:
+            self.tabela = json.load(f)
+
+    def test_tabela_padrao(self):
+        """A tabela padrão contém as regras atuais de pagamento"""
+        plano = carregar_plano()
+        self.assertEqual(plano.desconto_a_vista, 2)
+        self.assertEqual([r.chave for r in plano.parcelado_direto], ["duas_vezes", "tres_vezes", "quatro_vezes"])
+        self.assertEqual([(r.parcelas, r.acrescimo_percentual) for r in plano.cartao],
+                         [(4, 6), (5, 7), (6, 8), (7, 9), (8, 10), (9, 11), (10, 12)])
+
+    def test_plano_imutavel(self):
+        """O plano compilado não pode ser alterado"""
+        plano = compilar_plano(self.tabela, "teste")
+        with self.assertRaises(FrozenInstanceError):
+            plano.desconto_a_vista = 5
+        self.assertIsInstance(plano.cartao, tuple)
+
+    def test_tabela_invalida(self):
+        """Regras inválidas são rejeitadas na compilação"""
+        self.tabela["parcelado_direto"][1]["entrada_percentual"] = 100
+        with self.assertRaises(ValueError):
+            compilar_plano(self.tabela, "teste")
+        del self.tabela["cartao"]
+        with self.assertRaises(ValueError):
+            compilar_plano(self.tabela, "teste")
+
+    @mock.patch("app.services.logger_service.logger")
+    def test_recarrega_quando_tabela_muda(self, _logger):
+        """O registro recarrega o plano quando o arquivo é alterado"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = os.path.join(diretorio, "planos.json")
+            with open(caminho, "w", encoding="utf-8") as f:
+                json.dump(self.tabela, f)
+            registro = _RegistroPlano(caminho, intervalo=0)
+            plano_original = registro.obter()
+            self.assertIs(registro.obter(), plano_original)
+
+            self.tabela["a_vista"]["desconto_percentual"] = 5
+            with open(caminho, "w", encoding="utf-8") as f:
+                json.dump(self.tabela, f)
+            os.utime(caminho, ns=(0, os.stat(caminho).st_mtime_ns + 1))
+            plano_novo = registro.obter()
+            self.assertEqual(plano_novo.desconto_a_vista, 5)
+            self.assertNotEqual(plano_novo.versao, plano_original.versao)
+
+            # Uma tabela inválida mantém o plano anterior
+            with open(caminho, "w", encoding="utf-8") as f:
+                f.write("{")
+            os.utime(caminho, ns=(0, os.stat(caminho).st_mtime_ns + 2))
+            self.assertIs(registro.obter(), plano_novo)
+
+
+class TestCacheCondicoes(unittest.TestCase):
+    """Testes da memoização dos resultados"""
+
+    def test_cotacoes_repetidas_usam_cache(self):
+        """O mesmo valor base com o mesmo plano é calculado uma única vez"""
+        calculos._condicoes_em_centavos.cache_clear()
+        calculos.calcular_condicoes_pagamento({"valor_base": 51234.56})
+        calculos.calcular_condicoes_pagamento({"valor_base": 51234.56})
+        info = calculos._condicoes_em_centavos.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 1))
+
+    def test_resultados_imutaveis(self):
+        """O resultado compartilhado pelo cache não pode ser alterado"""
+        primeiro = calculos.calcular_condicoes_pagamento({"valor_base": 1000})
+        with self.assertRaises(FrozenInstanceError):
+            primeiro.a_vista.valor_total = -1
+        segundo = calculos.calcular_condicoes_pagamento({"valor_base": 1000})
+        self.assertIs(segundo, primeiro)
+        self.assertEqual(segundo.para_dict()["a_vista"]["valor_total"], 980.0)
+
+    def test_resultados_compactos(self):
+        """As opções usam __slots__, sem dicionário por instância"""
+        quadro = calculos.calcular_condicoes_pagamento({"valor_base": 1000})
+        self.assertFalse(hasattr(quadro, "__dict__"))
+        self.assertFalse(hasattr(quadro.a_vista, "__dict__"))
+
+    def test_valor_base_zero(self):
+        """Sem valor base, todas as opções existem com valores zerados"""
+        conds = calculos.calcular_condicoes_pagamento({"valor_base": 0}).para_dict()
+        self.assertEqual(conds["a_vista"]["valor_total"], 0)
+        self.assertEqual([p["valor"] for p in conds["quatro_vezes"]["parcelas"]], [0, 0, 0, 0])
+        self.assertEqual(list(conds["cartao"]), [f"{n}x" for n in range(4, 11)])
+        self.assertEqual(conds["cartao"]["10x"]["acrescimo"], 12)
+
+    def test_plano_vigente(self):
+        """O plano vigente corresponde à tabela de configuração"""
+        self.assertEqual(obter_plano().versao, carregar_plano().versao)
+
+
+if __name__ == "__main__":
+    unittest.main()
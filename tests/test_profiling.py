@@ -0,0 +1,94 @@
+"""
+Testes do profiling sob demanda
+"""
+import pstats
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.services.contexto_requisicao import MiddlewareContexto
+from app.services.profiling import MiddlewareProfiling, assinar
+
+SEGREDO = "segredo-de-teste"
+
+
+def trabalho_lento():
+    """Ocupa a CPU por ~50 ms"""
+    fim = time.perf_counter() + 0.05
+    while time.perf_counter() < fim:
+        pass
+
+
+@mock.patch("app.services.logger_service.logger")
+class TestMiddlewareProfiling(unittest.TestCase):
+    """Autorização, limite e arquivos gravados"""
+
+    def criar_cliente(self, **opcoes):
+        temporario = tempfile.TemporaryDirectory()
+        self.addCleanup(temporario.cleanup)
+        self.diretorio = Path(temporario.name)
+
+        app = FastAPI()
+
+        @app.get("/lento")
+        async def lento():
+            trabalho_lento()
+            return {"ok": True}
+
+        opcoes.setdefault("segredo", SEGREDO)
+        app.add_middleware(MiddlewareProfiling, diretorio=self.diretorio, **opcoes)
+        app.add_middleware(MiddlewareContexto)
+        return TestClient(app)
+
+    def perfilar(self, cliente, request_id, modo="amostragem", assinatura=None):
+        return cliente.get("/lento", headers={
+            "X-Request-ID": request_id,
+            "X-Profile": modo,
+            "X-Profile-Assinatura": assinatura or assinar(request_id, SEGREDO),
+        })
+
+    def test_sem_cabecalho_nao_perfila(self, _):
+        resposta = self.criar_cliente(intervalo_minimo=0).get("/lento")
+        self.assertNotIn("X-Profile", resposta.headers)
+        self.assertEqual(list(self.diretorio.iterdir()), [])
+
+    def test_assinatura_invalida(self, _):
+        resposta = self.perfilar(self.criar_cliente(intervalo_minimo=0), "req-1", assinatura="0" * 64)
+        self.assertNotIn("X-Profile", resposta.headers)
+        self.assertEqual(list(self.diretorio.iterdir()), [])
+
+    def test_amostragem_formato_folded(self, _):
+        resposta = self.perfilar(self.criar_cliente(intervalo_minimo=0), "req-1")
+        self.assertEqual(resposta.headers["X-Profile"], "req-1.folded")
+        linhas = (self.diretorio / "req-1.folded").read_text().splitlines()
+        self.assertTrue(linhas)
+        for linha in linhas:
+            pilha, quantidade = linha.rsplit(" ", 1)
+            self.assertGreater(int(quantidade), 0)
+        self.assertTrue(any("trabalho_lento" in linha for linha in linhas))
+
+    def test_deterministico_pstats(self, _):
+        resposta = self.perfilar(self.criar_cliente(intervalo_minimo=0), "req-2", modo="deterministico")
+        self.assertEqual(resposta.headers["X-Profile"], "req-2.prof")
+        estatisticas = pstats.Stats(str(self.diretorio / "req-2.prof"))
+        self.assertTrue(any(funcao[2] == "trabalho_lento" for funcao in estatisticas.stats))
+
+    def test_limite_global(self, _):
+        cliente = self.criar_cliente(intervalo_minimo=60)
+        self.assertEqual(self.perfilar(cliente, "req-1").headers["X-Profile"], "req-1.folded")
+        self.assertEqual(self.perfilar(cliente, "req-2").headers["X-Profile"], "limitado")
+        self.assertFalse((self.diretorio / "req-2.folded").exists())
+
+    def test_flag_admin_dispensa_assinatura(self, _):
+        cliente = self.criar_cliente(segredo="", admin=True, intervalo_minimo=0)
+        resposta = cliente.get("/lento", headers={"X-Request-ID": "req-3"})
+        self.assertEqual(resposta.headers["X-Profile"], "req-3.folded")
+
+
+if __name__ == "__main__":
+    unittest.main()
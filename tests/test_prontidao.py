@@ -0,0 +1,96 @@
+"""
+Testes do endpoint de prontidão (/ready)
+"""
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import httpx
+from fastapi.testclient import TestClient
+
+from main import app
+from app.services import metricas, pdf_service
+from app.services.rastreamento_http import TransporteRastreado
+
+
+def _template(url: str) -> pdf_service.TemplateCarregado:
+    return pdf_service.TemplateCarregado(url, b"%PDF-1.4", "abc123def456", time.monotonic())
+
+
+class TestReady(unittest.TestCase):
+    """Prontidão e estado informado por /ready"""
+
+    def setUp(self):
+        self.templates = mock.patch.dict(pdf_service._templates, {
+            url: _template(url) for url in (pdf_service.PDF_COM_DESCONTO_URL, pdf_service.PDF_SEM_DESCONTO_URL)
+        }, clear=True)
+        self.templates.start()
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        self.templates.stop()
+
+    def test_pronta(self):
+        resposta = self.client.get("/ready")
+        self.assertEqual(resposta.status_code, 200)
+        estado = resposta.json()
+        self.assertEqual((estado["status"], estado["motivos"]), ("ready", []))
+        self.assertEqual(estado["templates"]["com_desconto"]["versao"], "abc123def456")
+        self.assertFalse(estado["templates"]["sem_desconto"]["expirado"])
+        self.assertIsNotNone(estado["planos_pagamento"]["versao"])
+        self.assertEqual(estado["em_andamento"]["requisicoes"], 1)
+        self.assertIn("spans", estado["filas"])
+
+    def test_template_nao_carregado(self):
+        del pdf_service._templates[pdf_service.PDF_SEM_DESCONTO_URL]
+        resposta = self.client.get("/ready")
+        self.assertEqual(resposta.status_code, 503)
+        self.assertEqual(resposta.json()["motivos"], ["template sem_desconto não carregado"])
+
+    def test_planos_indisponiveis(self):
+        with mock.patch("app.services.planos_pagamento.obter_plano", side_effect=OSError("sem arquivo")):
+            resposta = self.client.get("/ready")
+        self.assertEqual(resposta.status_code, 503)
+        self.assertEqual(resposta.json()["motivos"], ["planos de pagamento indisponíveis (OSError)"])
+
+    def test_fila_cheia(self):
+        fila = {"pendentes": 95, "capacidade": 100, "descartados": 3}
+        with mock.patch("app.services.logger_service.estado_log", return_value=fila):
+            resposta = self.client.get("/ready")
+        self.assertEqual(resposta.status_code, 503)
+        self.assertEqual(resposta.json()["filas"]["log"], fila)
+        self.assertEqual(resposta.json()["motivos"], ["fila de log cheia"])
+
+    def test_loop_saturado(self):
+        monitor = SimpleNamespace(ultimo_atraso=0.5, limite=0.2, bloqueios=[object()])
+        with mock.patch.object(app.state, "monitor_loop", monitor, create=True):
+            resposta = self.client.get("/ready")
+        self.assertEqual(resposta.status_code, 503)
+        self.assertEqual(resposta.json()["loop"], {"atraso_ms": 500.0, "bloqueios": 1})
+        self.assertEqual(resposta.json()["motivos"], ["event loop saturado"])
+
+
+class TestChamadasExternas(unittest.TestCase):
+    """Medidor de chamadas externas aguardando resposta"""
+
+    def test_em_andamento(self):
+        durante = []
+
+        def responder(request):
+            durante.append(metricas.CHAMADAS_EXTERNAS_EM_ANDAMENTO.valor())
+            return httpx.Response(200)
+
+        async def chamar():
+            async with httpx.AsyncClient(transport=TransporteRastreado(httpx.MockTransport(responder))) as client:
+                await client.get("http://externo/")
+
+        antes = metricas.CHAMADAS_EXTERNAS_EM_ANDAMENTO.valor()
+        asyncio.run(chamar())
+        self.assertEqual(durante, [antes + 1])
+        self.assertEqual(metricas.CHAMADAS_EXTERNAS_EM_ANDAMENTO.valor(), antes)
+
+
+if __name__ == "__main__":
+    unittest.main()
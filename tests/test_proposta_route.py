@@ -0,0 +1,290 @@
+"""
+Testes da rota de geração de propostas
+
+As chamadas externas (download do template, preenchimento do PDF, upload e
+envio por WhatsApp) são substituídas por funções locais.
+"""
+import json
+import re
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from main import app
+from app.schemas.proposta_schema import PROPOSTA_ADAPTER, PropostaNenhuma, PropostaResponse
+from app.services import calculos, metricas
+
+PAYLOAD_BASE = {
+    "nome_cliente": "João Silva",
+    "telefone_cliente": "(11) 99999-9999",
+    "email_cliente": "joao@exemplo.com",
+    "marca_veiculo": "Toyota",
+    "modelo_veiculo": "Corolla",
+    "teto_solar": "PANORAMICO XL",
+    "abertura_porta_malas": "manual",
+    "tipo_documentacao": "CNH",
+    "possui_documentacao": True,
+    "desconto_aplicado": 0,
+    "vidro_10_anos": "ARGUS",
+    "vidro_5_anos": "",
+    "pacote_revisao": "5 ANOS",
+}
+
+PAYLOAD_COMFORT10 = dict(
+    PAYLOAD_BASE,
+    tipo_blindagem="Comfort 10 anos",
+    comfort10YearsSubTotal=45000,
+    comfort10YearsDiscount=2000,
+)
+
+PAYLOAD_NENHUMA = dict(
+    PAYLOAD_BASE,
+    tipo_blindagem="Nenhuma",
+    desconto_aplicado=1000,
+    comfort10YearsSubTotal=45000,
+    comfort18mmSubTotal=52000,
+    ultralightSubTotal=61000,
+)
+
+# Corpo enviado pelo front-end (registrado em logs/app.log): as opções do
+# veículo chegam como texto
+CORPO_FRONT_END = (
+    '{"nome_cliente":"Backend Rod","telefone_cliente":"21777777777","email_cliente":"rodrigo@beckend.com.br",'
+    '"nome_vendedor":"Jo\u00e3o Pereira","marca_veiculo":"Hyundai","modelo_veiculo":"Creta",'
+    '"teto_solar":"PANORAMICO XL","abertura_porta_malas":"ELETRICA",'
+    '"tipo_documentacao":"AUTORIZACAO, DECLARACAO, INMETRO E DETRAN","pacote_revisao":"5 ANOS",'
+    '"vidro_10_anos":"ARGUS","vidro_5_anos":"",'
+    '"comfort10YearsSubTotal":97880.1,"comfort18mmSubTotal":116380.1,"ultralightSubTotal":128380.1,'
+    '"tipo_blindagem":"Comfort 10 anos","desconto_aplicado":119.9}'
+)
+
+
+def _preencher_pdf(template_path, output_path, form_data):
+    """Substituto de fill_pdf_form que apenas grava um arquivo"""
+    with open(output_path, "wb") as f:
+        f.write(b"%PDF-1.4")
+
+
+class RotaPropostaTestCase(unittest.TestCase):
+    """Base dos testes da rota com serviços externos substituídos"""
+
+    def setUp(self):
+        async def selecionar_template(desconto):
+            return ("http://template", "com_desconto" if desconto > 0 else "sem_desconto")
+
+        async def baixar_template(url):
+            return b"%PDF-1.4 template"
+
+        async def upload_pdf(pdf_bytes, nome_arquivo):
+            return f"http://pdf/{nome_arquivo}"
+
+        async def enviar_whatsapp(telefone, url_pdf, mensagem):
+            return {"status": "success"}
+
+        self.fill_pdf_form = mock.Mock(side_effect=_preencher_pdf)
+        self.patches = [
+            mock.patch("app.services.pdf_service.selecionar_template", selecionar_template),
+            mock.patch("app.services.pdf_service.baixar_template", baixar_template),
+            mock.patch.dict("app.services.pdf_service._templates", clear=True),
+            mock.patch("app.services.pdf_service.upload_pdf_para_supabase", upload_pdf),
+            mock.patch("app.services.pdf_service.fill_pdf_form", self.fill_pdf_form),
+            mock.patch("app.services.whatsapp_service.enviar_pdf_whatsapp", enviar_whatsapp),
+            mock.patch("app.services.logger_service.logger"),
+        ]
+        for patch in self.patches:
+            patch.start()
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+
+    def gerar(self, payload, **kwargs):
+        return self.client.post("/api/gerar_proposta_rodrigo", json=payload, **kwargs)
+
+
+class TestGerarProposta(RotaPropostaTestCase):
+    """Testes do fluxo principal da rota"""
+
+    def test_blindagem_unica(self):
+        """Uma blindagem específica retorna as condições do seu valor base"""
+        resposta = self.gerar(PAYLOAD_COMFORT10)
+        self.assertEqual(resposta.status_code, 200)
+        corpo = resposta.json()
+        self.assertEqual(corpo["status"], "success")
+        self.assertEqual(corpo["valor_blindagem"], 45000)
+        condicoes = corpo["condicoes_pagamento"]
+        self.assertEqual(condicoes["valor_base"], 45000)
+        self.assertEqual(condicoes["a_vista"]["valor_total"], 44100)
+        self.assertEqual(len(condicoes["parcelado_direto"]), 3)
+        self.assertEqual(len(condicoes["parcelado_cartao"]), 7)
+
+        form_data = self.fill_pdf_form.call_args[0][2]
+        self.assertEqual(form_data["A VISTA 1"], "R$ 44.100,00")
+
+    def test_comparacao_calcula_cada_cenario_uma_vez(self):
+        """No tipo "Nenhuma" cada blindagem é calculada uma única vez"""
+        with mock.patch.object(calculos, "calcular_condicoes_pagamento",
+                               wraps=calculos.calcular_condicoes_pagamento) as calcular:
+            resposta = self.gerar(PAYLOAD_NENHUMA)
+        self.assertEqual(calcular.call_count, 3)
+
+        corpo = resposta.json()
+        self.assertEqual(corpo["status"], "success")
+        condicoes = corpo["condicoes_pagamento"]
+        self.assertEqual(list(condicoes), ["Comfort 10 anos", "Comfort 18 mm", "Ultralight"])
+        self.assertEqual(condicoes["Comfort 18 mm"]["valor_base"], 51000)
+
+        # A resposta serializada direto segue o schema PropostaResponse
+        validada = PropostaResponse.model_validate(corpo).model_dump(mode="json")
+        self.assertEqual(validada, corpo)
+
+        form_data = self.fill_pdf_form.call_args[0][2]
+        self.assertEqual(form_data["A VISTA 1"], "R$ 43.120,00")
+        self.assertEqual(form_data["A VISTA 2"], "R$ 49.980,00")
+        self.assertEqual(form_data["A VISTA 3"], "R$ 58.800,00")
+
+
+class TestFormatoResposta(RotaPropostaTestCase):
+    """Testes do formato compacto e da seleção de campos"""
+
+    def test_formato_compacto(self):
+        """O formato compacto traz totais e parcelas sem a lista de parcelas"""
+        completo = self.gerar(PAYLOAD_NENHUMA)
+        compacto = self.gerar(PAYLOAD_NENHUMA, params={"formato": "compacto"})
+        self.assertLess(len(compacto.content), len(completo.content))
+
+        condicoes = compacto.json()["condicoes_pagamento"]["Comfort 10 anos"]
+        self.assertEqual(condicoes["a_vista"], {"parcelas": 1, "total": 43120, "parcela": 43120, "desconto": 2})
+        self.assertEqual(condicoes["parcelado_direto"][1], {
+            "parcelas": 3, "total": 44440, "entrada": 22220, "parcela": 11110, "acrescimo": 1,
+        })
+        self.assertEqual(len(condicoes["parcelado_cartao"]), 7)
+
+    def test_selecao_de_campos(self):
+        """Apenas os campos pedidos em fields são retornados"""
+        resposta = self.gerar(PAYLOAD_NENHUMA, params={
+            "fields": "status,condicoes_pagamento.a_vista,condicoes_pagamento.valor_base",
+        })
+        corpo = resposta.json()
+        self.assertEqual(list(corpo), ["status", "condicoes_pagamento"])
+        self.assertEqual(list(corpo["condicoes_pagamento"]["Ultralight"]), ["valor_base", "a_vista"])
+
+    def test_selecao_sem_condicoes(self):
+        """Sem condicoes_pagamento em fields, as condições não são serializadas"""
+        corpo = self.gerar(PAYLOAD_COMFORT10, params={"fields": "status,valor_blindagem"}).json()
+        self.assertEqual(corpo, {"status": "success", "valor_blindagem": 45000})
+
+    def test_campo_desconhecido(self):
+        """Campos inexistentes em fields retornam 422 antes do processamento"""
+        for fields in ("status,preco", "condicoes_pagamento.cartao", "status.a_vista", ","):
+            resposta = self.gerar(PAYLOAD_COMFORT10, params={"fields": fields})
+            self.assertEqual(resposta.status_code, 422, fields)
+        self.assertEqual(self.gerar(PAYLOAD_COMFORT10, params={"formato": "mini"}).status_code, 422)
+        self.fill_pdf_form.assert_not_called()
+
+
+class TestValidacaoProposta(RotaPropostaTestCase):
+    """Testes da validação do corpo pela união discriminada em tipo_blindagem"""
+
+    def test_variacao_18mm_aceita(self):
+        """As duas grafias de Comfort 18 mm são aceitas"""
+        payload = dict(PAYLOAD_BASE, tipo_blindagem="Comfort 18mm", comfort18mmSubTotal=52000)
+        resposta = self.gerar(payload)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()["condicoes_pagamento"]["valor_base"], 52000)
+
+    def test_subtotal_obrigatorio_do_tipo(self):
+        """O subtotal exigido depende do tipo de blindagem"""
+        payload = dict(PAYLOAD_COMFORT10)
+        del payload["comfort10YearsSubTotal"]
+        resposta = self.gerar(payload)
+        self.assertEqual(resposta.status_code, 422)
+        erro = resposta.json()["detail"][0]
+        self.assertEqual(erro["loc"][-1], "comfort10YearsSubTotal")
+        self.fill_pdf_form.assert_not_called()
+
+    def test_tipo_desconhecido(self):
+        """Um tipo de blindagem inexistente é rejeitado"""
+        resposta = self.gerar(dict(PAYLOAD_COMFORT10, tipo_blindagem="Titanium"))
+        self.assertEqual(resposta.status_code, 422)
+        self.assertEqual(resposta.json()["detail"][0]["type"], "union_tag_invalid")
+
+    def test_json_invalido(self):
+        """Um corpo que não é JSON válido é rejeitado"""
+        resposta = self.client.post("/api/gerar_proposta_rodrigo", content=b"{",
+                                    headers={"content-type": "application/json"})
+        self.assertEqual(resposta.status_code, 422)
+
+    def test_valor_nao_finito(self):
+        """Um número que não cabe em float (vira infinito) retorna 422, não 500"""
+        corpo = CORPO_FRONT_END.replace('"comfort10YearsSubTotal":97880.1', '"comfort10YearsSubTotal":1e400')
+        resposta = self.client.post("/api/gerar_proposta_rodrigo", content=corpo.encode(),
+                                    headers={"content-type": "application/json"})
+        self.assertEqual(resposta.status_code, 422)
+        self.assertEqual(resposta.json()["detail"][0]["loc"][-1], "comfort10YearsSubTotal")
+        self.fill_pdf_form.assert_not_called()
+
+    def test_corpo_do_front_end(self):
+        """As opções em texto enviadas pelo front-end são aceitas e vão para o PDF"""
+        resposta = self.client.post("/api/gerar_proposta_rodrigo", content=CORPO_FRONT_END.encode(),
+                                    headers={"content-type": "application/json"})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()["status"], "success")
+        self.assertEqual(resposta.json()["valor_blindagem"], 97760.2)
+
+        valores = set(self.fill_pdf_form.call_args[0][2].values())
+        self.assertLessEqual({"PANORAMICO XL", "5 ANOS", "ARGUS"}, valores)
+        self.assertFalse({"True", "False"} & valores)
+
+    def test_payload_de_exemplo_do_readme(self):
+        """O payload de exemplo documentado no README é aceito"""
+        readme = (Path(__file__).resolve().parent.parent / "README.md").read_text(encoding="utf-8")
+        exemplo = re.search(r"Payload de exemplo:\n```json\n(.*?)\n```", readme, re.S).group(1)
+        resposta = self.gerar(json.loads(exemplo))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()["status"], "success")
+
+    def test_campos_extras_preservados(self):
+        """Campos fora do schema continuam disponíveis na proposta validada"""
+        proposta = PROPOSTA_ADAPTER.validate_python(dict(PAYLOAD_NENHUMA, nome_vendedor="Rodrigo"))
+        self.assertIsInstance(proposta, PropostaNenhuma)
+        self.assertEqual(proposta.nome_vendedor, "Rodrigo")
+        # Valores monetários ficam em centavos desde a validação
+        self.assertEqual(proposta.comfort18mmSubTotal, 5_200_000)
+
+
+class TestMetricasProposta(RotaPropostaTestCase):
+    """Métricas alimentadas pela geração de proposta"""
+
+    def test_etapas_e_resultado(self):
+        """Cada etapa do fluxo é medida e o resultado é contado por tipo e template"""
+        rotulos = {"tipo_blindagem": "Comfort 10 anos", "template": "sem_desconto", "resultado": "sucesso"}
+        antes = metricas.PROPOSTAS.valor(**rotulos)
+        etapas = ("validar", "calcular", "template", "preencher_pdf", "upload", "whatsapp")
+        contagens = {nome: metricas.ETAPAS.contagem(etapa=nome, resultado="ok") for nome in etapas}
+
+        self.assertEqual(self.gerar(PAYLOAD_COMFORT10).status_code, 200)
+
+        self.assertEqual(metricas.PROPOSTAS.valor(**rotulos), antes + 1)
+        for nome in etapas:
+            self.assertEqual(metricas.ETAPAS.contagem(etapa=nome, resultado="ok"), contagens[nome] + 1, nome)
+        self.assertEqual(metricas.PROPOSTAS_EM_ANDAMENTO.valor(), 0)
+
+    def test_falha_na_etapa(self):
+        """Uma etapa que falha é medida como erro e a proposta contada como erro"""
+        rotulos = {"tipo_blindagem": "Comfort 10 anos", "template": "sem_desconto", "resultado": "erro"}
+        antes = metricas.PROPOSTAS.valor(**rotulos)
+        falhas = metricas.ETAPAS.contagem(etapa="preencher_pdf", resultado="erro")
+        self.fill_pdf_form.side_effect = RuntimeError("PDF inválido")
+
+        self.assertEqual(self.gerar(PAYLOAD_COMFORT10).json()["status"], "error")
+
+        self.assertEqual(metricas.PROPOSTAS.valor(**rotulos), antes + 1)
+        self.assertEqual(metricas.ETAPAS.contagem(etapa="preencher_pdf", resultado="erro"), falhas + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
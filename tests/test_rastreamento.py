@@ -0,0 +1,143 @@
+"""
+Testes do rastreamento (spans)
+"""
+import asyncio
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import httpx
+from fastapi.testclient import TestClient
+
+from main import app
+from app.services import logger_service, rastreamento
+from app.services.rastreamento import NAO_AMOSTRADO, ExportadorSpans, span
+from app.services.rastreamento_http import TransporteRastreado
+
+
+class Coletor:
+    """Exportador de teste que guarda os spans concluídos"""
+
+    def __init__(self):
+        self.spans = []
+
+    def exportar(self, concluido):
+        self.spans.append(concluido.para_dict())
+
+    def por_nome(self):
+        return {s["name"]: s for s in self.spans}
+
+
+class RastreamentoTestCase(unittest.TestCase):
+
+    amostragem = 1.0
+
+    def setUp(self):
+        self.coletor = Coletor()
+        for patch in (
+            mock.patch.object(rastreamento, "_exportador", self.coletor),
+            mock.patch.object(rastreamento, "TRACING_AMOSTRAGEM", self.amostragem),
+            mock.patch("app.services.logger_service.logger"),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+
+class TestSpans(RastreamentoTestCase):
+    """Árvore de spans, erros e chamadas externas"""
+
+    def test_arvore_de_spans(self):
+        with span("raiz", "server") as raiz:
+            with logger_service.etapa("calcular"):
+                pass
+            with self.assertRaises(ValueError):
+                with logger_service.etapa("upload"):
+                    raise ValueError("dados do cliente")
+        spans = self.coletor.por_nome()
+        self.assertEqual(set(spans), {"raiz", "calcular", "upload"})
+        for nome in ("calcular", "upload"):
+            self.assertEqual(spans[nome]["traceId"], raiz.trace_id)
+            self.assertEqual(spans[nome]["parentSpanId"], raiz.span_id)
+        self.assertIsNone(spans["raiz"]["parentSpanId"])
+        self.assertEqual((spans["upload"]["status"], spans["upload"]["error"]), ("ERROR", "ValueError"))
+        self.assertGreaterEqual(spans["raiz"]["durationMs"], 0)
+
+    def test_chamada_externa(self):
+        """Status, bytes e traceparent da chamada httpx, como filha da etapa"""
+        recebidos = []
+
+        class Corpo(httpx.AsyncByteStream):
+            """Corpo lido em partes, como numa resposta de rede"""
+            async def __aiter__(self):
+                for _ in range(4):
+                    yield b"%PDF" * 64
+
+        def responder(request):
+            recebidos.append(request.headers)
+            return httpx.Response(200, stream=Corpo())
+
+        async def baixar():
+            transporte = TransporteRastreado(httpx.MockTransport(responder))
+            async with httpx.AsyncClient(transport=transporte) as client:
+                with span("raiz"), logger_service.etapa("template"):
+                    resposta = await client.post("http://supabase.local/token/segredo", content=b"x" * 10)
+            return resposta
+
+        self.assertEqual(len(asyncio.run(baixar()).content), 1024)
+        spans = self.coletor.por_nome()
+        http = spans["HTTP POST supabase.local"]
+        self.assertEqual(http["kind"], "client")
+        self.assertEqual(http["parentSpanId"], spans["template"]["spanId"])
+        self.assertEqual(http["attributes"], {
+            "http.method": "POST",
+            "http.host": "supabase.local",
+            "http.bytes_enviados": 10,
+            "http.status_code": 200,
+            "http.bytes_recebidos": 1024,
+        })
+        self.assertEqual(recebidos[0]["traceparent"], f"00-{http['traceId']}-{http['spanId']}-01")
+        self.assertNotIn("segredo", json.dumps(self.coletor.spans))
+
+    def test_span_raiz_da_requisicao(self):
+        resposta = TestClient(app).get("/health", headers={"X-Request-ID": "req-1"})
+        [raiz] = self.coletor.spans
+        self.assertEqual(raiz["name"], "GET /health")
+        self.assertEqual(raiz["attributes"]["http.status_code"], resposta.status_code)
+        self.assertEqual(raiz["attributes"]["request_id"], "req-1")
+
+
+class TestSemAmostragem(RastreamentoTestCase):
+    """Requisições não amostradas não criam spans"""
+
+    amostragem = 0.0
+
+    def test_nada_exportado(self):
+        with span("raiz") as raiz, logger_service.etapa("calcular"):
+            self.assertIs(raiz, NAO_AMOSTRADO)
+            self.assertIs(rastreamento.span_atual(), NAO_AMOSTRADO)
+        TestClient(app).get("/health")
+        self.assertEqual(self.coletor.spans, [])
+
+
+class TestExportadorSpans(unittest.TestCase):
+    """Gravação em JSON lines pela thread de exportação"""
+
+    def test_grava_json_lines(self):
+        with tempfile.TemporaryDirectory() as diretorio:
+            arquivo = Path(diretorio) / "traces.jsonl"
+            exportador = ExportadorSpans(arquivo, "")
+            with mock.patch.object(rastreamento, "_exportador", exportador), \
+                    mock.patch.object(rastreamento, "TRACING_AMOSTRAGEM", 1.0):
+                for _ in range(3):
+                    with span("etapa"):
+                        pass
+                exportador.encerrar()
+            linhas = [json.loads(linha) for linha in arquivo.read_text().splitlines()]
+        self.assertEqual([linha["name"] for linha in linhas], ["etapa"] * 3)
+        self.assertEqual(len({linha["traceId"] for linha in linhas}), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
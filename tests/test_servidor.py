@@ -0,0 +1,128 @@
+"""
+Testes do servidor de produção (workers, reciclagem) e do cache de templates
+"""
+import asyncio
+import multiprocessing
+import os
+import signal
+import time
+import unittest
+from unittest import mock
+
+import httpx
+
+import servidor
+from app.services import pdf_service
+
+
+async def app_pid(scope, receive, send):
+    """Aplicação ASGI mínima que responde com o pid do worker"""
+    if scope["type"] == "lifespan":
+        while (await receive())["type"] != "lifespan.shutdown":
+            await send({"type": "lifespan.startup.complete"})
+        await send({"type": "lifespan.shutdown.complete"})
+        return
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": str(os.getpid()).encode()})
+
+
+def _supervisionar(sock):
+    with mock.patch.object(servidor, "limite_requisicoes", return_value=2), \
+            mock.patch("app.services.logger_service.logger"):
+        servidor.Supervisor(app_pid, sock, workers=1, encerramento=2).executar()
+
+
+class TestConfiguracao(unittest.TestCase):
+    """Quantidade de workers e limite de requisições"""
+
+    def test_workers_por_nucleo(self):
+        self.assertEqual(servidor.quantidade_workers(3), 3)
+        self.assertEqual(servidor.quantidade_workers(0), len(os.sched_getaffinity(0)))
+
+    def test_limite_com_variacao(self):
+        self.assertIsNone(servidor.limite_requisicoes(0, 100))
+        limites = {servidor.limite_requisicoes(1000, 10) for _ in range(200)}
+        self.assertTrue(limites <= set(range(1000, 1011)))
+        self.assertGreater(len(limites), 1)
+
+
+@unittest.skipUnless(hasattr(os, "fork"), "requer fork")
+class TestSupervisor(unittest.TestCase):
+    """Workers criados por fork atendendo no socket do processo principal"""
+
+    def test_recicla_worker_apos_limite(self):
+        sock = servidor.criar_socket("127.0.0.1", 0)
+        porta = sock.getsockname()[1]
+        processo = multiprocessing.get_context("fork").Process(target=_supervisionar, args=(sock,))
+        processo.start()
+        try:
+            url = f"http://127.0.0.1:{porta}/"
+            # O worker verifica o limite a cada 0,1 s; as requisições seguem
+            # até a resposta vir de outro processo
+            pids = [httpx.get(url, timeout=10).text]
+            while len(pids) < 30 and pids[-1] == pids[0]:
+                time.sleep(0.1)
+                pids.append(httpx.get(url, timeout=10).text)
+        finally:
+            os.kill(processo.pid, signal.SIGTERM)
+            processo.join(10)
+            sock.close()
+
+        self.assertEqual(pids[0], pids[1])
+        self.assertNotEqual(pids[0], pids[-1])
+        self.assertNotIn(str(processo.pid), pids)
+        self.assertEqual(processo.exitcode, 0)
+
+
+class TestCacheTemplates(unittest.TestCase):
+    """Templates baixados uma vez e reutilizados até expirar"""
+
+    def setUp(self):
+        self.downloads = []
+
+        async def baixar_template(url):
+            self.downloads.append(url)
+            return f"%PDF {url}".encode()
+
+        self.patches = [
+            mock.patch.object(pdf_service, "baixar_template", baixar_template),
+            mock.patch.dict(pdf_service._templates, clear=True),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+
+    def test_precarregamento(self):
+        asyncio.run(pdf_service.carregar_templates())
+        conteudo = asyncio.run(pdf_service.obter_template(pdf_service.PDF_COM_DESCONTO_URL))
+
+        self.assertEqual(conteudo, f"%PDF {pdf_service.PDF_COM_DESCONTO_URL}".encode())
+        self.assertEqual(self.downloads, [pdf_service.PDF_COM_DESCONTO_URL, pdf_service.PDF_SEM_DESCONTO_URL])
+        self.assertEqual(len(pdf_service._templates[pdf_service.PDF_SEM_DESCONTO_URL].versao), 12)
+
+    def test_falha_ao_renovar_usa_cache(self):
+        asyncio.run(pdf_service.obter_template("http://template"))
+
+        async def falhar(url):
+            raise Exception("indisponível")
+
+        with mock.patch.object(pdf_service, "TEMPLATE_CACHE_SEGUNDOS", 0.0), \
+                mock.patch.object(pdf_service, "baixar_template", falhar), \
+                mock.patch("app.services.logger_service.logger"):
+            conteudo = asyncio.run(pdf_service.obter_template("http://template"))
+            with self.assertRaises(Exception):
+                asyncio.run(pdf_service.obter_template("http://outro"))
+        self.assertEqual(conteudo, b"%PDF http://template")
+
+    def test_expiracao(self):
+        asyncio.run(pdf_service.obter_template("http://template"))
+        with mock.patch.object(pdf_service, "TEMPLATE_CACHE_SEGUNDOS", 0):
+            asyncio.run(pdf_service.obter_template("http://template"))
+        self.assertEqual(len(self.downloads), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Testes da simulação de descontos
+"""
+import unittest
+
+from fastapi.testclient import TestClient
+
+from main import app
+from app.services import calculos
+
+PARAMETROS = {
+    "comfort10YearsSubTotal": 45000,
+    "ultralightSubTotal": 61000.5,
+    "desconto_inicial": 0,
+    "desconto_final": 3000,
+    "desconto_passo": 250,
+}
+
+
+class TestSimulacaoDescontos(unittest.TestCase):
+    """Testes do endpoint de simulação de descontos"""
+
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def simular(self, params=PARAMETROS, **kwargs):
+        return self.client.get("/api/simular_descontos", params=params, **kwargs)
+
+    def test_grade_coincide_com_calculo_da_proposta(self):
+        """Cada célula da grade é igual ao cálculo individual da proposta"""
+        corpo = self.simular().json()
+        self.assertEqual(len(corpo["descontos"]), 13)
+        self.assertEqual(list(corpo["blindagens"]), ["Comfort 10 anos", "Ultralight"])
+
+        for rotulo, subtotal in (("Comfort 10 anos", 45000), ("Ultralight", 61000.5)):
+            grade = corpo["blindagens"][rotulo]
+            for i, desconto in enumerate(corpo["descontos"]):
+                conds = calculos.calcular_condicoes_pagamento({"valor_base": subtotal - desconto}).para_dict()
+                self.assertEqual(grade["a_vista"][i], conds["a_vista"]["valor_total"])
+                self.assertEqual(grade["tres_vezes"]["entrada"][i], conds["tres_vezes"]["parcelas"][0]["valor"])
+                self.assertEqual(grade["quatro_vezes"]["parcela"][i], conds["quatro_vezes"]["parcelas"][1]["valor"])
+                self.assertEqual(grade["cartao"]["10x"]["parcela"][i], conds["cartao"]["10x"]["valor_parcela"])
+
+    def test_resposta_cacheavel(self):
+        """A resposta tem ETag e é revalidada com 304"""
+        resposta = self.simular()
+        self.assertIn("max-age", resposta.headers["cache-control"])
+        etag = resposta.headers["etag"]
+
+        revalidacao = self.simular(headers={"If-None-Match": etag})
+        self.assertEqual(revalidacao.status_code, 304)
+        self.assertEqual(self.simular().headers["etag"], etag)
+        self.assertNotEqual(self.simular(dict(PARAMETROS, desconto_passo=500)).headers["etag"], etag)
+
+    def test_parametros_invalidos(self):
+        """Parâmetros inválidos retornam 422"""
+        self.assertEqual(self.simular({}).status_code, 422)
+        self.assertEqual(self.simular(dict(PARAMETROS, desconto_final=-1)).status_code, 422)
+        self.assertEqual(self.simular(dict(PARAMETROS, desconto_inicial=5000)).status_code, 422)
+        self.assertEqual(self.simular(dict(PARAMETROS, desconto_final=10 ** 6, desconto_passo=1)).status_code, 422)
+
+    def test_valores_fora_da_faixa(self):
+        """Infinito, NaN e valores acima do máximo retornam 422 (nunca entram no cache)"""
+        for parametro in ("comfort10YearsSubTotal", "desconto_final", "desconto_passo"):
+            for valor in ("inf", "nan", "1e300"):
+                resposta = self.simular(dict(PARAMETROS, **{parametro: valor}))
+                self.assertEqual(resposta.status_code, 422, (parametro, valor))
+                self.assertNotIn("etag", resposta.headers)
+
+    def test_valor_base_fora_da_faixa_no_calculo_vetorizado(self):
+        """O cálculo vetorizado recusa valores que estourariam int64"""
+        for valor in (float("inf"), float("nan"), 1e300, -1e300):
+            with self.assertRaises(ValueError):
+                calculos.calcular_condicoes_pagamento_vetorizado([45000, valor])
+
+
+if __name__ == "__main__":
+    unittest.main()